@@ -1,4 +1,20 @@
 # Paquete de API
+from .cache import CachePersistente, CacheRutas, directorio_cache
+from .geocodificadores import (Geocodificador, GeocodificadorCadena,
+                               GeocodificadorLocal, GeocodificadorNominatim)
+from .http import ClienteHTTP
 from .nominatim import NominatimAPI
+from .osrm import OSRMAPI
 
-__all__ = ['NominatimAPI']
\ No newline at end of file
+__all__ = [
+    'CachePersistente',
+    'CacheRutas',
+    'ClienteHTTP',
+    'Geocodificador',
+    'GeocodificadorCadena',
+    'GeocodificadorLocal',
+    'GeocodificadorNominatim',
+    'NominatimAPI',
+    'OSRMAPI',
+    'directorio_cache'
+]
\ No newline at end of file
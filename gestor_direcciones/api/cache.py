@@ -0,0 +1,230 @@
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+# Variable de entorno para cambiar el directorio donde se guardan las cachés
+VARIABLE_DIRECTORIO_CACHE = 'GESTOR_DIRECCIONES_CACHE'
+NOMBRE_APLICACION = 'gestor_direcciones'
+EN_MEMORIA = ':memory:'
+
+
+def directorio_cache() -> str:
+    """
+    Directorio de datos de la aplicación donde van las cachés en disco.
+
+    Se puede cambiar con la variable de entorno GESTOR_DIRECCIONES_CACHE; si no,
+    es el directorio de caché del usuario según el sistema (%LOCALAPPDATA%,
+    ~/Library/Caches o $XDG_CACHE_HOME / ~/.cache).
+    """
+    directorio = os.environ.get(VARIABLE_DIRECTORIO_CACHE)
+    if directorio:
+        return directorio
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+    elif sys.platform == 'darwin':
+        base = os.path.expanduser('~/Library/Caches')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return os.path.join(base, NOMBRE_APLICACION)
+
+
+def resolver_ruta_cache(ruta: Optional[str], directorio: Optional[str] = None) -> str:
+    """
+    Archivo SQLite de una caché.
+
+    Un nombre sin directorio se ubica en 'directorio' (por defecto
+    directorio_cache(), que se crea si hace falta); una ruta con directorio se
+    respeta y None o ':memory:' dan una caché temporal en memoria.
+    """
+    if ruta is None or ruta == EN_MEMORIA:
+        return EN_MEMORIA
+    if os.path.dirname(ruta):
+        return ruta
+    directorio = directorio or directorio_cache()
+    os.makedirs(directorio, exist_ok=True)
+    return os.path.join(directorio, ruta)
+
+
+def _a_json(valor):
+    """Guarda arreglos de numpy (p. ej. geometrías) como listas"""
+    if hasattr(valor, 'tolist'):
+        return valor.tolist()
+    raise TypeError(f"No se puede convertir {type(valor).__name__} a JSON")
+
+
+class CachePersistente:
+    """Caché en disco (SQLite) con caducidad, desalojo LRU y contadores de aciertos"""
+
+    def __init__(self, ruta: Optional[str], tabla: str = 'respuestas',
+                 ttl: float = 30 * 24 * 3600, max_entradas: int = 100000,
+                 directorio: Optional[str] = None):
+        """
+        Args:
+            ruta: Archivo SQLite; un nombre sin directorio va en el directorio de
+                caché de la aplicación (ver resolver_ruta_cache) y None o
+                ':memory:' dan una caché temporal
+            tabla: Tabla donde se guardan las entradas
+            ttl: Segundos que una entrada es válida (None = sin caducidad)
+            max_entradas: Entradas máximas antes de desalojar las menos usadas
+            directorio: Directorio para los nombres sin directorio (None = directorio_cache())
+        """
+        if not re.fullmatch(r'\w+', tabla):
+            raise ValueError(f"Nombre de tabla inválido: {tabla}")
+        ruta = resolver_ruta_cache(ruta, directorio)
+        self.ruta = ruta
+        self.tabla = tabla
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self.aciertos = 0
+        self.fallos = 0
+        self._lock = threading.Lock()
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False)
+        with self._conexion:
+            self._conexion.execute('PRAGMA journal_mode=WAL')
+            self._conexion.execute('PRAGMA synchronous=NORMAL')
+            self._conexion.execute(
+                f'CREATE TABLE IF NOT EXISTS {tabla} ('
+                'clave TEXT PRIMARY KEY, valor TEXT NOT NULL, '
+                'creado REAL NOT NULL, usado REAL NOT NULL)'
+            )
+            self._conexion.execute(f'CREATE INDEX IF NOT EXISTS {tabla}_usado ON {tabla}(usado)')
+        self._entradas = self._conexion.execute(f'SELECT COUNT(*) FROM {tabla}').fetchone()[0]
+
+    @staticmethod
+    def clave_consulta(params: Dict, prefijo: str = '') -> str:
+        """Genera una clave estable a partir de parámetros normalizados"""
+        normalizados = {
+            str(k): re.sub(r'\s+', ' ', str(v)).strip().lower()
+            for k, v in params.items()
+        }
+        return prefijo + json.dumps(normalizados, sort_keys=True, ensure_ascii=False)
+
+    def obtener(self, clave: str) -> Optional[Any]:
+        """Devuelve el valor guardado o None si no existe o ya caducó"""
+        ahora = time.time()
+        with self._lock:
+            fila = self._conexion.execute(
+                f'SELECT valor, creado FROM {self.tabla} WHERE clave = ?', (clave,)
+            ).fetchone()
+            if fila is None:
+                self.fallos += 1
+                return None
+            valor, creado = fila
+            with self._conexion:
+                if self.ttl is not None and ahora - creado > self.ttl:
+                    self._conexion.execute(f'DELETE FROM {self.tabla} WHERE clave = ?', (clave,))
+                    self._entradas -= 1
+                    self.fallos += 1
+                    return None
+                self._conexion.execute(
+                    f'UPDATE {self.tabla} SET usado = ? WHERE clave = ?', (ahora, clave)
+                )
+            self.aciertos += 1
+        return json.loads(valor)
+
+    def guardar(self, clave: str, valor: Any):
+        """Guarda un valor serializable en JSON, desalojando las entradas menos usadas"""
+        ahora = time.time()
+        datos = json.dumps(valor, ensure_ascii=False, default=_a_json)
+        with self._lock, self._conexion:
+            cursor = self._conexion.execute(
+                f'UPDATE {self.tabla} SET valor = ?, creado = ?, usado = ? WHERE clave = ?',
+                (datos, ahora, ahora, clave)
+            )
+            if cursor.rowcount == 0:
+                self._conexion.execute(
+                    f'INSERT INTO {self.tabla} (clave, valor, creado, usado) VALUES (?, ?, ?, ?)',
+                    (clave, datos, ahora, ahora)
+                )
+                self._entradas += 1
+            if self._entradas > self.max_entradas:
+                exceso = self._entradas - self.max_entradas
+                self._conexion.execute(
+                    f'DELETE FROM {self.tabla} WHERE clave IN '
+                    f'(SELECT clave FROM {self.tabla} ORDER BY usado LIMIT ?)', (exceso,)
+                )
+                self._entradas -= exceso
+
+    def limpiar(self):
+        """Elimina todas las entradas y reinicia los contadores"""
+        with self._lock, self._conexion:
+            self._conexion.execute(f'DELETE FROM {self.tabla}')
+            self._entradas = 0
+            self.aciertos = 0
+            self.fallos = 0
+
+    def estadisticas(self) -> Dict[str, int]:
+        """Aciertos, fallos y número de entradas de la caché"""
+        return {'aciertos': self.aciertos, 'fallos': self.fallos, 'entradas': self._entradas}
+
+
+class CacheRutas:
+    """Caché de rutas en memoria (LRU) con respaldo opcional en disco, por coordenadas redondeadas"""
+
+    def __init__(self, ruta: Optional[str] = None, precision: int = 5,
+                 max_memoria: int = 1024, **opciones_disco):
+        """
+        Args:
+            ruta: Archivo SQLite para conservar rutas entre sesiones (None = sólo memoria);
+                un nombre sin directorio va en el directorio de caché de la aplicación
+            precision: Decimales con que se redondean las coordenadas (5 ≈ 1 m)
+            max_memoria: Rutas máximas que se conservan en memoria
+            opciones_disco: ttl, max_entradas y directorio de la caché persistente
+        """
+        self.precision = precision
+        self.max_memoria = max_memoria
+        self._memoria: 'OrderedDict[str, Any]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.disco = CachePersistente(ruta, tabla='rutas', **opciones_disco) if ruta else None
+
+    def clave(self, coordenadas: Sequence[Tuple[float, float]], prefijo: str = '') -> str:
+        """Clave a partir de las coordenadas (lat, lon) redondeadas a la precisión configurada"""
+        return prefijo + ';'.join(
+            f"{round(float(lat), self.precision)},{round(float(lon), self.precision)}"
+            for lat, lon in coordenadas
+        )
+
+    def obtener(self, clave: str) -> Optional[Dict]:
+        """Devuelve la ruta guardada (primero en memoria, luego en disco) o None"""
+        with self._lock:
+            if clave in self._memoria:
+                self._memoria.move_to_end(clave)
+                return self._memoria[clave]
+        if self.disco is None:
+            return None
+        valor = self.disco.obtener(clave)
+        if valor is not None:
+            # La geometría se conserva como arreglo (n, 2) de [lat, lon]
+            if 'geometria' in valor:
+                valor['geometria'] = np.asarray(valor['geometria'], dtype=np.float64).reshape(-1, 2)
+            self._recordar(clave, valor)
+        return valor
+
+    def guardar(self, clave: str, valor: Dict):
+        """Guarda una ruta en memoria y, si está configurado, en disco"""
+        self._recordar(clave, valor)
+        if self.disco is not None:
+            self.disco.guardar(clave, valor)
+
+    def _recordar(self, clave: str, valor: Dict):
+        with self._lock:
+            self._memoria[clave] = valor
+            self._memoria.move_to_end(clave)
+            while len(self._memoria) > self.max_memoria:
+                self._memoria.popitem(last=False)
+
+    def limpiar(self):
+        """Vacía la memoria y la caché en disco"""
+        with self._lock:
+            self._memoria.clear()
+        if self.disco is not None:
+            self.disco.limpiar()
@@ -0,0 +1,248 @@
+from abc import ABC, abstractmethod
+import bisect
+import csv
+import hashlib
+import os
+import pathlib
+import re
+import sqlite3
+import threading
+import unicodedata
+from typing import Dict, List, Optional, Sequence
+
+from .cache import EN_MEMORIA, resolver_ruta_cache
+from .nominatim import NominatimAPI
+
+# Prefijos de vialidad que se ignoran al comparar direcciones
+PREFIJOS_VIALIDAD = {'calle', 'c', 'av', 'avenida', 'blvd', 'boulevard', 'bulevar', 'calzada', 'calz'}
+
+
+def normalizar_direccion(texto: str) -> str:
+    """Normaliza una dirección para compararla: minúsculas, sin acentos ni signos"""
+    texto = unicodedata.normalize('NFKD', str(texto).lower())
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    palabras = re.sub(r'[^\w]+', ' ', texto).split()
+    while palabras and palabras[0] in PREFIJOS_VIALIDAD:
+        palabras.pop(0)
+    return ' '.join(palabras)
+
+
+class Geocodificador(ABC):
+    """Interfaz común de los geocodificadores"""
+
+    @abstractmethod
+    def buscar(self, direccion: str) -> Optional[List[Dict]]:
+        """
+        Busca una dirección.
+
+        Returns:
+            Lista de resultados con el formato de Nominatim ([] si no existe)
+            o None si el servicio no respondió
+        """
+
+    @abstractmethod
+    def sugerir(self, texto: str, limite: int = 5) -> List[Dict]:
+        """
+        Candidatos para un texto incompleto sin consultar servicios remotos.
+
+        Sirve para sugerencias mientras se escribe ([] si no hay ninguno).
+        """
+
+
+class GeocodificadorNominatim(Geocodificador):
+    """Geocodificador remoto sobre la API de Nominatim"""
+
+    def __init__(self, api: Optional[NominatimAPI] = None):
+        self.api = api or NominatimAPI()
+
+    @staticmethod
+    def _parametros(direccion: str) -> Dict:
+        return {
+            'q': direccion,
+            'format': 'json',
+            'addressdetails': 1,
+            'limit': 1
+        }
+
+    def buscar(self, direccion: str) -> Optional[List[Dict]]:
+        return self.api.hacer_peticion(self._parametros(direccion))
+
+    def sugerir(self, texto: str, limite: int = 5) -> List[Dict]:
+        # Sólo respuestas ya guardadas: el servicio público no permite autocompletar
+        return (self.api.en_cache(self._parametros(texto)) or [])[:limite]
+
+
+class GeocodificadorLocal(Geocodificador):
+    """
+    Geocodificador sin conexión a partir de un nomenclátor local.
+
+    Acepta un CSV o una tabla SQLite con las columnas calle, numero, lat y lon
+    (y opcionalmente colonia, ciudad, cp y direccion). El CSV se indexa en memoria.
+    El SQLite sólo se lee: las claves normalizadas se indexan una vez en una base
+    aparte del directorio de caché (o en memoria) que se une con ATTACH.
+    """
+
+    def __init__(self, archivo: str, tabla: str = 'nomenclator',
+                 directorio_cache: Optional[str] = None, persistir_indice: bool = True):
+        """
+        Args:
+            archivo: CSV o base SQLite del nomenclátor
+            tabla: Tabla del nomenclátor en el SQLite
+            directorio_cache: Dónde guardar el índice de claves (None = directorio_cache())
+            persistir_indice: False para construir el índice en memoria en cada sesión
+        """
+        if not re.fullmatch(r'\w+', tabla):
+            raise ValueError(f"Nombre de tabla inválido: {tabla}")
+        self.archivo = archivo
+        self.tabla = tabla
+        self._indice: Optional[Dict[str, Dict]] = None
+        self._claves_ordenadas: List[str] = []  # Claves del CSV para búsquedas por prefijo
+        self._conexion = None
+        self._lock = threading.Lock()
+        if archivo.lower().endswith('.csv'):
+            self._cargar_csv(archivo)
+        else:
+            self._abrir_sqlite(archivo, directorio_cache if persistir_indice else EN_MEMORIA)
+
+    @staticmethod
+    def _clave(calle, numero) -> str:
+        return normalizar_direccion(f"{calle} {numero or ''}")
+
+    @staticmethod
+    def _resultado(fila: Dict) -> Dict:
+        """Convierte una fila del nomenclátor al formato de resultado de Nominatim"""
+        componentes = {
+            'road': fila.get('calle'),
+            'house_number': fila.get('numero'),
+            'neighbourhood': fila.get('colonia'),
+            'city': fila.get('ciudad'),
+            'postcode': fila.get('cp')
+        }
+        componentes = {k: str(v) for k, v in componentes.items() if v not in (None, '')}
+        nombre = fila.get('direccion') or ', '.join(
+            v for v in (f"{fila.get('calle', '')} {fila.get('numero') or ''}".strip(),
+                        componentes.get('neighbourhood'), componentes.get('city'))
+            if v
+        )
+        return {
+            'lat': str(fila['lat']),
+            'lon': str(fila['lon']),
+            'display_name': nombre,
+            'address': componentes,
+            'osm_id': None,
+            'type': 'nomenclator',
+            'class': 'place'
+        }
+
+    def _cargar_csv(self, archivo: str):
+        self._indice = {}
+        with open(archivo, 'r', encoding='utf-8', newline='') as f:
+            for fila in csv.DictReader(f):
+                fila = {k.strip().lower(): (v or '').strip() for k, v in fila.items() if k}
+                self._indice.setdefault(self._clave(fila.get('calle'), fila.get('numero')), fila)
+        self._claves_ordenadas = sorted(self._indice)
+
+    def _ruta_indice(self, archivo: str, directorio: Optional[str]) -> str:
+        """Base del índice de claves; el nombre cambia si el nomenclátor cambia"""
+        if directorio == EN_MEMORIA:
+            return EN_MEMORIA
+        datos = os.stat(archivo)
+        firma = f"{os.path.abspath(archivo)}|{self.tabla}|{datos.st_mtime_ns}|{datos.st_size}"
+        nombre = f"nomenclator_{hashlib.sha1(firma.encode('utf-8')).hexdigest()[:16]}.sqlite"
+        return resolver_ruta_cache(nombre, directorio)
+
+    def _abrir_sqlite(self, archivo: str, directorio: Optional[str]):
+        if not os.path.isfile(archivo):
+            raise ValueError(f"No existe el nomenclátor {archivo}")
+        # uri=True permite adjuntar el nomenclátor como file:...?mode=ro
+        self._conexion = sqlite3.connect(self._ruta_indice(archivo, directorio), uri=True,
+                                         check_same_thread=False, isolation_level=None)
+        self._conexion.row_factory = sqlite3.Row
+        fuente = pathlib.Path(archivo).resolve().as_uri() + '?mode=ro'
+        self._conexion.execute('ATTACH DATABASE ? AS fuente', (fuente,))
+        columnas = [c[1] for c in self._conexion.execute(f'PRAGMA fuente.table_info({self.tabla})')]
+        if not columnas:
+            raise ValueError(f"La tabla '{self.tabla}' no existe en {archivo}")
+        existe = self._conexion.execute(
+            "SELECT 1 FROM main.sqlite_master WHERE type = 'table' AND name = 'claves'"
+        ).fetchone()
+        if not existe:
+            # Preparación única en una transacción: un índice a medias no queda guardado
+            self._conexion.execute('BEGIN')
+            try:
+                self._conexion.execute('CREATE TABLE main.claves (clave TEXT NOT NULL, fila INTEGER NOT NULL)')
+                filas = self._conexion.execute(f'SELECT rowid, calle, numero FROM fuente.{self.tabla}')
+                self._conexion.executemany(
+                    'INSERT INTO main.claves (clave, fila) VALUES (?, ?)',
+                    ((self._clave(calle, numero), rowid) for rowid, calle, numero in filas)
+                )
+                self._conexion.execute('CREATE INDEX main.claves_clave ON claves(clave, fila)')
+                self._conexion.execute('COMMIT')
+            except BaseException:
+                self._conexion.execute('ROLLBACK')
+                raise
+
+    def _consultar(self, clave: str) -> Optional[Dict]:
+        if self._indice is not None:
+            fila = self._indice.get(clave)
+            return self._resultado(fila) if fila else None
+        with self._lock:
+            fila = self._conexion.execute(
+                f'SELECT f.* FROM claves c JOIN fuente.{self.tabla} f ON f.rowid = c.fila '
+                'WHERE c.clave = ? ORDER BY c.fila LIMIT 1', (clave,)
+            ).fetchone()
+        return self._resultado(dict(fila)) if fila else None
+
+    def sugerir(self, texto: str, limite: int = 5) -> List[Dict]:
+        """Entradas del nomenclátor cuya clave normalizada empieza con el texto"""
+        prefijo = normalizar_direccion(texto)
+        if not prefijo:
+            return []
+        if self._indice is not None:
+            inicio = bisect.bisect_left(self._claves_ordenadas, prefijo)
+            claves = []
+            for clave in self._claves_ordenadas[inicio:inicio + limite]:
+                if not clave.startswith(prefijo):
+                    break
+                claves.append(clave)
+            return [self._resultado(self._indice[clave]) for clave in claves]
+        # Rango [prefijo, prefijo + máximo carácter) sobre la clave indexada
+        with self._lock:
+            filas = self._conexion.execute(
+                f'SELECT f.* FROM claves c JOIN fuente.{self.tabla} f ON f.rowid = c.fila '
+                'WHERE c.clave >= ? AND c.clave < ? ORDER BY c.clave, c.fila LIMIT ?',
+                (prefijo, prefijo + '\U0010ffff', limite)
+            ).fetchall()
+        return [self._resultado(dict(fila)) for fila in filas]
+
+    def buscar(self, direccion: str) -> Optional[List[Dict]]:
+        # Probar la dirección completa y luego sólo la parte antes de la primera coma
+        for texto in dict.fromkeys([direccion, direccion.split(',')[0]]):
+            resultado = self._consultar(normalizar_direccion(texto))
+            if resultado:
+                return [resultado]
+        return []
+
+
+class GeocodificadorCadena(Geocodificador):
+    """Prueba varios geocodificadores en orden (p. ej. local y luego remoto)"""
+
+    def __init__(self, geocodificadores: Sequence[Geocodificador]):
+        self.geocodificadores = list(geocodificadores)
+
+    def buscar(self, direccion: str) -> Optional[List[Dict]]:
+        hubo_falla = False
+        for geocodificador in self.geocodificadores:
+            resultados = geocodificador.buscar(direccion)
+            if resultados:
+                return resultados
+            hubo_falla = hubo_falla or resultados is None
+        return None if hubo_falla else []
+
+    def sugerir(self, texto: str, limite: int = 5) -> List[Dict]:
+        sugerencias = []
+        for geocodificador in self.geocodificadores:
+            if len(sugerencias) >= limite:
+                break
+            sugerencias.extend(geocodificador.sugerir(texto, limite - len(sugerencias)))
+        return sugerencias
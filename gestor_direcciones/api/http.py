@@ -0,0 +1,107 @@
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .limitador import LimitadorTasa
+
+# Códigos de respuesta que vale la pena reintentar
+CODIGOS_REINTENTABLES = {429, 500, 502, 503, 504}
+
+
+class ClienteHTTP:
+    """Cliente HTTP compartido con sesión persistente, timeouts y reintentos con backoff"""
+
+    def __init__(self, base_url: str, user_agent: str = "CETI_Algoritmia_Direcciones/1.0",
+                 timeout: Union[float, Tuple[float, float]] = (3.05, 15),
+                 reintentos: int = 3, backoff: float = 0.5, backoff_maximo: float = 10.0,
+                 conexiones: int = 10, limitador: Optional[LimitadorTasa] = None,
+                 espera_servidor_maxima: float = 60.0):
+        """
+        Args:
+            base_url: URL base del servicio
+            timeout: Segundos de espera (conexión, lectura) por petición
+            reintentos: Reintentos máximos ante errores de red o códigos 429/5xx
+            backoff: Espera base en segundos; se duplica en cada reintento
+            backoff_maximo: Tope de la espera entre reintentos
+            conexiones: Conexiones persistentes que se mantienen abiertas por host
+            limitador: Límite de tasa del que se toma una ficha antes de cada intento
+            espera_servidor_maxima: Mayor Retry-After que se acepta esperar; si el
+                servidor pide más, se devuelve su respuesta sin reintentar
+        """
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.reintentos = reintentos
+        self.backoff = backoff
+        self.backoff_maximo = backoff_maximo
+        self.limitador = limitador
+        self.espera_servidor_maxima = espera_servidor_maxima
+        self.sesion = requests.Session()
+        self.sesion.headers['User-Agent'] = user_agent
+        adaptador = HTTPAdapter(pool_connections=conexiones, pool_maxsize=conexiones)
+        self.sesion.mount('http://', adaptador)
+        self.sesion.mount('https://', adaptador)
+
+    def _espera(self, intento: int) -> float:
+        """Backoff exponencial con jitter completo"""
+        return random.uniform(0, min(self.backoff_maximo, self.backoff * 2 ** intento))
+
+    @staticmethod
+    def _retry_after(respuesta: Optional[requests.Response]) -> Optional[float]:
+        """Segundos pedidos por el encabezado Retry-After (en segundos o fecha HTTP), o None"""
+        valor = respuesta.headers.get('Retry-After') if respuesta is not None else None
+        if not valor:
+            return None
+        try:
+            return max(0.0, float(valor))
+        except ValueError:
+            pass
+        try:
+            fecha = parsedate_to_datetime(valor)
+        except (TypeError, ValueError):
+            return None
+        if fecha is None or fecha.tzinfo is None:
+            return None
+        return max(0.0, fecha.timestamp() - time.time())
+
+    def get(self, ruta: str = '', params: Optional[Dict] = None) -> requests.Response:
+        """
+        Realiza un GET sobre base_url + ruta con reintentos acotados.
+
+        Cada intento (también los reintentos) toma una ficha del limitador, y un
+        Retry-After del servidor se respeta antes de volver a intentar.
+
+        Devuelve la última respuesta recibida (aunque no sea 200) o lanza
+        requests.exceptions.RequestException si nunca hubo respuesta.
+        """
+        url = f"{self.base_url}/{ruta.lstrip('/')}" if ruta else self.base_url
+        for intento in range(self.reintentos + 1):
+            respuesta = None
+            if self.limitador is not None:
+                self.limitador.adquirir()
+            try:
+                respuesta = self.sesion.get(url, params=params, timeout=self.timeout)
+                if respuesta.status_code not in CODIGOS_REINTENTABLES:
+                    return respuesta
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if intento == self.reintentos:
+                    raise
+            if intento < self.reintentos:
+                espera = self._retry_after(respuesta)
+                if espera is None:
+                    time.sleep(self._espera(intento))
+                elif espera > self.espera_servidor_maxima:
+                    return respuesta
+                elif self.limitador is not None:
+                    # La pausa frena también a los demás hilos que comparten el limitador
+                    self.limitador.pausar(espera)
+                else:
+                    time.sleep(espera)
+        return respuesta
+
+    def cerrar(self):
+        """Cierra las conexiones abiertas de la sesión"""
+        self.sesion.close()
@@ -0,0 +1,42 @@
+import threading
+import time
+
+
+class LimitadorTasa:
+    """Cubeta de fichas (token bucket) para limitar las peticiones por segundo"""
+
+    def __init__(self, tasa: float = 1.0, capacidad: float = 1.0):
+        """
+        Args:
+            tasa: Fichas que se recuperan por segundo (peticiones sostenidas por segundo)
+            capacidad: Fichas máximas acumulables (ráfaga permitida)
+        """
+        if tasa <= 0 or capacidad < 1:
+            raise ValueError("La tasa debe ser positiva y la capacidad al menos 1")
+        self.tasa = tasa
+        self.capacidad = capacidad
+        self._fichas = capacidad
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def adquirir(self, fichas: float = 1.0):
+        """Bloquea hasta disponer de las fichas pedidas y las consume"""
+        while True:
+            with self._lock:
+                ahora = time.monotonic()
+                self._fichas = min(self.capacidad, self._fichas + (ahora - self._ultimo) * self.tasa)
+                self._ultimo = ahora
+                if self._fichas >= fichas:
+                    self._fichas -= fichas
+                    return
+                espera = (fichas - self._fichas) / self.tasa
+            time.sleep(espera)
+
+    def pausar(self, segundos: float):
+        """No entrega fichas hasta que pasen los segundos indicados (p. ej. un Retry-After)"""
+        with self._lock:
+            ahora = time.monotonic()
+            self._fichas = min(self.capacidad, self._fichas + (ahora - self._ultimo) * self.tasa)
+            self._ultimo = ahora
+            # Saldo negativo: se recupera justo al cumplirse la pausa
+            self._fichas = min(self._fichas, -segundos * self.tasa)
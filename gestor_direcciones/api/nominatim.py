@@ -1,26 +1,52 @@
-import time
 import requests
 from typing import Dict, Optional
 
+from .cache import CachePersistente
+from .http import ClienteHTTP
+from .limitador import LimitadorTasa
+
+RUTA_CACHE_GEOCODIFICACION = "cache_geocodificacion.sqlite"
+URL_NOMINATIM = "https://nominatim.openstreetmap.org/search"
+
 
 class NominatimAPI:
     """Clase para manejar las interacciones con la API de Nominatim"""
-    def __init__(self):
-        self.base_url = "https://nominatim.openstreetmap.org/search"
+    def __init__(self, ruta_cache: Optional[str] = RUTA_CACHE_GEOCODIFICACION,
+                 peticiones_por_segundo: float = 1.0, base_url: str = URL_NOMINATIM,
+                 directorio_cache: Optional[str] = None, **opciones_http):
+        self.base_url = base_url
         self.user_agent = "CETI_Algoritmia_Direcciones/1.0"
-        self.last_request_time = 0
+        # El servidor público permite 1 petición/s; una instancia local puede subirlo
+        self.limitador = LimitadorTasa(peticiones_por_segundo)
+        # Sesión compartida: conexiones persistentes, timeouts y reintentos; cada
+        # intento, reintentos incluidos, pasa por el limitador
+        self.cliente = ClienteHTTP(base_url, user_agent=self.user_agent,
+                                   limitador=self.limitador, **opciones_http)
+        # Caché en disco de respuestas en el directorio de la aplicación (None para desactivarla)
+        self.cache = (CachePersistente(ruta_cache, tabla='nominatim', directorio=directorio_cache)
+                      if ruta_cache else None)
+
+    def en_cache(self, params: Dict) -> Optional[Dict]:
+        """Respuesta guardada para una consulta, sin hacer la petición (None si no hay)"""
+        if self.cache is None:
+            return None
+        return self.cache.obtener(CachePersistente.clave_consulta(params, prefijo=self.base_url))
 
     def hacer_peticion(self, params: Dict) -> Optional[Dict]:
         """Realiza una petición a la API respetando el rate limiting"""
-        elapsed = time.time() - self.last_request_time
-        if elapsed < 1.0:
-            time.sleep(1.0 - elapsed)
-        
-        headers = {'User-Agent': self.user_agent}
-        
+        clave = CachePersistente.clave_consulta(params, prefijo=self.base_url)
+        if self.cache is not None:
+            data = self.cache.obtener(clave)
+            if data is not None:
+                return data
+
         try:
-            response = requests.get(self.base_url, params=params, headers=headers)
-            self.last_request_time = time.time()
-            return response.json() if response.status_code == 200 else None
+            response = self.cliente.get(params=params)
+            if response.status_code != 200:
+                return None
+            data = response.json()
+            if self.cache is not None:
+                self.cache.guardar(clave, data)
+            return data
         except requests.exceptions.RequestException:
-            return None
\ No newline at end of file
+            return None
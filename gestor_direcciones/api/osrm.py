@@ -0,0 +1,117 @@
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import requests
+
+from .http import ClienteHTTP
+
+URL_OSRM = "http://router.project-osrm.org"
+RUTA_CACHE_RUTAS = "cache_rutas.sqlite"
+# Coordenadas máximas por petición al servicio /table (límite del servidor público)
+MAX_COORDENADAS_TABLA = 100
+
+
+class OSRMAPI:
+    """Clase para manejar las interacciones con el servicio de rutas OSRM"""
+    def __init__(self, base_url: str = URL_OSRM, perfil: str = 'driving',
+                 max_coordenadas_tabla: int = MAX_COORDENADAS_TABLA, **opciones_http):
+        self.base_url = base_url
+        self.perfil = perfil
+        self.max_coordenadas_tabla = max(2, max_coordenadas_tabla)
+        self.cliente = ClienteHTTP(base_url, **opciones_http)
+
+    @staticmethod
+    def _coordenadas_url(coordenadas: Sequence[Tuple[float, float]]) -> str:
+        """Convierte pares (lat, lon) al formato 'lon,lat;lon,lat' de OSRM"""
+        return ';'.join(f"{lon},{lat}" for lat, lon in coordenadas)
+
+    def ruta(self, coordenadas: Sequence[Tuple[float, float]]) -> Optional[Dict]:
+        """Pide la ruta que pasa por las coordenadas (lat, lon) dadas; None si falla"""
+        try:
+            response = self.cliente.get(
+                f"route/v1/{self.perfil}/{self._coordenadas_url(coordenadas)}",
+                params={'overview': 'full', 'geometries': 'polyline', 'steps': 'true'}
+            )
+        except requests.exceptions.RequestException:
+            return None
+        if response.status_code != 200:
+            return None
+        data = response.json()
+        return data if data.get('code', 'Ok') == 'Ok' and data.get('routes') else None
+
+    def _peticion_tabla(self, coordenadas: Sequence[Tuple[float, float]],
+                        fuentes: Optional[List[int]] = None,
+                        destinos: Optional[List[int]] = None) -> Optional[Dict]:
+        """Una petición /table; sin índices OSRM calcula todas contra todas"""
+        params = {'annotations': 'duration,distance'}
+        if fuentes is not None:
+            params['sources'] = ';'.join(map(str, fuentes))
+        if destinos is not None:
+            params['destinations'] = ';'.join(map(str, destinos))
+        try:
+            response = self.cliente.get(
+                f"table/v1/{self.perfil}/{self._coordenadas_url(coordenadas)}", params=params
+            )
+        except requests.exceptions.RequestException:
+            return None
+        if response.status_code != 200:
+            return None
+        data = response.json()
+        return data if data.get('code', 'Ok') == 'Ok' and 'durations' in data else None
+
+    def tabla(self, origenes: Sequence[Tuple[float, float]],
+              destinos: Optional[Sequence[Tuple[float, float]]] = None,
+              antes_de_peticion: Optional[Callable[[], None]] = None
+              ) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Matrices de duración y distancia entre coordenadas (lat, lon) con el servicio /table.
+
+        Si todas las coordenadas caben en una petición se hace una sola; si no, se
+        divide en bloques de orígenes × destinos que respetan max_coordenadas_tabla.
+        antes_de_peticion se llama antes de pedir cada bloque; puede lanzar una
+        excepción para detener la tabla (p. ej. al cancelar un cálculo).
+
+        Returns:
+            (duraciones en segundos, distancias en metros) de forma (origenes, destinos),
+            con NaN donde no hay ruta, o None si el servicio falla
+        """
+        origenes = list(origenes)
+        destinos = origenes if destinos is None else list(destinos)
+        n, m = len(origenes), len(destinos)
+        duraciones = np.full((n, m), np.nan)
+        distancias = np.full((n, m), np.nan)
+        if n == 0 or m == 0:
+            return duraciones, distancias
+
+        maximo = self.max_coordenadas_tabla
+        if destinos is origenes and n <= maximo:
+            bloques = [((0, n), (0, m), origenes, None, None)]
+        elif n + m <= maximo:
+            bloques = [((0, n), (0, m), origenes + destinos,
+                        list(range(n)), list(range(n, n + m)))]
+        else:
+            # Bloques de orígenes y destinos que juntos no pasan del máximo
+            paso_origen = max(1, min(n, maximo // 2))
+            paso_destino = maximo - paso_origen
+            bloques = []
+            for i in range(0, n, paso_origen):
+                bloque_origen = origenes[i:i + paso_origen]
+                for j in range(0, m, paso_destino):
+                    bloque_destino = destinos[j:j + paso_destino]
+                    k = len(bloque_origen)
+                    bloques.append((
+                        (i, i + k), (j, j + len(bloque_destino)),
+                        bloque_origen + bloque_destino,
+                        list(range(k)), list(range(k, k + len(bloque_destino)))
+                    ))
+
+        for (i0, i1), (j0, j1), coordenadas, fuentes, indices_destino in bloques:
+            if antes_de_peticion is not None:
+                antes_de_peticion()
+            data = self._peticion_tabla(coordenadas, fuentes, indices_destino)
+            if data is None:
+                return None
+            duraciones[i0:i1, j0:j1] = np.array(data['durations'], dtype=float)
+            if data.get('distances') is not None:
+                distancias[i0:i1, j0:j1] = np.array(data['distances'], dtype=float)
+        return duraciones, distancias
@@ -1,4 +1,6 @@
 # Paquete core (lógica de negocio)
 from .gestor import GestorDirecciones
+from .gtfs import ImportadorGTFS
+from .importacion import ImportadorLotes
 
-__all__ = ['GestorDirecciones']
\ No newline at end of file
+__all__ = ['GestorDirecciones', 'ImportadorGTFS', 'ImportadorLotes']
\ No newline at end of file
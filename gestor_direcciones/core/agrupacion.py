@@ -0,0 +1,72 @@
+# Importaciones estándar
+import math
+from typing import Sequence, Tuple
+
+# Importaciones de terceros
+import numpy as np
+
+TAMANO_GRUPO_PX = 60  # Lado en píxeles de pantalla de cada celda de agrupación
+ZOOM_SIN_AGRUPAR = 17  # Desde este zoom cada punto se muestra por separado
+LATITUD_MAXIMA = 85.05112878  # Límite de la proyección Web Mercator
+
+
+def proyectar(lats: np.ndarray, lons: np.ndarray, zoom: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Convierte coordenadas a píxeles del mundo Web Mercator en un nivel de zoom"""
+    escala = 256.0 * 2 ** zoom
+    lat = np.radians(np.clip(lats, -LATITUD_MAXIMA, LATITUD_MAXIMA))
+    x = (np.asarray(lons) + 180.0) / 360.0 * escala
+    y = (1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / math.pi) / 2.0 * escala
+    return x, y
+
+
+def en_vista(lats: np.ndarray, lons: np.ndarray, limites: Sequence[float]) -> np.ndarray:
+    """
+    Posiciones de los puntos dentro de una vista (sur, oeste, norte, este).
+
+    Leaflet da longitudes fuera de [-180, 180] al desplazarse por el
+    antimeridiano; se normalizan antes de comparar.
+    """
+    sur, oeste, norte, este = limites
+    dentro = (lats >= sur) & (lats <= norte)
+    if este - oeste < 360.0:
+        oeste = (oeste + 180.0) % 360.0 - 180.0
+        este = (este + 180.0) % 360.0 - 180.0
+        if oeste <= este:
+            dentro &= (lons >= oeste) & (lons <= este)
+        else:
+            dentro &= (lons >= oeste) | (lons <= este)
+    return np.flatnonzero(dentro)
+
+
+def agrupar_en_vista(lats: np.ndarray, lons: np.ndarray, limites: Sequence[float], zoom: int,
+                     tamano_px: int = TAMANO_GRUPO_PX) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Agrupa los puntos visibles en una rejilla fija de píxeles del zoom dado.
+
+    Las celdas dependen sólo del zoom, no de la vista, así que un grupo no
+    cambia al desplazar el mapa; sólo se procesan los puntos dentro de la vista.
+
+    Args:
+        lats, lons: Coordenadas de todos los puntos
+        limites: (sur, oeste, norte, este) de la vista
+        zoom: Nivel de zoom del mapa
+        tamano_px: Lado de cada celda en píxeles de pantalla
+
+    Returns:
+        Tupla (lats, lons, cantidades, representantes) con un elemento por
+        grupo: el centroide, cuántos puntos reúne y la posición de uno de ellos
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    indices = en_vista(lats, lons, limites)
+    if zoom >= ZOOM_SIN_AGRUPAR or not len(indices):
+        return lats[indices], lons[indices], np.ones(len(indices), dtype=np.int64), indices
+
+    x, y = proyectar(lats[indices], lons[indices], zoom)
+    # Las celdas de una fila caben de sobra en 32 bits hasta el zoom máximo
+    celdas = (np.floor(x / tamano_px).astype(np.int64) << 32) | np.floor(y / tamano_px).astype(np.int64)
+    _, primeros, inversa, cantidades = np.unique(celdas, return_index=True, return_inverse=True,
+                                                 return_counts=True)
+    lat_grupo = np.bincount(inversa, weights=lats[indices]) / cantidades
+    lon_grupo = np.bincount(inversa, weights=lons[indices]) / cantidades
+    return lat_grupo, lon_grupo, cantidades, indices[primeros]
@@ -0,0 +1,127 @@
+# Importaciones estándar
+import random
+from math import asin, sin, sqrt
+from typing import Callable, List, Optional
+
+# Importaciones de terceros
+import numpy as np
+
+# Importaciones propias
+from .distancias import RADIO_TIERRA_KM
+from .grafo_compacto import INFINITO, GrafoCompacto
+
+Heuristica = Callable[[int], float]
+
+
+def factor_haversine(grafo: GrafoCompacto, peso: Optional[str]) -> float:
+    """
+    Mayor factor f tal que f * haversine(u, v) <= costo(u, v) en todas las aristas.
+
+    Con él, f * haversine(nodo, destino) es una cota inferior admisible del costo
+    restante aunque el peso no sea una distancia (p. ej. duración).
+    """
+    if grafo.numero_aristas == 0:
+        return 0.0
+    origenes = grafo.origenes()
+    destinos = np.frombuffer(grafo.destinos, dtype=np.int64)
+    lat = np.frombuffer(grafo.lat, dtype=np.float64)
+    lon = np.frombuffer(grafo.lon, dtype=np.float64)
+    a = (np.sin((lat[destinos] - lat[origenes]) / 2) ** 2 +
+         np.cos(lat[origenes]) * np.cos(lat[destinos]) * np.sin((lon[destinos] - lon[origenes]) / 2) ** 2)
+    rectas = 2 * RADIO_TIERRA_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+    costos = (np.frombuffer(grafo.pesos[peso], dtype=np.float64) if peso
+              else np.ones(len(destinos)))
+    validas = rectas > 1e-9  # NaN (nodos sin coordenadas) también queda fuera
+    if not validas.any():
+        return 0.0
+    factor = float(np.min(costos[validas] / rectas[validas]))
+    # Pequeño margen para que el redondeo no vuelva la cota inadmisible
+    return max(0.0, factor * (1 - 1e-9))
+
+
+def heuristica_haversine(grafo: GrafoCompacto, destino: int, factor: float) -> Optional[Heuristica]:
+    """Heurística f * distancia en línea recta al destino (0 para nodos sin coordenadas)"""
+    lat_d, lon_d, cos_d = grafo.lat[destino], grafo.lon[destino], grafo.cos_lat[destino]
+    if factor <= 0 or lat_d != lat_d:
+        return None
+    lat, lon, cos_lat = grafo.lat, grafo.lon, grafo.cos_lat
+    escala = factor * 2 * RADIO_TIERRA_KM
+
+    def h(nodo):
+        a = sin((lat_d - lat[nodo]) / 2) ** 2 + cos_lat[nodo] * cos_d * sin((lon_d - lon[nodo]) / 2) ** 2
+        return escala * asin(min(1.0, sqrt(a))) if a == a else 0
+    return h
+
+
+class Landmarks:
+    """
+    Distancias precalculadas desde y hacia unos cuantos nodos de referencia (ALT).
+
+    Por la desigualdad del triángulo, |d(L, t) - d(L, v)| acota por abajo d(v, t),
+    lo que da una heurística mucho más informada que la línea recta cuando los
+    pesos no se parecen a la distancia geográfica.
+    """
+
+    def __init__(self, grafo: GrafoCompacto, peso: Optional[str], cantidad: int = 8, semilla: int = 0):
+        """
+        Args:
+            grafo: Instantánea del grafo sobre la que se calculan las distancias
+            peso: Atributo de arista a minimizar (None cuenta saltos)
+            cantidad: Número de landmarks
+            semilla: Semilla para elegir el primer landmark
+        """
+        self.grafo = grafo
+        self.peso = peso
+        self.nodos: List[int] = []
+        self.desde: List[List[float]] = []  # d(L, v)
+        self.hacia: List[List[float]] = []  # d(v, L); igual a 'desde' en grafos no dirigidos
+        n = len(grafo)
+        if n == 0:
+            return
+        invertido = grafo.invertido()
+
+        # Selección "más lejano": cada landmark nuevo maximiza la distancia a los anteriores;
+        # los nodos inalcanzables (otra componente) tienen distancia infinita y van primero
+        candidato = random.Random(semilla).randrange(n)
+        minimas = np.full(n, INFINITO)
+        for _ in range(min(cantidad, n)):
+            desde, _ = grafo.buscar(candidato, peso)
+            hacia = invertido.buscar(candidato, peso)[0] if grafo.dirigido else desde
+            self.nodos.append(candidato)
+            self.desde.append(desde)
+            self.hacia.append(hacia)
+            minimas = np.minimum(minimas, desde)
+            minimas[self.nodos] = -1
+            candidato = int(np.argmax(minimas))
+            if minimas[candidato] < 0:
+                break
+
+    def heuristica(self, destino: int) -> Heuristica:
+        """Cota inferior ALT del costo de cada nodo al destino"""
+        referencias = [
+            (desde, hacia, desde[destino], hacia[destino])
+            for desde, hacia in zip(self.desde, self.hacia)
+        ]
+
+        def h(nodo):
+            # Con infinitos las restas pueden dar NaN, que nunca supera a 'mejor'
+            mejor = 0
+            for desde, hacia, desde_t, hacia_t in referencias:
+                d = desde_t - desde[nodo]
+                if d > mejor:
+                    mejor = d
+                d = hacia[nodo] - hacia_t
+                if d > mejor:
+                    mejor = d
+            return mejor
+        return h
+
+
+def combinar_heuristicas(*heuristicas: Optional[Heuristica]) -> Optional[Heuristica]:
+    """Máximo de varias heurísticas consistentes (sigue siendo consistente)"""
+    activas = [h for h in heuristicas if h is not None]
+    if not activas:
+        return None
+    if len(activas) == 1:
+        return activas[0]
+    return lambda nodo: max(h(nodo) for h in activas)
@@ -0,0 +1,50 @@
+# Importaciones estándar
+from typing import Optional
+
+# Importaciones de terceros
+import numpy as np
+
+RADIO_TIERRA_KM = 6371
+
+# Filas calculadas por bloque para acotar la memoria temporal
+FILAS_POR_BLOQUE = 1024
+
+
+def haversine(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Distancia haversine en km entre arreglos de coordenadas en grados (con broadcasting)"""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(x, dtype=np.float64))
+                              for x in (lat1, lon1, lat2, lon2))
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * RADIO_TIERRA_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def matriz_haversine(lats, lons, lats_destino=None, lons_destino=None,
+                     dtype=np.float64, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Calcula la matriz de distancias haversine (km) entre dos conjuntos de puntos.
+
+    Si no se dan destinos se calcula la matriz N×N del primer conjunto. El cálculo
+    se hace por bloques de filas en float64 y se guarda en el tipo pedido.
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    if lats_destino is None:
+        lats_destino, lons_destino = lats, lons
+    lats_destino = np.asarray(lats_destino, dtype=np.float64)
+    lons_destino = np.asarray(lons_destino, dtype=np.float64)
+
+    if out is None:
+        out = np.empty((len(lats), len(lats_destino)), dtype=dtype)
+
+    # Precalcular senos y cosenos una sola vez por punto
+    phi1, lam1 = np.radians(lats), np.radians(lons)
+    phi2, lam2 = np.radians(lats_destino), np.radians(lons_destino)
+    cos2 = np.cos(phi2)
+    for inicio in range(0, len(lats), FILAS_POR_BLOQUE):
+        fin = inicio + FILAS_POR_BLOQUE
+        p1 = phi1[inicio:fin, None]
+        a = (np.sin((phi2 - p1) / 2) ** 2
+             + np.cos(p1) * cos2 * np.sin((lam2 - lam1[inicio:fin, None]) / 2) ** 2)
+        out[inicio:fin] = 2 * RADIO_TIERRA_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+    return out
@@ -0,0 +1,134 @@
+# Importaciones estándar
+import math
+from typing import Iterable, List, Sequence, Tuple
+
+# Importaciones de terceros
+import numpy as np
+
+# Importaciones propias
+from .distancias import RADIO_TIERRA_KM
+
+METROS_POR_GRADO = math.pi * RADIO_TIERRA_KM * 1000 / 180
+METROS_POR_PIXEL_Z0 = 156543.03392  # Resolución de Web Mercator en el ecuador con zoom 0
+PIXELES_TOLERANCIA = 1.0  # Error máximo al simplificar, en píxeles de pantalla
+NIVELES_ZOOM = (8, 11, 14, 17)  # Zoom desde el que se usa cada nivel de detalle
+TOLERANCIA_MINIMA_M = 0.25  # Desviaciones menores no se distinguen en ningún zoom
+DECIMALES_MAPA = 5  # Precisión de las coordenadas que se envían al mapa (≈ 1 m)
+
+
+def como_arreglo(geometria) -> np.ndarray:
+    """
+    Convierte una geometría a un arreglo (n, 2) de [lat, lon].
+
+    Acepta arreglos, listas de pares (lat, lon) o de dicts {'lat', 'lon'};
+    un arreglo float64 con la forma correcta se devuelve sin copiarlo.
+    """
+    if isinstance(geometria, np.ndarray):
+        return np.asarray(geometria, dtype=np.float64).reshape(-1, 2)
+    geometria = list(geometria) if geometria is not None else []
+    if not geometria:
+        return np.empty((0, 2))
+    if isinstance(geometria[0], dict):
+        geometria = [(p['lat'], p['lon']) for p in geometria]
+    return np.asarray(geometria, dtype=np.float64).reshape(-1, 2)
+
+
+def unir(tramos: Iterable) -> np.ndarray:
+    """Une geometrías consecutivas sin repetir el punto donde termina una y empieza la siguiente"""
+    partes: List[np.ndarray] = []
+    for tramo in tramos:
+        puntos = como_arreglo(tramo)
+        if partes and len(puntos) and len(partes[-1]) and np.array_equal(puntos[0], partes[-1][-1]):
+            puntos = puntos[1:]
+        partes.append(puntos)
+    return np.concatenate(partes) if partes else np.empty((0, 2))
+
+
+def tolerancia_zoom(zoom: float, lat: float = 0.0) -> float:
+    """Metros que abarcan PIXELES_TOLERANCIA píxeles en un zoom y latitud dados"""
+    return PIXELES_TOLERANCIA * METROS_POR_PIXEL_Z0 * math.cos(math.radians(lat)) / 2 ** zoom
+
+
+def importancia_douglas_peucker(puntos, tolerancia_minima: float = TOLERANCIA_MINIMA_M) -> np.ndarray:
+    """
+    Calcula para cada punto la tolerancia (en metros) hasta la que lo conserva Douglas–Peucker.
+
+    Se recorre el algoritmo una sola vez sin tolerancia; la importancia de
+    un punto es su distancia al segmento que lo partió, acotada por la de su
+    padre (si el padre se descarta, sus hijos también). Así la simplificación
+    con tolerancia t son exactamente los puntos con importancia > t, para
+    cualquier t >= tolerancia_minima. Los extremos tienen importancia infinita.
+    """
+    puntos = como_arreglo(puntos)
+    n = len(puntos)
+    importancia = np.zeros(n)
+    if n == 0:
+        return importancia
+    importancia[[0, -1]] = np.inf
+    if n < 3:
+        return importancia
+
+    # Plano local equirectangular en metros: suficiente a la escala de una ruta
+    coseno = math.cos(math.radians(float(np.mean(puntos[:, 0]))))
+    y = puntos[:, 0] * METROS_POR_GRADO
+    x = puntos[:, 1] * METROS_POR_GRADO * coseno
+
+    # Cada ronda procesa juntos todos los segmentos pendientes de un nivel del árbol
+    inicios = np.array([0])
+    fines = np.array([n - 1])
+    topes = np.array([np.inf])
+    while len(inicios):
+        internos = fines - inicios - 1
+        validos = internos > 0
+        inicios, fines, topes, internos = inicios[validos], fines[validos], topes[validos], internos[validos]
+        if not len(inicios):
+            break
+        segmento = np.repeat(np.arange(len(inicios)), internos)
+        desplazamiento = np.arange(len(segmento)) - np.repeat(np.cumsum(internos) - internos, internos)
+        k = inicios[segmento] + 1 + desplazamiento
+        a, b = inicios[segmento], fines[segmento]
+        px, py = x[k] - x[a], y[k] - y[a]
+        dx, dy = x[b] - x[a], y[b] - y[a]
+        largo2 = dx * dx + dy * dy
+        # Distancia al segmento (no a la recta) para manejar idas y vueltas
+        t = np.clip(np.divide(px * dx + py * dy, largo2, out=np.zeros_like(px), where=largo2 > 0), 0.0, 1.0)
+        distancias = np.hypot(px - t * dx, py - t * dy)
+
+        # Punto más lejano de cada segmento: el primero con la distancia máxima
+        maximos = np.maximum.reduceat(distancias, np.cumsum(internos) - internos)
+        en_maximo = np.flatnonzero(distancias == maximos[segmento])
+        _, primeros = np.unique(segmento[en_maximo], return_index=True)
+        elegidos = k[en_maximo[primeros]]
+        # Segmentos por debajo de cualquier tolerancia útil no se siguen partiendo
+        partir = maximos > tolerancia_minima
+        elegidos, inicios, fines = elegidos[partir], inicios[partir], fines[partir]
+        importancia[elegidos] = np.minimum(maximos[partir], topes[partir])
+        inicios, fines = np.concatenate([inicios, elegidos]), np.concatenate([elegidos, fines])
+        topes = np.tile(importancia[elegidos], 2)
+    return importancia
+
+
+def simplificar(puntos, tolerancia_m: float, importancia=None) -> np.ndarray:
+    """Douglas–Peucker con tolerancia en metros (reutiliza la importancia si ya se calculó)"""
+    puntos = como_arreglo(puntos)
+    if importancia is None:
+        importancia = importancia_douglas_peucker(puntos)
+    return puntos[importancia > tolerancia_m]
+
+
+def niveles_detalle(puntos, zooms: Sequence[int] = NIVELES_ZOOM,
+                    decimales: int = DECIMALES_MAPA) -> List[Tuple[int, np.ndarray]]:
+    """
+    Versiones simplificadas de una geometría para varios niveles de zoom.
+
+    Returns:
+        Lista de (zoom desde el que aplica, puntos) de menor a mayor detalle;
+        las coordenadas se redondean para que el envío al mapa sea compacto
+    """
+    puntos = como_arreglo(puntos)
+    if not len(puntos):
+        return []
+    importancia = importancia_douglas_peucker(puntos)
+    latitud = float(np.mean(puntos[:, 0]))
+    return [(zoom, np.round(simplificar(puntos, tolerancia_zoom(zoom, latitud), importancia), decimales))
+            for zoom in sorted(zooms)]
@@ -1,30 +1,117 @@
 # Importaciones estándar
+import functools
 import json
 import heapq
 import math
-import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from math import radians, sin, cos, sqrt, atan2
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 from datetime import datetime
 
 # Importaciones de terceros
 import networkx as nx
-import requests
+import numpy as np
 import polyline
 import folium
 import branca
+from folium.plugins import FastMarkerCluster
 
 # Importaciones propias
+from ..api.cache import CacheRutas
+from ..api.geocodificadores import (GeocodificadorCadena, GeocodificadorLocal,
+                                    GeocodificadorNominatim, normalizar_direccion)
 from ..api.nominatim import NominatimAPI
+from ..api.osrm import OSRMAPI, RUTA_CACHE_RUTAS
+from .agrupacion import agrupar_en_vista
+from .busqueda import Landmarks, combinar_heuristicas, factor_haversine, heuristica_haversine
+from .distancias import haversine, matriz_haversine
+from .geometria import como_arreglo, simplificar, tolerancia_zoom, unir
+from .grafo_compacto import INFINITO, GrafoCompacto
+from .horarios import HOLGURA_TRANSBORDOS, Hora, Horario, a_segundos, formatear_hora
+from .indice_espacial import IndiceEspacial
+from .jerarquia import JerarquiaContraccion
+from .matriz_costos import MatrizCostos
+from .multimodal import (MIN_POR_KM_PIE, PIE, RADIO_TRANSBORDO_KM, construir_red_multimodal,
+                         desplegar_camino)
+from .optimizacion import (MAX_DESTINOS_AUTO_EXACTO, Progreso, RutaCancelada, comprobar_cancelacion,
+                           held_karp, ruta_heuristica)
+from .transbordos import BusquedaTransbordos
+
+# Peticiones simultáneas máximas al pedir los tramos de una ruta
+MAX_TRAMOS_SIMULTANEOS = 8
+
+# Paradas intermedias a partir de las cuales el mapa de una ruta las agrupa
+MAX_MARCADORES_RUTA = 100
+
+# Zoom hasta el que el trazado del mapa exportado no pierde detalle visible
+ZOOM_DETALLE_MAPA = 17
+
+# Atributo de arista de cada criterio cuando se pide por nombre de criterio
+PESOS_CRITERIO = {'tiempo': 'duracion'}
+
+# Marcador de una parada intermedia agrupada; el popup se arma al abrirlo
+MARCADOR_PARADA_JS = """
+function (fila) {
+    var marcador = L.circleMarker(new L.LatLng(fila[0], fila[1]),
+                                  {radius: 6, color: '%s', fillOpacity: 0.8});
+    marcador.bindTooltip('Punto ' + fila[2]);
+    marcador.bindPopup(function () {
+        var contenido = document.createElement('div');
+        var nombre = document.createElement('b');
+        var tipo = document.createElement('i');
+        nombre.textContent = fila[2] + '. ' + fila[3];
+        tipo.textContent = 'Tipo: ' + fila[4];
+        contenido.append(nombre, document.createElement('br'), tipo);
+        return contenido;
+    }, {maxWidth: 300});
+    return marcador;
+}
+"""
+
+def _sincronizado(metodo):
+    """
+    Ejecuta el método con el candado del gestor.
+    
+    Los cálculos de rutas corren en otro hilo y llenan las cachés derivadas
+    de los grafos; los cambios a los grafos esperan a que terminen para no
+    vaciarlas a medio cálculo ni guardar resultados de un grafo ya cambiado.
+    """
+    @functools.wraps(metodo)
+    def envoltura(self, *args, **kwargs):
+        with self.bloqueo:
+            return metodo(self, *args, **kwargs)
+    return envoltura
+
 
 class GestorDirecciones:
     """Clase mejorada para gestionar direcciones, rutas y transporte público"""
     
-    def __init__(self):
-        self.api = NominatimAPI()
+    def __init__(self, directorio_cache: Optional[str] = None):
+        """
+        Args:
+            directorio_cache: Dónde guardar las cachés de geocodificación, rutas y el
+                índice del nomenclátor (None = directorio de caché de la aplicación, ver api.cache)
+        """
+        self.directorio_cache = directorio_cache
+        self.api = NominatimAPI(directorio_cache=directorio_cache)
+        self.geocodificador = GeocodificadorNominatim(self.api)
+        self.osrm = OSRMAPI()
+        # Rutas OSRM ya procesadas
+        self.cache_rutas = CacheRutas(RUTA_CACHE_RUTAS, directorio=directorio_cache)
+        self.bloqueo = threading.RLock()  # Ver _sincronizado
         self.direcciones = {}
+        self._claves_normalizadas = {}  # Dirección guardada -> texto normalizado (sugerencias)
         self.grafo = nx.Graph()
         self.transporte_grafo = nx.MultiDiGraph()  # Grafo para transporte público
+        self._compactos = {}  # Instantáneas CSR de cada grafo para las búsquedas
+        self._matrices = {}  # Caché de costos por (grafo, peso)
+        self._factores_haversine = {}  # Escala de la heurística A* por (grafo, peso)
+        self._landmarks = {}  # Landmarks ALT por (grafo, peso)
+        self._jerarquias = {}  # Jerarquías de contracción del grafo privado por peso
+        self.horario = Horario()  # Horarios de transporte público para rutas por hora
+        self.indice = IndiceEspacial()  # Índice espacial sobre las coordenadas
+        self.conexion_automatica_k = 0  # Vecinos a conectar al agregar direcciones (0 = no)
     
     def agregar_direccion(self, direccion: str) -> Optional[Dict]:
         """Agrega una nueva dirección consultando Nominatim API"""
@@ -34,19 +121,34 @@ class GestorDirecciones:
         if direccion in self.direcciones:
             return self.direcciones[direccion]
             
-        params = {
-            'q': direccion,
-            'format': 'json',
-            'addressdetails': 1,
-            'limit': 1
-        }
+        try:
+            info_direccion = self.geocodificar(direccion)
+        except ConnectionError:
+            return None
+        if info_direccion is None:
+            return None
         
-        data = self.api.hacer_peticion(params)
-        if not data or len(data) == 0:
+        self.registrar_direccion(direccion, info_direccion)
+        return info_direccion
+    
+    def geocodificar(self, direccion: str) -> Optional[Dict]:
+        """
+        Consulta las coordenadas de una dirección sin modificar el gestor.
+        
+        Devuelve None si la dirección no existe y lanza ConnectionError si
+        el servicio no respondió (para poder reintentarla más tarde).
+        """
+        data = self.geocodificador.buscar(direccion)
+        if data is None:
+            raise ConnectionError("El servicio de geocodificación no respondió")
+        if len(data) == 0:
             return None
-            
-        resultado = data[0]
-        info_direccion = {
+        return self._info_resultado(data[0])
+    
+    @staticmethod
+    def _info_resultado(resultado: Dict) -> Dict:
+        """Convierte un resultado con formato de Nominatim en la información que se guarda"""
+        return {
             'direccion': resultado.get('display_name'),
             'coordenadas': {
                 'lat': float(resultado['lat']),
@@ -57,11 +159,100 @@ class GestorDirecciones:
             'tipo': resultado['type'],
             'categoria': resultado.get('class')
         }
+    
+    def sugerir_direcciones(self, texto: str, limite: int = 8) -> List[Dict]:
+        """
+        Sugerencias para un texto a medio escribir, sin consultar servicios remotos.
+        
+        Primero las direcciones guardadas que lo contienen (las que empiezan
+        con él van antes) y después las del nomenclátor local o de la caché
+        del geocodificador.
+        
+        Returns:
+            Lista de {'direccion', 'origen' ('guardada' o 'geocodificador'), 'info'}
+        """
+        buscado = normalizar_direccion(texto)
+        if not buscado:
+            return []
         
+        claves = self._claves_normalizadas
+        for direccion in self.direcciones.keys() - claves.keys():
+            claves[direccion] = normalizar_direccion(direccion)
+        al_inicio, dentro = [], []
+        for direccion, clave in claves.items():
+            if buscado in clave and direccion in self.direcciones:
+                (al_inicio if clave.startswith(buscado) else dentro).append(direccion)
+        guardadas = sorted(al_inicio, key=len) + sorted(dentro, key=len)
+        sugerencias = [{'direccion': d, 'origen': 'guardada', 'info': self.direcciones[d]}
+                       for d in guardadas[:limite]]
+        
+        vistas = {s['info'].get('direccion') for s in sugerencias}
+        if len(sugerencias) < limite:
+            for resultado in self.geocodificador.sugerir(texto, limite - len(sugerencias)):
+                info = self._info_resultado(resultado)
+                if info['direccion'] in vistas:
+                    continue
+                vistas.add(info['direccion'])
+                sugerencias.append({'direccion': info['direccion'], 'origen': 'geocodificador',
+                                    'info': info})
+        return sugerencias
+    
+    def usar_nomenclator(self, archivo: str, tabla: str = 'nomenclator'):
+        """Consulta primero un nomenclátor local (CSV/SQLite) y después Nominatim"""
+        self.geocodificador = GeocodificadorCadena([
+            GeocodificadorLocal(archivo, tabla, directorio_cache=self.directorio_cache),
+            GeocodificadorNominatim(self.api)
+        ])
+    
+    @_sincronizado
+    def registrar_direccion(self, direccion: str, info_direccion: Dict):
+        """Guarda una dirección ya geocodificada y actualiza grafo e índice"""
+        self._insertar_direccion(direccion, info_direccion)
+        # El nodo nuevo no está en las instantáneas, matrices ni jerarquías de
+        # ningún grafo (y en la red combinada puede quedar a pie de alguna parada)
+        for clave in ('privado', 'publico'):
+            self._grafo_modificado(clave)
+        if self.conexion_automatica_k:
+            self._conectar_con_cercanas(direccion, self.conexion_automatica_k)
+    
+    @_sincronizado
+    def registrar_red_transporte(self, paradas: Dict[str, Dict], rutas: Iterable[Dict]) -> int:
+        """
+        Registra en lote paradas nuevas y recorridos de transporte (p. ej. de un GTFS).
+        
+        Hace lo mismo que registrar_direccion por cada parada y agregar un
+        recorrido por cada ruta, pero con el candado tomado una sola vez y
+        actualizando las estructuras derivadas de los grafos sólo al final.
+        
+        Args:
+            paradas: Dirección -> información geocodificada (como en registrar_direccion);
+                las que ya existen se conservan
+            rutas: Recorridos con 'paradas', 'tipo', 'linea' y opcionalmente
+                'duraciones' y 'distancias'
+            
+        Returns:
+            Número de paradas nuevas
+        """
+        nuevas = [d for d in paradas if d not in self.direcciones]
+        for direccion in nuevas:
+            self._insertar_direccion(direccion, paradas[direccion])
+        if self.conexion_automatica_k:
+            for direccion in nuevas:
+                self._conectar_con_cercanas(direccion, self.conexion_automatica_k, notificar=False)
+        for ruta_data in rutas:
+            self._insertar_ruta_transporte(ruta_data)
+        for clave in ('privado', 'publico'):
+            self._grafo_modificado(clave)
+        return len(nuevas)
+    
+    def _insertar_direccion(self, direccion: str, info_direccion: Dict):
+        """Agrega la dirección al diccionario, al grafo y al índice (sin invalidar nada)"""
         self.direcciones[direccion] = info_direccion
         self.grafo.add_node(direccion, **info_direccion)
-        return info_direccion
+        self.indice.agregar(direccion, info_direccion['coordenadas']['lat'],
+                            info_direccion['coordenadas']['lon'])
     
+    @_sincronizado
     def conectar_direcciones(self, dir1: str, dir2: str, metadata: Dict = None):
         """Conecta dos direcciones en el grafo con metadatos opcionales"""
         if dir1 in self.direcciones and dir2 in self.direcciones:
@@ -69,8 +260,105 @@ class GestorDirecciones:
                 metadata = {}
             if 'distancia' not in metadata:
                 metadata['distancia'] = self.calcular_distancia(dir1, dir2)
+            existia = self.grafo.has_edge(dir1, dir2)
             self.grafo.add_edge(dir1, dir2, **metadata)
+            self._grafo_modificado('privado', None if existia else (dir1, dir2, metadata))
+    
+    @_sincronizado
+    def conectar_vecinos_cercanos(self, k: int = 5, incremental: bool = True) -> int:
+        """
+        Conecta en lote cada dirección con sus k vecinas más cercanas.
+        
+        Las distancias se calculan en bloques vectorizados y las aristas existentes
+        (con sus metadatos) se conservan.
+        
+        Args:
+            k: Número de vecinos por dirección
+            incremental: Si es True, las direcciones agregadas después también se conectan
+            
+        Returns:
+            Número de aristas nuevas
+        """
+        vecinos, distancias = self.indice.k_vecinos_todos(k)
+        claves = self.indice.claves
+        
+        # Pares únicos (i < j) con su distancia
+        filas = np.repeat(np.arange(len(claves)), vecinos.shape[1])
+        columnas = vecinos.ravel()
+        valores = distancias.ravel()
+        validos = columnas >= 0
+        filas, columnas, valores = filas[validos], columnas[validos], valores[validos]
+        pares = np.stack([np.minimum(filas, columnas), np.maximum(filas, columnas)], axis=1)
+        pares, unicos = np.unique(pares, axis=0, return_index=True)
+        valores = valores[unicos]
+        
+        aristas = [
+            (claves[i], claves[j], {'distancia': float(d), 'automatica': True})
+            for (i, j), d in zip(pares.tolist(), valores.tolist())
+            if not self.grafo.has_edge(claves[i], claves[j])
+        ]
+        self.grafo.add_edges_from(aristas)
+        self._grafo_modificado('privado')
+        self.conexion_automatica_k = k if incremental else 0
+        return len(aristas)
+    
+    def _conectar_con_cercanas(self, direccion: str, k: int, notificar: bool = True):
+        """
+        Conecta una dirección nueva con sus k vecinas más cercanas.
+        
+        Con notificar=False sólo agrega las aristas; quien llama debe invocar
+        _grafo_modificado('privado') después.
+        """
+        coords = self.direcciones[direccion]['coordenadas']
+        cercanas = self.indice.k_cercanos(coords['lat'], coords['lon'], k + 1)
+        for vecina, distancia in [c for c in cercanas if c[0] != direccion][:k]:
+            if self.grafo.has_edge(direccion, vecina):
+                continue
+            if notificar:
+                self.conectar_direcciones(direccion, vecina,
+                                          {'distancia': distancia, 'automatica': True})
+            else:
+                self.grafo.add_edge(direccion, vecina, distancia=distancia, automatica=True)
+    
+    @_sincronizado
+    def _grafo_modificado(self, clave: str, arista: Optional[Tuple[str, str, Dict]] = None):
+        """Actualiza las estructuras derivadas de un grafo tras modificarlo"""
+        # La red combinada depende de ambos grafos: se reconstruye completa
+        if clave != 'combinado':
+            self._grafo_modificado('combinado')
+        # La instantánea compacta se vuelve a construir en la siguiente búsqueda
+        self._compactos.pop(clave, None)
+        dirigido = (self.transporte_grafo if clave == 'publico' else self.grafo).is_directed()
+        for (clave_grafo, peso), matriz in self._matrices.items():
+            if clave_grafo != clave:
+                continue
+            if arista is None:
+                matriz.invalidar()
+            else:
+                u, v, datos = arista
+                matriz.notificar_arista(u, v, datos.get(peso, 1) if peso else 1, dirigida=dirigido)
+        
+        # Una arista nueva puede acortar distancias: los landmarks dejan de ser cotas válidas
+        # y los atajos de las jerarquías pueden dejar de ser mínimos
+        if clave == 'privado':
+            self._jerarquias.clear()
+        for clave_grafo, peso in list(self._landmarks):
+            if clave_grafo == clave:
+                del self._landmarks[(clave_grafo, peso)]
+        for clave_grafo, peso in list(self._factores_haversine):
+            if clave_grafo != clave:
+                continue
+            if arista is None:
+                del self._factores_haversine[(clave_grafo, peso)]
+            else:
+                u, v, datos = arista
+                recta = self.calcular_distancia(u, v)
+                if recta > 1e-9:
+                    factor = self._factores_haversine[(clave_grafo, peso)]
+                    costo = datos.get(peso, 1) if peso else 1
+                    self._factores_haversine[(clave_grafo, peso)] = max(0.0, min(factor, costo / recta * (1 - 1e-9)))
     
+    @_sincronizado
     def cargar_json(self, archivo: str):
         """Carga direcciones desde un archivo JSON y reconstruye grafos"""
         try:
@@ -79,31 +367,58 @@ class GestorDirecciones:
                 self.direcciones = data.get('direcciones', {})
                 self.grafo = nx.Graph()
                 self.transporte_grafo = nx.MultiDiGraph()
+                self._compactos = {}
+                self._matrices = {}
+                self._factores_haversine = {}
+                self._landmarks = {}
+                self._jerarquias = {}
+                self.horario = (Horario.desde_dict(data['horario']) if 'horario' in data
+                                else Horario())
                 
                 # Reconstruir nodos
                 for direccion, info in self.direcciones.items():
                     self.grafo.add_node(direccion, **info)
                     self.transporte_grafo.add_node(direccion, **info)
+                self.indice.construir(
+                    (d, info['coordenadas']['lat'], info['coordenadas']['lon'])
+                    for d, info in self.direcciones.items()
+                )
                 
                 # Reconstruir aristas
                 for edge in data.get('grafo_edges', []):
                     self.grafo.add_edge(edge[0], edge[1], **edge[2])
                     
+                self.conexion_automatica_k = data.get('conexion_automatica_k', 0)
+                
+                # Jerarquías precalculadas: sólo si el grafo no cambió desde que se guardaron
+                for datos_jerarquia in data.get('jerarquias', []):
+                    jerarquia = JerarquiaContraccion.desde_dict(datos_jerarquia,
+                                                                self.grafo_compacto('privado'))
+                    if jerarquia is not None:
+                        self._jerarquias[jerarquia.peso] = jerarquia
+                    
                 # Reconstruir rutas de transporte si existen
                 if 'transporte_rutas' in data:
                     for ruta in data['transporte_rutas']:
-                        self._agregar_ruta_transporte(ruta)
+                        self._insertar_ruta_transporte(ruta)
+                    self._grafo_modificado('publico')
                         
         except Exception as e:
             raise IOError(f"Error al cargar archivo: {str(e)}")
     
+    @_sincronizado
     def guardar_json(self, archivo: str):
         """Guarda las direcciones y rutas en un archivo JSON"""
         data = {
             'direcciones': self.direcciones,
             'grafo_edges': list(self.grafo.edges(data=True)),
-            'transporte_rutas': self._obtener_rutas_transporte_para_guardar()
+            'transporte_rutas': self._obtener_rutas_transporte_para_guardar(),
+            'conexion_automatica_k': self.conexion_automatica_k
         }
+        if self._jerarquias:
+            data['jerarquias'] = [j.a_dict() for j in self._jerarquias.values()]
+        if len(self.horario):
+            data['horario'] = self.horario.a_dict()
         with open(archivo, 'w', encoding='utf-8') as f:
             json.dump(data, f, ensure_ascii=False, indent=2)
     
@@ -132,11 +447,80 @@ class GestorDirecciones:
         except Exception as e:
             raise ValueError(f"Error calculando distancia: {str(e)}")
     
+    def _arreglo_coordenadas(self, direcciones: Optional[Sequence[str]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Obtiene arreglos de latitudes y longitudes de las direcciones dadas (o de todas)"""
+        if direcciones is None:
+            direcciones = list(self.direcciones)
+        try:
+            coords = [self.direcciones[d]['coordenadas'] for d in direcciones]
+            lats = np.fromiter((c['lat'] for c in coords), dtype=np.float64, count=len(coords))
+            lons = np.fromiter((c['lon'] for c in coords), dtype=np.float64, count=len(coords))
+        except KeyError as e:
+            raise ValueError(f"La dirección {e} no existe")
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Coordenada inválida: {str(e)}")
+        return lats, lons
+    
+    def matriz_distancias(self, direcciones: Optional[Sequence[str]] = None,
+                          dtype=np.float64) -> np.ndarray:
+        """
+        Calcula en lote la matriz N×N de distancias haversine (km).
+        
+        Args:
+            direcciones: Direcciones a incluir, en orden (por defecto todas)
+            dtype: Tipo del resultado, p. ej. np.float32 para ahorrar memoria
+        """
+        lats, lons = self._arreglo_coordenadas(direcciones)
+        return matriz_haversine(lats, lons, dtype=dtype)
+    
+    def distancias_desde(self, origen: str, direcciones: Optional[Sequence[str]] = None,
+                         dtype=np.float64) -> np.ndarray:
+        """Calcula en lote las distancias haversine (km) de un origen a varias direcciones"""
+        lat, lon = self._arreglo_coordenadas([origen])
+        lats, lons = self._arreglo_coordenadas(direcciones)
+        return matriz_haversine(lat, lon, lats, lons, dtype=dtype)[0]
+    
+    def direcciones_cercanas(self, lat: float, lon: float, k: int = 5) -> List[Tuple[str, float]]:
+        """Las k direcciones más cercanas a un punto, con su distancia en km"""
+        return self.indice.k_cercanos(lat, lon, k)
+    
+    def direcciones_en_radio(self, lat: float, lon: float, radio_km: float) -> List[Tuple[str, float]]:
+        """Direcciones a menos de radio_km de un punto, ordenadas por distancia"""
+        return self.indice.en_radio(lat, lon, radio_km)
+    
+    def direcciones_en_rectangulo(self, lat_min: float, lon_min: float,
+                                  lat_max: float, lon_max: float) -> List[str]:
+        """Direcciones dentro de un rectángulo de coordenadas"""
+        return self.indice.en_rectangulo(lat_min, lon_min, lat_max, lon_max)
+    
     # --- Métodos para rutas óptimas ---
     
     def encontrar_ruta_optima(self, origen: str, destinos: List[str], 
-                         criterio: str = 'distancia', transporte: str = 'privado') -> Dict:
-        """Versión con manejo robusto de errores"""
+                         criterio: str = 'distancia', transporte: str = 'privado',
+                         regresar_origen: bool = False,
+                         destino_final: Optional[str] = None,
+                         metodo: str = 'auto', tiempo_limite: float = 2.0,
+                         usar_osrm: bool = False, hora_salida: Optional[Hora] = None,
+                         progreso: Optional[Progreso] = None,
+                         cancelar: Optional[threading.Event] = None) -> Dict:
+        """
+        Calcula el orden de visita óptimo desde un origen a varios destinos.
+        
+        Args:
+            metodo: 'exacto' (Held-Karp), 'heuristico' (vecino más cercano + 2-opt/Or-opt)
+                o 'auto' para elegir según el número de destinos
+            tiempo_limite: Segundos máximos para la mejora heurística
+            usar_osrm: Ordenar con distancias/tiempos reales por carretera (servicio
+                /table de OSRM) en lugar del grafo
+            hora_salida: Hora de salida ('HH:MM', segundos o datetime) para usar los
+                horarios de transporte público en lugar de duraciones fijas
+            progreso: Recibe (hechos, 100, mejor costo hasta ahora o None) mientras
+                se calculan los costos y se optimiza el orden
+            cancelar: Evento para detener el cálculo desde otro hilo (lanza RutaCancelada)
+        
+        El cálculo sobre los grafos se hace con el candado del gestor; con OSRM
+        sólo se toma para leer las coordenadas (ver _calcular_ruta_osrm).
+        """
         try:
             # Validación inicial de parámetros
             if not isinstance(origen, str) or not all(isinstance(d, str) for d in destinos):
@@ -146,99 +530,610 @@ class GestorDirecciones:
             criterio = criterio.lower()
             if criterio not in ['distancia', 'tiempo', 'transbordos']:
                 raise ValueError("Criterio debe ser 'distancia', 'tiempo' o 'transbordos'")
-                
-            # Resto de la implementación...
-            # ... (mantener el resto de tu implementación actual)
             
+            if metodo not in ['auto', 'exacto', 'heuristico']:
+                raise ValueError("Método debe ser 'auto', 'exacto' o 'heuristico'")
+            
+            if regresar_origen and destino_final:
+                raise ValueError("No se puede regresar al origen y terminar en otro destino")
+            
+            if usar_osrm and criterio == 'transbordos':
+                raise ValueError("OSRM sólo permite los criterios 'distancia' y 'tiempo'")
+            
+            if transporte == 'combinado' and usar_osrm:
+                raise ValueError("OSRM no aplica al transporte combinado")
+            
+            if hora_salida is not None:
+                if transporte != 'publico' or usar_osrm:
+                    raise ValueError("La hora de salida sólo aplica a los horarios de transporte público")
+                if criterio == 'distancia':
+                    raise ValueError("Con hora de salida el criterio debe ser 'tiempo' o 'transbordos'")
+            
+            # Quitar duplicados y el propio origen conservando el orden
+            destinos = [d for d in dict.fromkeys(destinos) if d != origen]
+            if destino_final and destino_final not in destinos:
+                destinos.append(destino_final)
+            
+            for direccion in [origen] + destinos:
+                if direccion not in self.direcciones:
+                    raise ValueError(f"La dirección '{direccion}' no existe")
+            
+            if usar_osrm:
+                ruta = self._calcular_ruta_osrm(
+                    origen, destinos, criterio, regresar_origen=regresar_origen,
+                    destino_final=destino_final, metodo=metodo, tiempo_limite=tiempo_limite,
+                    progreso=progreso, cancelar=cancelar
+                )
+            else:
+                with self.bloqueo:
+                    ruta = self._calcular_ruta_multidestino(
+                        origen, destinos, criterio, transporte,
+                        regresar_origen=regresar_origen, destino_final=destino_final,
+                        metodo=metodo, tiempo_limite=tiempo_limite,
+                        hora_salida=hora_salida, progreso=progreso, cancelar=cancelar
+                    )
+            if progreso:
+                progreso(100, 100, ruta['coste'])
+            with self.bloqueo:
+                return self._formatear_ruta_para_ui(ruta, criterio, transporte)
+            
+        except RutaCancelada:
+            raise
         except Exception as e:
             raise ValueError(f"No se pudo calcular la ruta: {str(e)}")
 
-        def _formatear_ruta_para_ui(self, ruta, criterio, transporte):
-            """Formatea los resultados para la interfaz gráfica"""
-            # Calcular métricas adicionales
+    def _formatear_ruta_para_ui(self, ruta, criterio, transporte):
+        """Formatea los resultados para la interfaz gráfica"""
+        # Calcular métricas adicionales (las rutas por carretera ya traen las medidas)
+        distancia_total = ruta.get('distancia_total')
+        if distancia_total is None:
             distancia_total = sum(
                 self.calcular_distancia(ruta['ruta'][i], ruta['ruta'][i+1])
                 for i in range(len(ruta['ruta'])-1)
             )
-            
+        
+        tiempo_total = ruta.get('tiempo_total')
+        if tiempo_total is None:
             tiempo_total = ruta['coste'] if criterio == 'tiempo' else (
                 distancia_total * 2 if transporte == 'privado' else ruta['coste']
             )
-            
-            transbordos = sum(
-                1 for i in range(len(ruta['ruta'])-1)
-                if self._es_transbordo(ruta['ruta'][i], ruta['ruta'][i+1])
-            ) if transporte != 'privado' else 0
-            
-            return {
-                'ruta': ruta['ruta'],
-                'geometria': ruta['geometria'],
-                'instrucciones': ruta['instrucciones'],
-                'distancia_total': distancia_total,
-                'tiempo_total': tiempo_total,
-                'transbordos': transbordos,
-                'criterio': criterio,
-                'transporte': transporte
-            }
+        
+        lineas = ruta.get('lineas')
+        if lineas is None:
+            lineas = self._lineas_camino(ruta['ruta']) if transporte == 'publico' else []
+        transbordos = len(self._indices_transbordo(lineas)) if transporte != 'privado' else 0
+        
+        return {
+            'ruta': ruta['ruta'],
+            'geometria': ruta['geometria'],
+            'instrucciones': ruta['instrucciones'],
+            'distancia_total': distancia_total,
+            'tiempo_total': tiempo_total,
+            'transbordos': transbordos,
+            'lineas': lineas,
+            'itinerario': ruta.get('itinerario', []),
+            'criterio': criterio,
+            'transporte': transporte,
+            'respaldo': ruta.get('respaldo', False)
+        }
 
-    def _es_transbordo(self, origen, destino):
-        """Determina si hay transbordo entre dos puntos"""
-        # Implementar lógica según tu modelo de transporte
-        return False
-    
-    def _calcular_ruta_multidestino(self, grafo, origen, destinos, criterio, transporte):
-        """Algoritmo mejorado para múltiples destinos con optimización"""
-        # Generar todas las permutaciones posibles de destinos
-        permutaciones = itertools.permutations(destinos)
-        
-        mejor_ruta = None
-        mejor_coste = float('inf')
-        
-        # Evaluar cada posible orden de visita
-        for perm in permutaciones:
-            ruta_actual = [origen]
-            coste_actual = 0
-            geometria = []
-            instrucciones = []
-            
-            # Calcular segmentos
-            previo = origen
-            for destino in perm:
-                segmento = self._calcular_ruta_simple(grafo, previo, destino, criterio, transporte)
-                ruta_actual.extend(segmento['ruta'][1:])
-                coste_actual += segmento['coste']
-                geometria.extend(segmento['geometria'])
-                instrucciones.extend(segmento['instrucciones'])
-                previo = destino
-            
-            # Verificar si es la mejor ruta hasta ahora
-            if coste_actual < mejor_coste:
-                mejor_ruta = {
-                    'ruta': ruta_actual,
-                    'coste': coste_actual,
-                    'geometria': geometria,
-                    'instrucciones': instrucciones
-                }
-                mejor_coste = coste_actual
-        
-        return mejor_ruta
+    def _es_transbordo(self, linea_anterior: Optional[str], linea: Optional[str]) -> bool:
+        """Determina si hay transbordo al pasar de una línea a otra (caminar no cuenta)"""
+        return bool(linea_anterior) and bool(linea) and linea != linea_anterior
+    
+    def _indices_transbordo(self, lineas: Sequence[Optional[str]]) -> List[int]:
+        """
+        Posiciones de la ruta donde se cambia de línea.
+        
+        lineas[i] es la línea del tramo ruta[i] -> ruta[i + 1] (None si no es de
+        ninguna); un tramo a pie entre dos líneas no evita el transbordo.
+        """
+        indices = []
+        ultima = None
+        for i, linea in enumerate(lineas):
+            if self._es_transbordo(ultima, linea):
+                indices.append(i)
+            ultima = linea or ultima
+        return indices
+    
+    def _peso_criterio(self, criterio: str, transporte: str) -> Optional[str]:
+        """Atributo de arista que se minimiza según criterio y transporte"""
+        if criterio == 'distancia':
+            return 'distancia'
+        if criterio == 'tiempo':
+            return 'duracion' if transporte != 'privado' else 'distancia'
+        return None  # transbordos: cuenta nodos
+    
+    @_sincronizado
+    def matriz_costos(self, criterio: str = 'distancia', transporte: str = 'privado') -> MatrizCostos:
+        """
+        Obtiene el motor de costos compartido para un criterio y transporte.
+        
+        Cada fila se llena con una sola búsqueda desde su origen y se conserva
+        hasta que el grafo cambia; las direcciones nuevas se agregan bajo demanda.
+        """
+        clave = ('publico' if transporte == 'publico' else 'privado',
+                 self._peso_criterio(criterio, transporte))
+        if clave not in self._matrices:
+            self._matrices[clave] = MatrizCostos(lambda: self.grafo_compacto(clave[0]), clave[1],
+                                                  self.calcular_distancia,
+                                                  respaldo_matriz=self.matriz_distancias)
+        return self._matrices[clave]
+    
+    def tablas_osrm(self, puntos: Sequence[str],
+                    cancelar: Optional[threading.Event] = None) -> Tuple[np.ndarray, np.ndarray, bool]:
+        """
+        Duraciones y distancias por carretera entre direcciones con el servicio /table de OSRM.
+        
+        Las coordenadas se leen con el candado del gestor y las peticiones se hacen
+        sin él; entre bloques de la tabla se revisa 'cancelar' (lanza RutaCancelada).
+        
+        Returns:
+            (duraciones en segundos, distancias en km, respaldo); los pares sin ruta,
+            o todos si el servicio no responde, se estiman en línea recta y
+            'respaldo' indica que hubo que hacerlo
+        """
+        with self.bloqueo:
+            lats, lons = self._arreglo_coordenadas(puntos)
+        tabla = self.osrm.tabla(list(zip(lats.tolist(), lons.tolist())),
+                                antes_de_peticion=lambda: comprobar_cancelacion(cancelar))
+        if tabla is None:
+            duraciones = np.full((len(puntos), len(puntos)), np.nan)
+            distancias = duraciones.copy()
+        else:
+            duraciones, distancias = tabla[0].copy(), tabla[1] / 1000
+        
+        faltantes = np.isnan(duraciones) | np.isnan(distancias)
+        np.fill_diagonal(faltantes, False)
+        if faltantes.any():
+            estimado = matriz_haversine(lats, lons)
+            distancias[faltantes] = estimado[faltantes]
+            duraciones[faltantes] = estimado[faltantes] * 2 * 60  # Estimado: 2 min/km
+        np.fill_diagonal(duraciones, 0)
+        np.fill_diagonal(distancias, 0)
+        return duraciones, distancias, bool(faltantes.any())
+    
+    def matriz_osrm(self, puntos: Sequence[str], criterio: str = 'distancia') -> np.ndarray:
+        """Matriz de costos por carretera: kilómetros ('distancia') o segundos ('tiempo')"""
+        duraciones, distancias, _ = self.tablas_osrm(puntos)
+        return distancias if criterio == 'distancia' else duraciones
+    
+    def _calcular_ruta_multidestino(self, origen, destinos, criterio, transporte,
+                                    regresar_origen=False, destino_final=None,
+                                    metodo='auto', tiempo_limite=2.0,
+                                    hora_salida=None, progreso=None, cancelar=None):
+        """Encuentra el orden de visita sobre los costos entre paradas (exacto o heurístico)"""
+        if hora_salida is not None:
+            return self._calcular_ruta_horario(origen, destinos, criterio, a_segundos(hora_salida),
+                                               regresar_origen, destino_final, metodo, tiempo_limite,
+                                               progreso=progreso, cancelar=cancelar)
+        if transporte == 'publico' and criterio != 'distancia':
+            # Tiempo y transbordos en transporte público: búsqueda por líneas
+            return self._calcular_ruta_transporte(origen, destinos, criterio, regresar_origen,
+                                                  destino_final, metodo, tiempo_limite,
+                                                  progreso=progreso, cancelar=cancelar)
+        if transporte == 'combinado':
+            # Caminar y transporte público: búsqueda en la red por capas
+            return self._calcular_ruta_transporte(origen, destinos, criterio, regresar_origen,
+                                                  destino_final, metodo, tiempo_limite,
+                                                  transporte='combinado', progreso=progreso,
+                                                  cancelar=cancelar)
+        puntos = [origen] + list(destinos)
+        if len(destinos) == 1 and not regresar_origen:
+            # Un solo destino: búsqueda punto a punto dirigida hacia él
+            grafo = self.transporte_grafo if transporte == 'publico' else self.grafo
+            return self._calcular_ruta_simple(grafo, origen, destinos[0], criterio, transporte)
+        costos = self.matriz_costos(criterio, transporte)
+        matriz = costos.matriz(puntos, self._progreso_etapa(progreso, 0, 40), cancelar)
+        
+        fin = puntos.index(destino_final) if destino_final else None
+        orden, coste = self._orden_visita(matriz, regresar_origen, fin, metodo, tiempo_limite,
+                                          self._progreso_etapa(progreso, 40, 100), cancelar)
+        
+        # Geometría e instrucciones sólo para el orden ganador
+        ruta_actual = [origen]
+        for i, j in zip(orden, orden[1:]):
+            camino, _ = costos.tramo(puntos[i], puntos[j])
+            ruta_actual.extend(camino[1:])
+        
+        return {
+            'ruta': ruta_actual,
+            'coste': coste,
+            'geometria': self._obtener_geometria(ruta_actual),
+            'instrucciones': self._generar_instrucciones(ruta_actual, transporte)
+        }
+    
+    def _calcular_ruta_osrm(self, origen, destinos, criterio, regresar_origen=False,
+                            destino_final=None, metodo='auto', tiempo_limite=2.0,
+                            progreso=None, cancelar=None):
+        """
+        Orden de visita con las distancias o tiempos por carretera de OSRM.
+        
+        No se ejecuta con el candado del gestor: las peticiones pueden tardar
+        varios timeouts, así que sólo se toma para leer coordenadas y entre
+        bloques de la tabla y entre tramos se revisa la cancelación.
+        """
+        puntos = [origen] + list(destinos)
+        duraciones, distancias, respaldo = self.tablas_osrm(puntos, cancelar)
+        matriz = distancias if criterio == 'distancia' else duraciones
+        
+        fin = puntos.index(destino_final) if destino_final else None
+        orden, coste = self._orden_visita(matriz, regresar_origen, fin, metodo, tiempo_limite,
+                                          self._progreso_etapa(progreso, 40, 100), cancelar)
+        
+        # Trazado real por carretera sólo para el orden ganador; los tramos se piden en paralelo
+        ruta_actual = [puntos[j] for j in orden]
+        tramos = self.obtener_rutas_tramos(ruta_actual, cancelar=cancelar)
+        pares = list(zip(orden, orden[1:]))
+        return {
+            'ruta': ruta_actual,
+            'coste': coste,
+            'geometria': tramos['geometria'],
+            'instrucciones': tramos['instrucciones'],
+            'distancia_total': float(sum(distancias[i, j] for i, j in pares)),
+            'tiempo_total': float(sum(duraciones[i, j] for i, j in pares)),
+            'respaldo': respaldo or tramos['modo'] != 'conducción'
+        }
+    
+    @_sincronizado
+    def opciones_transporte_publico(self, origen: str, destino: str,
+                                    max_transbordos: Optional[int] = None,
+                                    penalizacion_transbordo: float = 0.0) -> List[Dict]:
+        """
+        Opciones de viaje en transporte público que no se dominan en (tiempo, transbordos).
+        
+        Se obtienen todas con una sola búsqueda por líneas, de la más rápida a la de
+        menos transbordos; cada una trae su ruta, la línea de cada tramo, el tiempo
+        y el número de transbordos.
+        """
+        compacto = self.grafo_compacto('publico')
+        if origen not in compacto.ids or destino not in compacto.ids:
+            return []
+        busqueda = BusquedaTransbordos(compacto, 'duracion', penalizacion_transbordo, max_transbordos)
+        return busqueda.opciones(compacto.ids[origen], compacto.ids[destino])
+    
+    def _calcular_ruta_transporte(self, origen, destinos, criterio, regresar_origen=False,
+                                  destino_final=None, metodo='auto', tiempo_limite=2.0,
+                                  transporte='publico', progreso=None, cancelar=None):
+        """
+        Orden de visita en transporte público (o combinado) minimizando tiempo o transbordos.
+        
+        Cada tramo entre paradas es la mejor opción de Pareto según el criterio
+        (tiempo y luego transbordos, o al revés); desde cada parada basta una
+        búsqueda para llegar a todas las demás. En la red combinada cada par se
+        busca por separado (ver _tramo_combinado).
+        """
+        puntos = [origen] + list(destinos)
+        n = len(puntos)
+        combinado = transporte == 'combinado'
+        un_destino = n == 2 and not regresar_origen
+        avance = self._progreso_etapa(progreso, 0, 40)
+        
+        tramos = {}
+        if combinado:
+            pares = [(0, 1)] if un_destino else [(i, j) for i in range(n) for j in range(n) if i != j]
+            for hechos, (i, j) in enumerate(pares, 1):
+                comprobar_cancelacion(cancelar)
+                tramos[i, j] = self._tramo_combinado(puntos[i], puntos[j], criterio)
+                if avance:
+                    avance(hechos, len(pares), None)
+        else:
+            compacto = self.grafo_compacto('publico')
+            busqueda = BusquedaTransbordos(compacto, 'duracion')
+            for i, parada in enumerate(puntos):
+                comprobar_cancelacion(cancelar)
+                etiquetas, bolsas = [], {}
+                if parada in compacto.ids:
+                    if un_destino:
+                        # Un solo destino: la búsqueda se poda con cotas hacia él
+                        etiquetas, bolsas = busqueda.buscar(compacto.ids[parada], compacto.ids.get(puntos[1]))
+                    else:
+                        etiquetas, bolsas = busqueda.buscar(compacto.ids[parada])
+                for j, destino in enumerate(puntos):
+                    if i == j:
+                        continue
+                    indices = bolsas.get(compacto.ids.get(destino), [])
+                    if indices:
+                        mejor = min(indices, key=lambda k: self._clave_opcion(etiquetas[k], criterio))
+                        tramos[i, j] = busqueda.reconstruir(etiquetas, mejor)
+                    else:
+                        tramos[i, j] = self._tramo_directo(parada, destino, criterio, transporte)
+                if avance:
+                    avance(i + 1, n, None)
+                if un_destino:
+                    break
+        
+        tiempos = np.zeros((n, n))
+        transbordos = np.zeros((n, n))
+        for (i, j), tramo in tramos.items():
+            tiempos[i, j] = tramo['tiempo']
+            transbordos[i, j] = tramo['transbordos']
+        
+        fin = puntos.index(destino_final) if destino_final else None
+        orden, _ = self._orden_visita(self._matriz_criterio(tiempos, transbordos, criterio),
+                                      regresar_origen, fin, metodo, tiempo_limite,
+                                      self._progreso_etapa(progreso, 40, 100), cancelar)
+        
+        ruta_actual, lineas = [origen], []
+        for i, j in zip(orden, orden[1:]):
+            ruta_actual.extend(tramos[i, j]['ruta'][1:])
+            lineas.extend(tramos[i, j]['lineas'])
+        return {
+            'ruta': ruta_actual,
+            'coste': float(sum(tiempos[i, j] for i, j in zip(orden, orden[1:]))),
+            'lineas': lineas,
+            'geometria': self._obtener_geometria(ruta_actual),
+            'instrucciones': (self._instrucciones_multimodales(ruta_actual, lineas) if combinado
+                              else self._generar_instrucciones(ruta_actual, 'publico'))
+        }
+    
+    def _clave_opcion(self, etiqueta: tuple, criterio: str) -> Tuple[float, float]:
+        """Orden de preferencia de una etiqueta (tiempo, transbordos, ...) según el criterio"""
+        return (etiqueta[1], etiqueta[0]) if criterio == 'transbordos' else (etiqueta[0], etiqueta[1])
+    
+    def _tramo_directo(self, origen: str, destino: str, criterio: str, transporte: str) -> Dict:
+        """Tramo sin conexión en la red: directo, estimado a 3 min/km (caminando en la red combinada)"""
+        costo = self.calcular_distancia(origen, destino)
+        if criterio != 'distancia':
+            costo *= MIN_POR_KM_PIE if transporte == 'combinado' else 3
+        return {'ruta': [origen, destino], 'lineas': [None], 'tiempo': costo, 'transbordos': 0}
+    
+    def _tramo_combinado(self, origen: str, destino: str, criterio: str) -> Dict:
+        """
+        Mejor tramo puerta a puerta en la red combinada.
+        
+        Por tiempo o distancia es una búsqueda A*; por transbordos, la búsqueda
+        de Pareto podada hacia el destino. Con origen libre las bolsas crecerían
+        con cada línea alcanzable a pie, por eso siempre se busca hacia un destino.
+        """
+        compacto = self.grafo_compacto('combinado')
+        i, j = compacto.ids.get((PIE, origen)), compacto.ids.get((PIE, destino))
+        if i is None or j is None:
+            return self._tramo_directo(origen, destino, criterio, 'combinado')
+        peso = 'distancia' if criterio == 'distancia' else 'duracion'
+        
+        if criterio == 'transbordos':
+            busqueda = BusquedaTransbordos(compacto, peso)
+            etiquetas, bolsas = busqueda.buscar(i, j)
+            if not bolsas.get(j):
+                return self._tramo_directo(origen, destino, criterio, 'combinado')
+            mejor = min(bolsas[j], key=lambda k: self._clave_opcion(etiquetas[k], criterio))
+            tramo = busqueda.reconstruir(etiquetas, mejor)
+            tramo['ruta'], tramo['lineas'] = desplegar_camino(tramo['ruta'])
+            return tramo
+        
+        costos, previos = compacto.buscar(i, peso, j, self._heuristica('combinado', peso, (PIE, destino)))
+        if costos[j] == INFINITO:
+            return self._tramo_directo(origen, destino, criterio, 'combinado')
+        ruta, lineas = desplegar_camino(compacto.camino(previos, j))
+        return {'ruta': ruta, 'lineas': lineas, 'tiempo': costos[j],
+                'transbordos': len(self._indices_transbordo(lineas))}
+    
+    def _orden_visita(self, matriz: np.ndarray, regresar_origen: bool, fin: Optional[int],
+                      metodo: str, tiempo_limite: float, progreso: Optional[Progreso] = None,
+                      cancelar: Optional[threading.Event] = None) -> Tuple[List[int], float]:
+        """Orden de visita óptimo sobre una matriz de costos (exacto o heurístico)"""
+        if metodo == 'auto':
+            metodo = 'exacto' if len(matriz) - 1 <= MAX_DESTINOS_AUTO_EXACTO else 'heuristico'
+        if metodo == 'exacto':
+            return held_karp(matriz, ciclo=regresar_origen, fin=fin, progreso=progreso, cancelar=cancelar)
+        return ruta_heuristica(matriz, ciclo=regresar_origen, fin=fin, tiempo_limite=tiempo_limite,
+                               progreso=progreso, cancelar=cancelar)
+    
+    def _progreso_etapa(self, progreso: Optional[Progreso], inicio: int, fin: int) -> Optional[Progreso]:
+        """Reescala el progreso de una etapa al tramo [inicio, fin] de una escala de 0 a 100"""
+        if progreso is None:
+            return None
+        return lambda hechos, total, costo: progreso(inicio + (fin - inicio) * hechos // max(total, 1),
+                                                     100, costo)
+    
+    def _matriz_criterio(self, tiempos: np.ndarray, transbordos: np.ndarray, criterio: str) -> np.ndarray:
+        """
+        Costos a minimizar en transporte público.
+        
+        Para 'transbordos' se multiplican por un factor mayor que cualquier suma de
+        tiempos, así el orden óptimo es lexicográfico (transbordos, tiempo).
+        """
+        if criterio == 'transbordos':
+            return tiempos + transbordos * (tiempos.sum() + 1)
+        return tiempos
+    
+    def _calcular_ruta_horario(self, origen, destinos, criterio, salida, regresar_origen=False,
+                               destino_final=None, metodo='auto', tiempo_limite=2.0,
+                               progreso=None, cancelar=None):
+        """
+        Orden de visita y trayectos con los horarios de transporte público.
+        
+        El orden se elige con los tiempos de viaje saliendo de cada parada a la
+        hora indicada; después se recorre tramo a tramo, cada uno saliendo cuando
+        termina el anterior, para obtener las horas reales.
+        """
+        puntos = [origen] + list(destinos)
+        n = len(puntos)
+        holgura = HOLGURA_TRANSBORDOS if criterio == 'transbordos' else 0
+        
+        def elegir(opciones):
+            # Las opciones van de menos transbordos a llegada más temprana
+            return opciones[0] if criterio == 'transbordos' else opciones[-1]
+        
+        tiempos = np.zeros((n, n))
+        transbordos = np.zeros((n, n))
+        avance = self._progreso_etapa(progreso, 0, 40)
+        for i, parada in enumerate(puntos):
+            comprobar_cancelacion(cancelar)
+            otros = [p for p in puntos if p != parada]
+            opciones = self.horario.consulta_varios(parada, otros, salida, holgura=holgura)
+            for j, destino in enumerate(puntos):
+                if i == j:
+                    continue
+                if opciones[destino]:
+                    elegida = elegir(opciones[destino])
+                    tiempos[i, j] = (elegida['llegada'] - salida) / 60
+                    transbordos[i, j] = elegida['transbordos']
+                else:
+                    tiempos[i, j] = self.calcular_distancia(parada, destino) * 3  # Estimado: 3 min/km
+            if avance:
+                avance(i + 1, n, None)
+        
+        fin = puntos.index(destino_final) if destino_final else None
+        orden, _ = self._orden_visita(self._matriz_criterio(tiempos, transbordos, criterio),
+                                      regresar_origen, fin, metodo, tiempo_limite,
+                                      self._progreso_etapa(progreso, 40, 100), cancelar)
+        
+        # Recorrido con horas reales: cada tramo sale cuando termina el anterior
+        hora = salida
+        ruta_actual, lineas, itinerario, instrucciones = [origen], [], [], []
+        for i, j in zip(orden, orden[1:]):
+            opciones = self.horario.consulta(puntos[i], puntos[j], hora, holgura=holgura)
+            if not opciones:
+                # Sin servicio: tramo directo estimado
+                ruta_actual.append(puntos[j])
+                lineas.append(None)
+                instrucciones.extend(self._generar_instrucciones([puntos[i], puntos[j]], 'publico'))
+                hora += int(self.calcular_distancia(puntos[i], puntos[j]) * 3 * 60)
+                continue
+            elegida = elegir(opciones)
+            ruta_actual.extend(elegida['ruta'][1:])
+            lineas.extend(elegida['lineas'])
+            itinerario.extend(elegida['tramos'])
+            for tramo in elegida['tramos']:
+                paradas = tramo['paradas']
+                instrucciones.append({
+                    'instruccion': (f"Tomar la línea {tramo['linea']} en {paradas[0]} a las "
+                                    f"{formatear_hora(tramo['salida'])} y bajar en {paradas[-1]} "
+                                    f"({formatear_hora(tramo['llegada'])})"),
+                    'distancia': sum(self.calcular_distancia(a, b) for a, b in zip(paradas, paradas[1:])),
+                    'duracion': tramo['llegada'] - tramo['salida'],
+                    'tipo': 'publico'
+                })
+            hora = elegida['llegada']
+        
+        return {
+            'ruta': ruta_actual,
+            'coste': (hora - salida) / 60,
+            'lineas': lineas,
+            'itinerario': itinerario,
+            'geometria': self._obtener_geometria(ruta_actual),
+            'instrucciones': instrucciones
+        }
+    
+    def _lineas_camino(self, ruta: Sequence[str]) -> List[Optional[str]]:
+        """Línea de cada tramo de un camino del grafo de transporte (sigue en la misma si puede)"""
+        lineas = []
+        ultima = None
+        for origen, destino in zip(ruta, ruta[1:]):
+            datos = self.transporte_grafo.get_edge_data(origen, destino) or {}
+            disponibles = [d.get('linea') for d in datos.values() if d.get('linea')]
+            linea = ultima if ultima in disponibles else (disponibles[0] if disponibles else None)
+            lineas.append(linea)
+            ultima = linea or ultima
+        return lineas
+    
+    def _coordenadas_nodo(self, direccion: str) -> Optional[Tuple[float, float]]:
+        """Coordenadas (lat, lon) de un nodo del grafo, o None si no es una dirección"""
+        info = self.direcciones.get(direccion)
+        if info is None:
+            return None
+        return info['coordenadas']['lat'], info['coordenadas']['lon']
+    
+    def _clave_grafo(self, grafo) -> str:
+        """Clave ('publico' o 'privado') con la que se identifica un grafo en las cachés"""
+        return 'publico' if grafo is self.transporte_grafo else 'privado'
+    
+    @_sincronizado
+    def grafo_compacto(self, clave: str = 'privado') -> GrafoCompacto:
+        """
+        Instantánea CSR (identificadores enteros y pesos tipados) de un grafo.
+        
+        Se construye la primera vez que se necesita y se descarta cuando el
+        grafo cambia; todas las búsquedas de rutas se hacen sobre ella.
+        """
+        if clave not in self._compactos:
+            if clave == 'combinado':
+                self._compactos[clave] = self._red_multimodal()
+            else:
+                grafo = self.transporte_grafo if clave == 'publico' else self.grafo
+                self._compactos[clave] = GrafoCompacto(grafo, self._coordenadas_nodo)
+        return self._compactos[clave]
+    
+    def _red_multimodal(self) -> GrafoCompacto:
+        """
+        Red por capas para el transporte 'combinado' (caminar + transporte público).
+        
+        Los transbordos a pie unen cada parada con las direcciones a menos de
+        RADIO_TRANSBORDO_KM; se obtienen todos con una búsqueda en lote sobre el
+        índice espacial.
+        """
+        privado = self.grafo_compacto('privado')
+        publico = self.grafo_compacto('publico')
+        paradas = [p for p in publico.nodos if p in self.direcciones]
+        lats, lons = self._arreglo_coordenadas(paradas)
+        consultas, indices, distancias = self.indice.pares_en_radio(lats, lons, RADIO_TRANSBORDO_KM)
+        claves = self.indice.claves
+        pares = ([paradas[i] for i in consultas.tolist()], [claves[j] for j in indices.tolist()], distancias)
+        return construir_red_multimodal(privado, publico, pares,
+                                        lambda nodo: self._coordenadas_nodo(nodo[1]))
+    
+    @_sincronizado
+    def preparar_landmarks(self, criterio: str = 'distancia', transporte: str = 'privado',
+                           cantidad: int = 8) -> Landmarks:
+        """
+        Precalcula landmarks ALT para acelerar las rutas punto a punto.
+        
+        Conviene cuando la línea recta es una mala cota del costo (p. ej. tiempos
+        de transporte público); se descartan al modificar el grafo.
+        """
+        clave = (transporte if transporte in ('publico', 'combinado') else 'privado',
+                 self._peso_criterio(criterio, transporte))
+        self._landmarks[clave] = Landmarks(self.grafo_compacto(clave[0]), clave[1], cantidad)
+        return self._landmarks[clave]
+    
+    @_sincronizado
+    def preparar_jerarquia(self, peso: str = 'distancia') -> JerarquiaContraccion:
+        """
+        Construye una jerarquía de contracción del grafo privado para un peso de arista.
+        
+        Acepta el atributo de arista ('distancia', 'duracion') o el criterio 'tiempo'
+        como sinónimo de 'duracion'; se guarda una jerarquía por peso. El
+        preprocesamiento es costoso pero se hace una vez: las consultas punto a
+        punto posteriores toman fracciones de milisegundo y la jerarquía se guarda
+        con guardar_json (se descarta si el grafo cambia).
+        """
+        peso = PESOS_CRITERIO.get(peso, peso)
+        if peso not in self._jerarquias:
+            self._jerarquias[peso] = JerarquiaContraccion(self.grafo_compacto('privado'), peso)
+        return self._jerarquias[peso]
+    
+    def _heuristica(self, clave_grafo: str, peso: Optional[str], destino: str):
+        """Heurística A* hacia un destino: línea recta escalada y, si existen, landmarks"""
+        compacto = self.grafo_compacto(clave_grafo)
+        if destino not in compacto.ids:
+            return None
+        j = compacto.ids[destino]
+        clave = (clave_grafo, peso)
+        if clave not in self._factores_haversine:
+            self._factores_haversine[clave] = factor_haversine(compacto, peso)
+        landmarks = self._landmarks.get(clave)
+        return combinar_heuristicas(
+            heuristica_haversine(compacto, j, self._factores_haversine[clave]),
+            landmarks.heuristica(j) if landmarks and landmarks.grafo is compacto else None
+        )
     
     def _calcular_ruta_simple(self, grafo, origen, destino, criterio, transporte):
-        """Calcula ruta entre dos puntos usando Dijkstra"""
+        """Calcula ruta entre dos puntos con una sola búsqueda A* (camino y costo)"""
         try:
-            if criterio == 'distancia':
-                peso = 'distancia'
-            elif criterio == 'tiempo':
-                peso = 'duracion' if transporte != 'privado' else 'distancia'
-            else:  # transbordos
-                peso = None  # Cuenta nodos
-            
-            if peso:
-                path = nx.dijkstra_path(grafo, origen, destino, weight=peso)
-                cost = nx.dijkstra_path_length(grafo, origen, destino, weight=peso)
+            peso = self._peso_criterio(criterio, transporte)
+            clave = self._clave_grafo(grafo)
+            compacto = self.grafo_compacto(clave)
+            jerarquia = self._jerarquias.get(peso) if clave == 'privado' else None
+            if jerarquia is not None and origen in compacto.ids and destino in compacto.ids:
+                cost, ids = jerarquia.consulta(compacto.ids[origen], compacto.ids[destino])
+                if not ids:
+                    raise nx.NetworkXNoPath(f"No hay camino entre {origen} y {destino}")
+                path = [compacto.nodos[i] for i in ids]
             else:
-                path = nx.shortest_path(grafo, origen, destino)
-                cost = len(path) - 1
+                path, cost = compacto.ruta(origen, destino, peso,
+                                           self._heuristica(clave, peso, destino))
             
             return {
                 'ruta': path,
@@ -246,7 +1141,7 @@ class GestorDirecciones:
                 'geometria': self._obtener_geometria(path),
                 'instrucciones': self._generar_instrucciones(path, transporte)
             }
-        except nx.NetworkXNoPath:
+        except (nx.NetworkXNoPath, nx.NodeNotFound):
             # Fallback a ruta directa si no hay conexión
             return {
                 'ruta': [origen, destino],
@@ -256,8 +1151,8 @@ class GestorDirecciones:
             }
         
     
-    def _obtener_geometria(self, ruta: List[str]) -> List[Dict[str, float]]:
-        """Versión segura para obtener coordenadas"""
+    def _obtener_geometria(self, ruta: List[str]) -> np.ndarray:
+        """Versión segura para obtener coordenadas: arreglo (n, 2) de [lat, lon]"""
         geometria = []
         for punto in ruta:
             try:
@@ -265,10 +1160,10 @@ class GestorDirecciones:
                 # Validar y convertir coordenadas
                 lat = float(coords['lat'])
                 lon = float(coords['lon'])
-                geometria.append({'lat': lat, 'lon': lon})
+                geometria.append((lat, lon))
             except (KeyError, ValueError, TypeError) as e:
                 raise ValueError(f"Coordenadas inválidas para {punto}: {str(e)}")
-        return geometria
+        return como_arreglo(geometria)
     
     def _generar_instrucciones(self, ruta, transporte):
         """Genera instrucciones de navegación"""
@@ -289,35 +1184,34 @@ class GestorDirecciones:
         
         return instrucciones
     
-    def _vecino_mas_cercano(self, matriz_costos: List[List[float]], inicio: int) -> Tuple[List[int], float]:
-        """Implementación del algoritmo del vecino más cercano"""
-        n = len(matriz_costos)
-        visitados = set([inicio])
-        ruta = [inicio]
-        costo_total = 0.0
-        
-        while len(visitados) < n:
-            ultimo = ruta[-1]
-            mejor_costo = float('inf')
-            mejor_idx = -1
-            
-            for i in range(n):
-                if i not in visitados and matriz_costos[ultimo][i] < mejor_costo:
-                    mejor_costo = matriz_costos[ultimo][i]
-                    mejor_idx = i
-            
-            if mejor_idx == -1:  # No se encontró conexión
-                break
-                
-            visitados.add(mejor_idx)
-            ruta.append(mejor_idx)
-            costo_total += mejor_costo
-        
-        # Regresar al inicio para completar el ciclo (opcional)
-        # costo_total += matriz_costos[ruta[-1]][ruta[0]]
-        # ruta.append(ruta[0])
-        
-        return ruta, costo_total
+    def _instrucciones_multimodales(self, ruta: Sequence[str], lineas: Sequence[Optional[str]]) -> List[Dict]:
+        """Instrucciones agrupando los tramos consecutivos a pie o en la misma línea"""
+        instrucciones = []
+        inicio = 0
+        for i in range(1, len(lineas) + 1):
+            if i < len(lineas) and lineas[i] == lineas[inicio]:
+                continue
+            tramo = ruta[inicio:i + 1]
+            linea = lineas[inicio]
+            distancia = sum(self.calcular_distancia(a, b) for a, b in zip(tramo, tramo[1:]))
+            if linea is None:
+                instruccion = f"Caminar de {tramo[0]} a {tramo[-1]}"
+                duracion = distancia * MIN_POR_KM_PIE
+            else:
+                instruccion = f"Tomar la línea {linea} en {tramo[0]} y bajar en {tramo[-1]}"
+                duracion = sum(
+                    min((d.get('duracion', 5) for d in (self.transporte_grafo.get_edge_data(a, b) or {}).values()
+                         if d.get('linea') == linea), default=5)
+                    for a, b in zip(tramo, tramo[1:])
+                )
+            instrucciones.append({
+                'instruccion': instruccion,
+                'distancia': distancia,
+                'duracion': duracion * 60,  # en segundos
+                'tipo': 'pie' if linea is None else 'publico'
+            })
+            inicio = i
+        return instrucciones
     
     # --- Métodos para transporte público ---
     
@@ -332,34 +1226,93 @@ class GestorDirecciones:
         Returns:
             Dict con información de la ruta
         """
+        with self.bloqueo:
+            coordenadas = self._coordenadas_tramo(origen, destino)
+        return self._ruta_por_carretera(origen, destino, coordenadas)
+    
+    def _coordenadas_tramo(self, origen: str, destino: str) -> List[Tuple[float, float]]:
+        """Coordenadas (lat, lon) de los extremos de un tramo"""
         if origen not in self.direcciones or destino not in self.direcciones:
             raise ValueError("Una o ambas direcciones no existen")
-            
         coords_origen = self.direcciones[origen]['coordenadas']
         coords_destino = self.direcciones[destino]['coordenadas']
+        return [
+            (coords_origen['lat'], coords_origen['lon']),
+            (coords_destino['lat'], coords_destino['lon'])
+        ]
+    
+    def _ruta_por_carretera(self, origen: str, destino: str,
+                            coordenadas: List[Tuple[float, float]]) -> Dict:
+        """Ruta de un tramo con coordenadas ya leídas; no usa el candado ni los grafos"""
+        # Consultar primero la caché (sólo guarda respuestas reales de OSRM)
+        clave = self.cache_rutas.clave(coordenadas, prefijo=f"{self.osrm.base_url}/{self.osrm.perfil}|")
+        ruta = self.cache_rutas.obtener(clave)
+        if ruta is not None:
+            return dict(ruta)
         
         # Usando OSRM (Open Source Routing Machine)
         try:
-            url = f"http://router.project-osrm.org/route/v1/driving/" \
-                  f"{coords_origen['lon']},{coords_origen['lat']};" \
-                  f"{coords_destino['lon']},{coords_destino['lat']}" \
-                  f"?overview=full&geometries=polyline"
-            
-            response = requests.get(url)
-            if response.status_code != 200:
-                return self._ruta_alternativa(origen, destino)
+            data = self.osrm.ruta(coordenadas)
+            if data is None:
+                return self._ruta_alternativa(origen, destino, coordenadas)
                 
-            data = response.json()
-            return self._procesar_ruta_osrm(data)
+            ruta = self._procesar_ruta_osrm(data)
+            self.cache_rutas.guardar(clave, ruta)
+            return dict(ruta)
             
         except Exception as e:
             print(f"Error al obtener ruta: {str(e)}")
-            return self._ruta_alternativa(origen, destino)
+            return self._ruta_alternativa(origen, destino, coordenadas)
+    
+    def obtener_rutas_tramos(self, paradas: Sequence[str],
+                             hilos: int = MAX_TRAMOS_SIMULTANEOS,
+                             cancelar: Optional[threading.Event] = None) -> Dict:
+        """
+        Obtiene en paralelo la ruta de cada tramo entre paradas consecutivas y las une.
+        
+        Cada tramo pasa por la caché de rutas y OSRM (con su ruta alternativa), con
+        a lo más 'hilos' peticiones simultáneas; el tiempo total es aproximadamente
+        el del tramo más lento. Las coordenadas se leen antes con el candado del
+        gestor y antes de cada tramo se revisa 'cancelar' (lanza RutaCancelada).
+        
+        Returns:
+            Dict con el formato de _procesar_ruta_osrm más la lista 'tramos'
+        """
+        pares = list(zip(paradas, paradas[1:]))
+        if not pares:
+            raise ValueError("Se necesitan al menos dos paradas")
+        
+        with self.bloqueo:
+            coordenadas = [self._coordenadas_tramo(*par) for par in pares]
+        
+        def tramo(i):
+            comprobar_cancelacion(cancelar)
+            return self._ruta_por_carretera(*pares[i], coordenadas[i])
+        
+        with ThreadPoolExecutor(max_workers=max(1, min(hilos, len(pares)))) as ejecutor:
+            tramos = list(ejecutor.map(tramo, range(len(pares))))
+        
+        # Unir en orden sin repetir el punto donde termina un tramo y empieza el siguiente
+        geometria = unir(tramo['geometria'] for tramo in tramos)
+        instrucciones = []
+        for tramo in tramos:
+            instrucciones.extend(tramo['instrucciones'])
+        
+        modos = {tramo['modo'] for tramo in tramos}
+        return {
+            'duracion_total': sum(tramo['duracion_total'] for tramo in tramos),
+            'distancia_total': sum(tramo['distancia_total'] for tramo in tramos),
+            'instrucciones': instrucciones,
+            'geometria': geometria,
+            'modo': modos.pop() if len(modos) == 1 else 'mixto',
+            'tramos': tramos
+        }
     
     def _procesar_ruta_osrm(self, data: Dict) -> Dict:
         """Procesa la respuesta de OSRM para extraer información de la ruta"""
         route = data['routes'][0]
-        decoded_path = polyline.decode(route['geometry'])
+        # Se decodifica una sola vez: el arreglo queda en la caché de rutas
+        decoded_path = como_arreglo(polyline.decode(route['geometry']))
         
         instrucciones = []
         for leg in route['legs']:
@@ -379,9 +1332,11 @@ class GestorDirecciones:
             'modo': 'conducción'
         }
     
-    def _ruta_alternativa(self, origen: str, destino: str) -> Dict:
-        """Crea una ruta alternativa cuando falla la API"""
-        distancia = self.calcular_distancia(origen, destino)
+    def _ruta_alternativa(self, origen: str, destino: str,
+                          coordenadas: List[Tuple[float, float]]) -> Dict:
+        """Crea una ruta alternativa en línea recta cuando falla la API"""
+        (lat1, lon1), (lat2, lon2) = coordenadas
+        distancia = float(haversine(lat1, lon1, lat2, lon2))
         return {
             'duracion_total': distancia * 3 * 60,  # Estimado: 3 min/km
             'distancia_total': distancia,
@@ -391,27 +1346,34 @@ class GestorDirecciones:
                 'duracion': distancia * 3 * 60,
                 'tipo': 'conducción_estimada'
             }],
-            'geometria': [
-                (self.direcciones[origen]['coordenadas']['lat'], 
-                self.direcciones[origen]['coordenadas']['lon']),
-                (self.direcciones[destino]['coordenadas']['lat'], 
-                self.direcciones[destino]['coordenadas']['lon'])
-            ],
+            'geometria': como_arreglo(coordenadas),
             'modo': 'estimado'
         }
     
+    @_sincronizado
     def _agregar_ruta_transporte(self, ruta_data: Dict):
         """Agrega una ruta de transporte al grafo"""
-        for i in range(len(ruta_data['paradas'])-1):
-            origen = ruta_data['paradas'][i]
-            destino = ruta_data['paradas'][i+1]
+        self._insertar_ruta_transporte(ruta_data)
+        self._grafo_modificado('publico')
+    
+    def _insertar_ruta_transporte(self, ruta_data: Dict):
+        """Agrega las aristas de un recorrido al grafo de transporte (sin invalidar nada)"""
+        paradas = ruta_data['paradas']
+        distancias = ruta_data.get('distancias')
+        if distancias is None:
+            # Todas las distancias de la ruta en una sola operación vectorizada
+            lats, lons = self._arreglo_coordenadas(paradas)
+            distancias = haversine(lats[:-1], lons[:-1], lats[1:], lons[1:]).tolist()
+        for i in range(len(paradas)-1):
+            origen = paradas[i]
+            destino = paradas[i+1]
             
             self.transporte_grafo.add_edge(
                 origen, destino,
                 tipo=ruta_data['tipo'],
                 linea=ruta_data['linea'],
                 duracion=ruta_data.get('duraciones', [])[i] if 'duraciones' in ruta_data else 5,
-                distancia=self.calcular_distancia(origen, destino)
+                distancia=distancias[i]
             )
     
     def _obtener_rutas_transporte_para_guardar(self) -> List[Dict]:
@@ -419,12 +1381,15 @@ class GestorDirecciones:
         rutas = []
         # Implementación simplificada - deberías expandir esto
         for edge in self.transporte_grafo.edges(data=True):
-            rutas.append({
+            ruta = {
                 'paradas': [edge[0], edge[1]],
                 'tipo': edge[2].get('tipo', 'bus'),
                 'linea': edge[2].get('linea', ''),
                 'duraciones': [edge[2].get('duracion', 5)]
-            })
+            }
+            if 'distancia' in edge[2]:
+                ruta['distancias'] = [edge[2]['distancia']]  # Evita recalcularla al cargar
+            rutas.append(ruta)
         return rutas
     
     def obtener_mapa_rutas(self, ruta: Dict) -> str:
@@ -442,8 +1407,20 @@ class GestorDirecciones:
             tiles='cartodbpositron'  # Más limpio para rutas
         )
         
+        # Con muchas paradas las intermedias se agrupan y su popup se arma al abrirlo
+        agrupar = len(ruta['ruta']) - 2 > MAX_MARCADORES_RUTA
+        if agrupar:
+            FastMarkerCluster(
+                [[self.direcciones[d]['coordenadas']['lat'], self.direcciones[d]['coordenadas']['lon'],
+                  i + 1, d, self.direcciones[d].get('tipo', 'N/A')]
+                 for i, d in enumerate(ruta['ruta'][1:-1], 1)],
+                callback=MARCADOR_PARADA_JS % 'blue'
+            ).add_to(mapa)
+        
         # Añadir marcadores para cada punto con iconos según su posición
         for i, direccion in enumerate(ruta['ruta']):
+            if agrupar and 0 < i < len(ruta['ruta']) - 1:
+                continue
             coords = self.direcciones[direccion]['coordenadas']
             
             # Personalizar popup con información relevante
@@ -470,10 +1447,11 @@ class GestorDirecciones:
             ).add_to(mapa)
         
         # Añadir línea de la ruta principal
-        if 'geometria' in ruta and ruta['geometria']:
-            puntos_ruta = [
-                [p['lat'], p['lon']] for p in ruta['geometria']
-            ]
+        geometria = como_arreglo(ruta.get('geometria'))
+        if len(geometria):
+            # Sin vértices que no se distinguen ni con el zoom de calle
+            tolerancia = tolerancia_zoom(ZOOM_DETALLE_MAPA, float(geometria[:, 0].mean()))
+            puntos_ruta = simplificar(geometria, tolerancia).tolist()
         else:
             # Fallback: línea recta entre puntos si no hay geometría detallada
             puntos_ruta = [
@@ -515,57 +1493,72 @@ class GestorDirecciones:
         
         return archivo_mapa
 
-def _agregar_transbordos_mapa(self, mapa, ruta):
-    """Añade marcadores especiales para transbordos"""
-    # Implementación básica - deberías mejorarla según tu modelo de transporte
-    for i in range(len(ruta['ruta'])-1):
-        origen = ruta['ruta'][i]
-        destino = ruta['ruta'][i+1]
-        
-        if self._es_transbordo(origen, destino):
-            coords = self.direcciones[origen]['coordenadas']
+    
+    def marcadores_en_vista(self, sur: float, oeste: float, norte: float, este: float,
+                            zoom: int) -> List[Dict]:
+        """
+        Direcciones visibles en la vista de un mapa, agrupadas según el zoom.
+        
+        Returns:
+            Lista de {'lat', 'lon', 'cantidad', 'id'}; 'id' es la dirección
+            cuando el grupo tiene un solo punto (None en otro caso)
+        """
+        lats, lons = self.indice.coordenadas()
+        lat, lon, cantidad, representante = agrupar_en_vista(lats, lons, (sur, oeste, norte, este), zoom)
+        claves = self.indice.claves
+        return [
+            {'lat': la, 'lon': lo, 'cantidad': c, 'id': claves[r] if c == 1 else None}
+            for la, lo, c, r in zip(lat.tolist(), lon.tolist(), cantidad.tolist(), representante.tolist())
+        ]
+    
+    def _agregar_transbordos_mapa(self, mapa, ruta):
+        """Añade marcadores especiales para transbordos"""
+        lineas = ruta.get('lineas', [])
+        for i in self._indices_transbordo(lineas):
+            parada = ruta['ruta'][i]
+            coords = self.direcciones[parada]['coordenadas']
             folium.Marker(
                 [coords['lat'], coords['lon']],
                 icon=folium.Icon(color='orange', icon='exchange-alt', prefix='fa'),
-                popup=f"Transbordo en {origen}",
+                popup=f"Transbordo en {parada}: {lineas[i]}",
                 tooltip="Transbordo"
             ).add_to(mapa)
 
-def _agregar_leyenda_mapa(self, mapa, tipo_transporte):
-    """Añade una leyenda informativa al mapa"""
-    leyenda_html = f"""
-    <div style="
-        position: fixed; 
-        bottom: 50px; 
-        left: 50px; 
-        width: 180px; 
-        height: auto;
-        background: white;
-        padding: 10px;
-        border-radius: 5px;
-        border: 1px solid grey;
-        z-index: 9999;
-        font-size: 12px;
-    ">
-        <b>Leyenda del Mapa</b><br>
-        <i class="fa fa-home" style="color: green"></i> Origen<br>
-        <i class="fa fa-flag" style="color: red"></i> Destino<br>
-        <i class="fa fa-circle" style="color: blue"></i> Puntos intermedios<br>
-    """
-    
-    if tipo_transporte in ['publico', 'combinado']:
-        leyenda_html += """
-        <i class="fa fa-exchange-alt" style="color: orange"></i> Transbordo<br>
+    def _agregar_leyenda_mapa(self, mapa, tipo_transporte):
+        """Añade una leyenda informativa al mapa"""
+        leyenda_html = f"""
+        <div style="
+            position: fixed; 
+            bottom: 50px; 
+            left: 50px; 
+            width: 180px; 
+            height: auto;
+            background: white;
+            padding: 10px;
+            border-radius: 5px;
+            border: 1px solid grey;
+            z-index: 9999;
+            font-size: 12px;
+        ">
+            <b>Leyenda del Mapa</b><br>
+            <i class="fa fa-home" style="color: green"></i> Origen<br>
+            <i class="fa fa-flag" style="color: red"></i> Destino<br>
+            <i class="fa fa-circle" style="color: blue"></i> Puntos intermedios<br>
         """
-    
-    leyenda_html += f"""
-        <div style="height: 3px; background: {{
-            'privado': 'blue',
-            'publico': 'green',
-            'combinado': 'purple'
-        }}.get('{tipo_transporte}', 'blue'); margin-top: 5px;"></div>
-        Ruta {tipo_transporte.capitalize() if tipo_transporte else ''}
-    </div>
-    """
-    
-    mapa.get_root().html.add_child(folium.Element(leyenda_html))
\ No newline at end of file
+
+        if tipo_transporte in ['publico', 'combinado']:
+            leyenda_html += """
+            <i class="fa fa-exchange-alt" style="color: orange"></i> Transbordo<br>
+            """
+
+        leyenda_html += f"""
+            <div style="height: 3px; background: {{
+                'privado': 'blue',
+                'publico': 'green',
+                'combinado': 'purple'
+            }}.get('{tipo_transporte}', 'blue'); margin-top: 5px;"></div>
+            Ruta {tipo_transporte.capitalize() if tipo_transporte else ''}
+        </div>
+        """
+
+        mapa.get_root().html.add_child(folium.Element(leyenda_html))
\ No newline at end of file
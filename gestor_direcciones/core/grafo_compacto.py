@@ -0,0 +1,203 @@
+# Importaciones estándar
+import heapq
+from array import array
+from math import cos, radians
+from typing import Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+# Importaciones de terceros
+import networkx as nx
+import numpy as np
+
+INFINITO = float('inf')
+# Atributos de arista que se guardan como arreglos tipados
+PESOS_COMPACTOS = ('distancia', 'duracion')
+
+
+def _arreglo(tipo: str, valores: np.ndarray) -> array:
+    """Copia un arreglo de NumPy a un array.array del tipo indicado"""
+    resultado = array(tipo)
+    resultado.frombytes(np.ascontiguousarray(valores, dtype=np.dtype(tipo)).tobytes())
+    return resultado
+
+
+class GrafoCompacto:
+    """
+    Instantánea inmutable de un grafo en formato CSR con identificadores enteros.
+
+    Los vecinos del nodo i son destinos[inicio[i]:inicio[i + 1]] y cada peso se
+    guarda en un arreglo tipado paralelo. Las aristas paralelas (p. ej. de
+    distintas líneas) se conservan como entradas separadas con su línea.
+    """
+
+    def __init__(self, grafo, coordenadas: Optional[Callable[[Hashable], Optional[Tuple[float, float]]]] = None,
+                 pesos: Sequence[str] = PESOS_COMPACTOS):
+        """
+        Args:
+            grafo: Grafo de networkx (dirigido o no, simple o multigrafo)
+            coordenadas: Función que da (lat, lon) de un nodo, o None si no tiene
+            pesos: Atributos numéricos de arista a conservar (faltantes valen 1)
+        """
+        self.dirigido = grafo.is_directed()
+        self.nodos: List[Hashable] = list(grafo.nodes)
+        self.ids: Dict[Hashable, int] = {nodo: i for i, nodo in enumerate(self.nodos)}
+        self.lineas: List[str] = []  # Nombre de cada código de línea
+        codigos_linea: Dict[str, int] = {}
+
+        multigrafo = grafo.is_multigraph()
+        adyacencia = grafo._succ if self.dirigido else grafo._adj
+        inicio = [0]
+        destinos = []
+        valores = {peso: [] for peso in pesos}
+        lineas = []
+        for nodo in self.nodos:
+            for vecino, datos in adyacencia[nodo].items():
+                j = self.ids[vecino]
+                for atributos in (datos.values() if multigrafo else (datos,)):
+                    destinos.append(j)
+                    for peso, lista in valores.items():
+                        lista.append(atributos.get(peso, 1))
+                    linea = atributos.get('linea')
+                    if linea:
+                        if linea not in codigos_linea:
+                            codigos_linea[linea] = len(self.lineas)
+                            self.lineas.append(linea)
+                        lineas.append(codigos_linea[linea])
+                    else:
+                        lineas.append(-1)
+            inicio.append(len(destinos))
+
+        self.inicio = array('q', inicio)
+        self.destinos = array('q', destinos)
+        self.pesos: Dict[str, array] = {peso: array('d', lista) for peso, lista in valores.items()}
+        self.linea = array('i', lineas)
+        self._asignar_coordenadas(coordenadas)
+
+    @classmethod
+    def desde_aristas(cls, nodos: List[Hashable], origenes: np.ndarray, destinos: np.ndarray,
+                      pesos: Dict[str, np.ndarray], lineas: np.ndarray, nombres_lineas: List[str],
+                      coordenadas: Optional[Callable[[Hashable], Optional[Tuple[float, float]]]] = None
+                      ) -> 'GrafoCompacto':
+        """
+        Construye un grafo dirigido directamente desde arreglos de aristas.
+
+        Evita pasar por networkx cuando las aristas ya se calcularon en lote;
+        lineas trae el código de cada arista (índice en nombres_lineas o -1).
+        """
+        grafo = object.__new__(cls)
+        grafo.dirigido = True
+        grafo.nodos = list(nodos)
+        grafo.ids = {nodo: i for i, nodo in enumerate(grafo.nodos)}
+        grafo.lineas = list(nombres_lineas)
+        origenes = np.asarray(origenes, dtype=np.int64)
+        orden = np.argsort(origenes, kind='stable')
+        conteos = np.bincount(origenes, minlength=len(grafo.nodos))
+        grafo.inicio = _arreglo('q', np.concatenate([[0], np.cumsum(conteos)]))
+        grafo.destinos = _arreglo('q', np.asarray(destinos)[orden])
+        grafo.pesos = {peso: _arreglo('d', np.asarray(valores)[orden]) for peso, valores in pesos.items()}
+        grafo.linea = _arreglo('i', np.asarray(lineas)[orden])
+        grafo._asignar_coordenadas(coordenadas)
+        return grafo
+
+    def _asignar_coordenadas(self, coordenadas: Optional[Callable[[Hashable], Optional[Tuple[float, float]]]]):
+        """Coordenadas en radianes para heurísticas geográficas (NaN si el nodo no tiene)"""
+        latitudes, longitudes = [], []
+        for nodo in self.nodos:
+            punto = coordenadas(nodo) if coordenadas else None
+            latitudes.append(radians(punto[0]) if punto else float('nan'))
+            longitudes.append(radians(punto[1]) if punto else float('nan'))
+        self.lat = array('d', latitudes)
+        self.lon = array('d', longitudes)
+        self.cos_lat = array('d', (cos(lat) for lat in latitudes))
+
+    def __len__(self) -> int:
+        return len(self.nodos)
+
+    @property
+    def numero_aristas(self) -> int:
+        """Entradas de la CSR (cada arista no dirigida cuenta en ambos sentidos)"""
+        return len(self.destinos)
+
+    def origenes(self) -> np.ndarray:
+        """Nodo de origen de cada entrada de la CSR"""
+        return np.repeat(np.arange(len(self.nodos)), np.diff(np.frombuffer(self.inicio, dtype=np.int64)))
+
+    def invertido(self) -> 'GrafoCompacto':
+        """Grafo con todas las aristas invertidas (el mismo si no es dirigido)"""
+        if not self.dirigido:
+            return self
+        origenes = self.origenes()
+        destinos = np.frombuffer(self.destinos, dtype=np.int64)
+        orden = np.argsort(destinos, kind='stable')
+
+        invertido = object.__new__(GrafoCompacto)
+        invertido.__dict__.update(self.__dict__)
+        conteos = np.bincount(destinos, minlength=len(self.nodos))
+        invertido.inicio = _arreglo('q', np.concatenate([[0], np.cumsum(conteos)]))
+        invertido.destinos = _arreglo('q', origenes[orden])
+        invertido.pesos = {peso: _arreglo('d', np.frombuffer(valores, dtype=np.float64)[orden])
+                           for peso, valores in self.pesos.items()}
+        invertido.linea = _arreglo('i', np.frombuffer(self.linea, dtype=np.int32)[orden])
+        return invertido
+
+    def buscar(self, origen: int, peso: Optional[str] = None, destino: Optional[int] = None,
+               heuristica: Optional[Callable[[int], float]] = None) -> Tuple[List[float], List[int]]:
+        """
+        Dijkstra (o A* si hay heurística) desde un nodo por su identificador.
+
+        Con destino la búsqueda se detiene al cerrarlo y sólo su costo es definitivo.
+
+        Returns:
+            (costos, previos) indexados por identificador; INFINITO y -1 si no se alcanzó
+        """
+        n = len(self.nodos)
+        costos = [INFINITO] * n
+        previos = [-1] * n
+        cerrados = bytearray(n)
+        inicio, destinos = self.inicio, self.destinos
+        pesos = self.pesos[peso] if peso else None
+
+        costos[origen] = 0
+        frontera = [(heuristica(origen) if heuristica else 0, 0, origen)]
+        while frontera:
+            _, costo, nodo = heapq.heappop(frontera)
+            if cerrados[nodo]:
+                continue
+            cerrados[nodo] = 1
+            if nodo == destino:
+                break
+            for k in range(inicio[nodo], inicio[nodo + 1]):
+                vecino = destinos[k]
+                if cerrados[vecino]:
+                    continue
+                nuevo = costo + (pesos[k] if pesos is not None else 1)
+                if nuevo < costos[vecino]:
+                    costos[vecino] = nuevo
+                    previos[vecino] = nodo
+                    prioridad = nuevo + heuristica(vecino) if heuristica else nuevo
+                    heapq.heappush(frontera, (prioridad, nuevo, vecino))
+        return costos, previos
+
+    def camino(self, previos: List[int], destino: int) -> List[Hashable]:
+        """Reconstruye el camino (con los nodos originales) hasta un destino"""
+        camino = [destino]
+        while previos[camino[-1]] != -1:
+            camino.append(previos[camino[-1]])
+        return [self.nodos[i] for i in reversed(camino)]
+
+    def ruta(self, origen: Hashable, destino: Hashable, peso: Optional[str] = None,
+             heuristica: Optional[Callable[[int], float]] = None) -> Tuple[List[Hashable], float]:
+        """
+        Camino mínimo y su costo entre dos nodos con una sola búsqueda.
+
+        Raises:
+            nx.NodeNotFound: si el origen o el destino no están en el grafo
+            nx.NetworkXNoPath: si no hay camino
+        """
+        for nodo in (origen, destino):
+            if nodo not in self.ids:
+                raise nx.NodeNotFound(f"El nodo {nodo} no está en el grafo")
+        i, j = self.ids[origen], self.ids[destino]
+        costos, previos = self.buscar(i, peso, j, heuristica)
+        if costos[j] == INFINITO:
+            raise nx.NetworkXNoPath(f"No hay camino entre {origen} y {destino}")
+        return self.camino(previos, j), costos[j]
@@ -0,0 +1,318 @@
+# Importaciones estándar
+import csv
+import io
+import threading
+import zipfile
+from array import array
+from operator import itemgetter
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+# Importaciones de terceros
+import numpy as np
+
+# Importaciones propias
+from .horarios import a_segundos
+
+# Distancia máxima (km) para asociar una parada a una dirección ya registrada
+RADIO_PARADA_KM = 0.15
+# Filas de stop_times entre cada aviso de progreso (y revisión de cancelación)
+FILAS_POR_AVISO = 50000
+# Tipo de vehículo según el route_type de GTFS
+TIPOS_RUTA = {
+    '0': 'tranvia', '1': 'metro', '2': 'tren', '3': 'bus', '4': 'ferry',
+    '5': 'funicular', '6': 'teleferico', '7': 'funicular', '11': 'trolebus', '12': 'monorriel'
+}
+
+
+class _Cancelado(Exception):
+    """Interrumpe la lectura cuando el usuario cancela la importación"""
+
+
+def leer_tabla(zf: zipfile.ZipFile, nombre: str, columnas: Sequence[str],
+               obligatorias: Sequence[str] = (),
+               aviso: Optional[Callable[[int, int], None]] = None) -> Iterator[Tuple[str, ...]]:
+    """
+    Recorre un archivo CSV de un GTFS fila por fila sin cargarlo completo.
+
+    Args:
+        zf: Archivo zip del GTFS
+        nombre: Archivo dentro del zip (p. ej. 'stop_times.txt')
+        columnas: Columnas a devolver, en ese orden ('' si la columna no existe)
+        obligatorias: Columnas sin las que no se puede importar
+        aviso: Se llama cada FILAS_POR_AVISO filas con (bytes leídos, bytes totales)
+    """
+    try:
+        info = zf.getinfo(nombre)
+    except KeyError:
+        raise ValueError(f"El GTFS no contiene {nombre}")
+    with zf.open(info) as binario:
+        lector = csv.reader(io.TextIOWrapper(binario, encoding='utf-8-sig', newline=''))
+        encabezado = [c.strip() for c in next(lector, [])]
+        faltantes = [c for c in obligatorias if c not in encabezado]
+        if faltantes:
+            raise ValueError(f"A {nombre} le faltan las columnas {', '.join(faltantes)}")
+        posiciones = [encabezado.index(c) if c in encabezado else None for c in columnas]
+        # Camino rápido: todas las columnas existen y la fila está completa
+        completa = None not in posiciones
+        tomar = itemgetter(*posiciones, 0) if completa else None
+        ancho = max((p for p in posiciones if p is not None), default=0)
+        for n, fila in enumerate(lector, 1):
+            if completa and len(fila) > ancho:
+                yield tomar(fila)[:-1]
+            else:
+                yield tuple(fila[p] if p is not None and p < len(fila) else '' for p in posiciones)
+            if aviso and n % FILAS_POR_AVISO == 0:
+                aviso(binario.tell(), info.file_size)
+
+
+class ImportadorGTFS:
+    """
+    Importa paradas, líneas y horarios de un GTFS local (zip) al gestor.
+
+    stop_times se lee como flujo y cada fila se guarda en columnas de arreglos
+    tipados (unos 20 bytes por fila), así que un feed metropolitano con
+    millones de horarios no se convierte en millones de diccionarios.
+    """
+
+    def __init__(self, gestor, radio_km: float = RADIO_PARADA_KM, crear_paradas: bool = True,
+                 servicios: Optional[Sequence[str]] = None):
+        """
+        Args:
+            gestor: GestorDirecciones donde se registran paradas, líneas y horarios
+            radio_km: Distancia máxima para asociar una parada a la dirección más cercana
+            crear_paradas: Registrar como dirección nueva cada parada sin dirección cercana
+                (si es False esas paradas se omiten)
+            servicios: service_id a importar (p. ej. sólo los de un día); None = todos
+        """
+        self.gestor = gestor
+        self.radio_km = radio_km
+        self.crear_paradas = crear_paradas
+        self.servicios: Optional[Set[str]] = set(servicios) if servicios is not None else None
+
+    def _leer_paradas(self, zf: zipfile.ZipFile) -> Tuple[Dict[str, int], List[str], Dict[str, Dict]]:
+        """
+        Asocia cada parada a la dirección registrada más cercana o a una nueva.
+
+        Returns:
+            (código local por stop_id, dirección de cada código, direcciones nuevas por registrar)
+        """
+        codigos: Dict[str, int] = {}
+        direcciones: List[str] = []
+        posiciones: Dict[str, int] = {}
+        nuevas: Dict[str, Dict] = {}
+        indice = self.gestor.indice
+        for stop_id, nombre, lat, lon, tipo in leer_tabla(
+                zf, 'stops.txt', ('stop_id', 'stop_name', 'stop_lat', 'stop_lon', 'location_type'),
+                obligatorias=('stop_id', 'stop_lat', 'stop_lon')):
+            if tipo not in ('', '0') or not lat or not lon:
+                continue  # Estaciones y accesos: los horarios usan los andenes
+            lat, lon = float(lat), float(lon)
+            cercanas = indice.k_cercanos(lat, lon, 1)
+            if cercanas and cercanas[0][1] <= self.radio_km:
+                direccion = cercanas[0][0]
+            elif self.crear_paradas:
+                direccion = nombre or stop_id
+                if direccion in self.gestor.direcciones or direccion in nuevas:
+                    direccion = f"{direccion} [{stop_id}]"
+                nuevas[direccion] = {
+                    'direccion': direccion,
+                    'coordenadas': {'lat': lat, 'lon': lon},
+                    'componentes': {},
+                    'osm_id': None,
+                    'tipo': 'parada',
+                    'categoria': 'transporte',
+                    'gtfs_stop_id': stop_id
+                }
+            else:
+                continue
+            if direccion not in posiciones:
+                posiciones[direccion] = len(direcciones)
+                direcciones.append(direccion)
+            codigos[stop_id] = posiciones[direccion]
+        return codigos, direcciones, nuevas
+
+    def _leer_lineas(self, zf: zipfile.ZipFile) -> Dict[str, Tuple[str, str]]:
+        """(nombre de la línea, tipo de vehículo) por route_id"""
+        lineas = {}
+        for route_id, corto, largo, tipo in leer_tabla(
+                zf, 'routes.txt', ('route_id', 'route_short_name', 'route_long_name', 'route_type'),
+                obligatorias=('route_id',)):
+            lineas[route_id] = (corto or largo or route_id, TIPOS_RUTA.get(tipo, 'bus'))
+        return lineas
+
+    def _leer_viajes(self, zf: zipfile.ZipFile, lineas: Dict[str, Tuple[str, str]]) -> Tuple[Dict[str, int], List[str]]:
+        """Código local por trip_id (sólo los servicios pedidos) y route_id de cada código"""
+        viajes: Dict[str, int] = {}
+        rutas: List[str] = []
+        for trip_id, route_id, servicio in leer_tabla(
+                zf, 'trips.txt', ('trip_id', 'route_id', 'service_id'),
+                obligatorias=('trip_id', 'route_id')):
+            if route_id not in lineas or (self.servicios is not None and servicio not in self.servicios):
+                continue
+            viajes[trip_id] = len(rutas)
+            rutas.append(route_id)
+        return viajes, rutas
+
+    def _leer_horarios(self, zf: zipfile.ZipFile, paradas: Dict[str, int], viajes: Dict[str, int],
+                       aviso: Callable[[int, int], None]) -> Dict[str, np.ndarray]:
+        """Lee stop_times en columnas tipadas; las horas vacías quedan en -1"""
+        columnas = {nombre: array('i') for nombre in ('viaje', 'secuencia', 'parada', 'llegada', 'salida')}
+        viaje_col, secuencia_col, parada_col = columnas['viaje'], columnas['secuencia'], columnas['parada']
+        llegada_col, salida_col = columnas['llegada'], columnas['salida']
+        horas = {'': -1}  # Las horas se repiten mucho: cada texto se convierte una vez
+        for trip_id, llegada, salida, stop_id, secuencia in leer_tabla(
+                zf, 'stop_times.txt',
+                ('trip_id', 'arrival_time', 'departure_time', 'stop_id', 'stop_sequence'),
+                obligatorias=('trip_id', 'stop_id', 'stop_sequence'), aviso=aviso):
+            viaje = viajes.get(trip_id)
+            parada = paradas.get(stop_id)
+            if viaje is None or parada is None:
+                continue
+            viaje_col.append(viaje)
+            secuencia_col.append(int(secuencia))
+            parada_col.append(parada)
+            for texto, columna in ((llegada, llegada_col), (salida, salida_col)):
+                segundos = horas.get(texto)
+                if segundos is None:
+                    segundos = horas[texto] = a_segundos(texto)
+                columna.append(segundos)
+        return {nombre: np.frombuffer(columna, dtype=np.int32) if len(columna) else np.zeros(0, np.int32)
+                for nombre, columna in columnas.items()}
+
+    @staticmethod
+    def _limpiar(filas: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """
+        Ordena por viaje y secuencia, completa horas faltantes y descarta viajes inválidos.
+
+        Las horas vacías (paradas sin hora fija) se interpolan; paradas seguidas
+        que caen en la misma dirección se funden en una, y se descartan los
+        viajes sin horas en sus extremos, con menos de dos paradas o con horas
+        que retroceden.
+        """
+        orden = np.lexsort((filas['secuencia'], filas['viaje']))
+        viaje, parada = filas['viaje'][orden], filas['parada'][orden]
+        llegada, salida = filas['llegada'][orden].copy(), filas['salida'][orden].copy()
+        n = len(viaje)
+        if n == 0:
+            return {'viaje': viaje, 'parada': parada, 'llegada': llegada, 'salida': salida}
+
+        llegada = np.where(llegada < 0, salida, llegada)
+        salida = np.where(salida < 0, llegada, salida)
+        primeras = np.ones(n, dtype=bool)
+        primeras[1:] = viaje[1:] != viaje[:-1]
+        ultimas = np.ones(n, dtype=bool)
+        ultimas[:-1] = primeras[1:]
+        conocidas = llegada >= 0
+        valido = np.ones(int(viaje.max()) + 1, dtype=bool)
+        valido[viaje[(primeras | ultimas) & ~conocidas]] = False
+        if not conocidas.all():
+            # Con los extremos de cada viaje conocidos, interpolar no mezcla viajes
+            posiciones = np.arange(n)
+            faltan = ~conocidas
+            llegada[faltan] = np.interp(posiciones[faltan], posiciones[conocidas], llegada[conocidas])
+            salida[faltan] = llegada[faltan]
+
+        # Fundir paradas consecutivas del mismo viaje en la misma dirección
+        inicio_grupo = primeras.copy()
+        inicio_grupo[1:] |= parada[1:] != parada[:-1]
+        primeros = np.flatnonzero(inicio_grupo)
+        finales = np.append(primeros[1:] - 1, n - 1)
+        viaje, parada = viaje[primeros], parada[primeros]
+        llegada, salida = llegada[primeros], salida[finales]
+
+        # Viajes con menos de dos paradas u horas que retroceden
+        conteos = np.bincount(viaje, minlength=len(valido))
+        valido &= conteos >= 2
+        continua = viaje[1:] == viaje[:-1]
+        retrocede = (llegada > salida)
+        valido[viaje[retrocede]] = False
+        valido[viaje[:-1][continua & (salida[:-1] > llegada[1:])]] = False
+        mantener = valido[viaje]
+        return {'viaje': viaje[mantener], 'parada': parada[mantener],
+                'llegada': llegada[mantener], 'salida': salida[mantener]}
+
+    def importar(self, archivo: str, progreso: Optional[Callable[[int, int], None]] = None,
+                 cancelar: Optional[threading.Event] = None) -> Dict[str, int]:
+        """
+        Importa el GTFS: registra las paradas, agrega cada patrón de línea al grafo
+        de transporte y todos los viajes al horario del gestor.
+
+        Nada se modifica hasta terminar de leer, así que una importación cancelada
+        deja el gestor como estaba.
+
+        Returns:
+            Conteo de 'paradas', 'paradas_nuevas', 'lineas', 'patrones', 'viajes',
+            'horarios' y 'viajes_descartados', y 'cancelado' (1 si se canceló)
+        """
+        def aviso(hechos, total):
+            if progreso:
+                progreso(hechos, total)
+            if cancelar and cancelar.is_set():
+                raise _Cancelado()
+
+        resumen = {'paradas': 0, 'paradas_nuevas': 0, 'lineas': 0, 'patrones': 0,
+                   'viajes': 0, 'horarios': 0, 'viajes_descartados': 0, 'cancelado': 0}
+        try:
+            with zipfile.ZipFile(archivo) as zf:
+                codigos_parada, direcciones, nuevas = self._leer_paradas(zf)
+                lineas = self._leer_lineas(zf)
+                viajes, rutas = self._leer_viajes(zf, lineas)
+                filas = self._leer_horarios(zf, codigos_parada, viajes, aviso)
+        except _Cancelado:
+            resumen['cancelado'] = 1
+            return resumen
+        del codigos_parada, viajes  # Los identificadores del GTFS ya no hacen falta
+
+        filas = self._limpiar(filas)
+        viaje, parada = filas['viaje'], filas['parada']
+        cortes = np.flatnonzero(viaje[1:] != viaje[:-1]) + 1
+        inicio = np.concatenate([[0], cortes, [len(viaje)]]) if len(viaje) else np.zeros(1, np.int64)
+        codigos_viaje = viaje[inicio[:-1]]
+        resumen['viajes_descartados'] = len(rutas) - len(codigos_viaje)
+        if len(codigos_viaje) == 0:
+            return resumen
+
+        # Paradas nuevas que algún viaje usa
+        usadas = np.unique(parada)
+        paradas_nuevas = {}
+        for codigo in usadas.tolist():
+            direccion = direcciones[codigo]
+            if direccion in nuevas:
+                paradas_nuevas[direccion] = nuevas[direccion]
+        resumen['paradas'] = len(usadas)
+
+        # Grafo de transporte: un recorrido por patrón (línea y secuencia de paradas),
+        # con las duraciones del primer viaje que lo sigue
+        patrones = {}
+        for v, (a, b) in enumerate(zip(inicio[:-1].tolist(), inicio[1:].tolist())):
+            clave = (rutas[codigos_viaje[v]], parada[a:b].tobytes())
+            if clave not in patrones:
+                patrones[clave] = (a, b)
+        recorridos = []
+        for (route_id, _), (a, b) in patrones.items():
+            nombre, tipo = lineas[route_id]
+            recorridos.append({
+                'paradas': [direcciones[c] for c in parada[a:b].tolist()],
+                'tipo': tipo,
+                'linea': nombre,
+                'duraciones': ((filas['llegada'][a + 1:b] - filas['salida'][a:b - 1]) / 60).tolist()
+            })
+
+        if cancelar and cancelar.is_set():
+            # Última oportunidad: una vez dentro del candado la importación llega al final
+            resumen['cancelado'] = 1
+            return resumen
+
+        # Todo se escribe con el candado del gestor tomado una vez: paradas y
+        # recorridos en lote (una sola invalidación) y los viajes en el horario
+        with self.gestor.bloqueo:
+            resumen['paradas_nuevas'] = self.gestor.registrar_red_transporte(paradas_nuevas, recorridos)
+            horario = self.gestor.horario
+            traduccion = np.array([horario.id_parada(d) for d in direcciones], dtype=np.int32)
+            nombres_viaje = [lineas[rutas[v]][0] for v in codigos_viaje.tolist()]
+            horario.agregar_viajes(nombres_viaje, inicio, traduccion[parada], filas['llegada'], filas['salida'])
+        resumen['viajes'] = len(codigos_viaje)
+        resumen['horarios'] = len(viaje)
+        resumen['patrones'] = len(patrones)
+        resumen['lineas'] = len({ruta for ruta, _ in patrones})
+        return resumen
@@ -0,0 +1,406 @@
+# Importaciones estándar
+import base64
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+# Importaciones de terceros
+import numpy as np
+
+# Importaciones propias
+from .grafo_compacto import _arreglo
+
+# Hora "nunca" en segundos (cabe en un entero de 32 bits)
+SIN_LLEGADA = 2 ** 31 - 1
+# Viajes (abordajes) máximos por defecto en una consulta: 4 transbordos
+MAX_VIAJES = 5
+# Duración máxima de un trayecto al calcular perfiles (segundos)
+HORIZONTE_PERFIL = 2 * 3600
+# Cuánto después de la llegada más temprana se siguen buscando trayectos con
+# menos transbordos (segundos)
+HOLGURA_TRANSBORDOS = 10 * 60
+
+Hora = Union[int, float, str, time, datetime]
+
+
+def a_segundos(hora: Hora) -> int:
+    """
+    Convierte una hora a segundos desde la medianoche.
+
+    Acepta segundos, 'HH:MM' o 'HH:MM:SS' (como en GTFS, puede pasar de 24:00),
+    datetime.time o datetime.
+    """
+    if isinstance(hora, datetime):
+        hora = hora.time()
+    if isinstance(hora, time):
+        return hora.hour * 3600 + hora.minute * 60 + hora.second
+    if isinstance(hora, str):
+        partes = [int(p) for p in hora.strip().split(':')]
+        if len(partes) not in (2, 3):
+            raise ValueError(f"Hora inválida: '{hora}'")
+        horas, minutos, segundos = partes + [0] * (3 - len(partes))
+        return horas * 3600 + minutos * 60 + segundos
+    return int(hora)
+
+
+def formatear_hora(segundos: int) -> str:
+    """Segundos desde la medianoche a 'HH:MM'"""
+    return f"{segundos // 3600:02d}:{segundos % 3600 // 60:02d}"
+
+
+class Horario:
+    """
+    Horarios de transporte público para consultas por hora (Connection Scan).
+
+    Cada viaje es una secuencia de paradas con sus horas; se descompone en
+    conexiones (parada a parada) ordenadas por hora de salida y guardadas en
+    arreglos tipados, de modo que un día completo de una ciudad ocupa unas
+    decenas de bytes por conexión.
+    """
+
+    def __init__(self, cambio_minimo: int = 0):
+        """
+        Args:
+            cambio_minimo: Segundos mínimos para cambiar de viaje en una parada
+        """
+        self.cambio_minimo = cambio_minimo
+        self.paradas: List[str] = []
+        self.ids: Dict[str, int] = {}
+        self.lineas: List[str] = []
+        self._codigos_linea: Dict[str, int] = {}
+
+        # Viajes en formato CSR: las paradas del viaje v son viaje_paradas[viaje_inicio[v]:viaje_inicio[v + 1]]
+        self.viaje_linea = array('i')
+        self.viaje_inicio = array('q', [0])
+        self.viaje_paradas = array('i')
+        self.viaje_llegadas = array('i')
+        self.viaje_salidas = array('i')
+        self._compilado = False
+
+    def __len__(self) -> int:
+        """Número de viajes"""
+        return len(self.viaje_linea)
+
+    def id_parada(self, parada: str) -> int:
+        """Identificador entero de una parada (la registra si es nueva)"""
+        if parada not in self.ids:
+            self.ids[parada] = len(self.paradas)
+            self.paradas.append(parada)
+        return self.ids[parada]
+
+    def agregar_viaje(self, linea: str, paradas: Sequence[str], llegadas: Sequence[Hora],
+                      salidas: Optional[Sequence[Hora]] = None):
+        """
+        Agrega un viaje (un recorrido de un vehículo) al horario.
+
+        Args:
+            linea: Nombre de la línea a la que pertenece
+            paradas: Paradas en el orden en que se visitan
+            llegadas: Hora de llegada a cada parada
+            salidas: Hora de salida de cada parada (por defecto igual a la llegada)
+        """
+        llegadas = [a_segundos(h) for h in llegadas]
+        salidas = llegadas if salidas is None else [a_segundos(h) for h in salidas]
+        if len(paradas) < 2 or not len(paradas) == len(llegadas) == len(salidas):
+            raise ValueError("Un viaje necesita al menos dos paradas y una hora por parada")
+        horas = [h for par in zip(llegadas, salidas) for h in par]
+        if any(a > b for a, b in zip(horas, horas[1:])):
+            raise ValueError(f"Las horas del viaje de la línea '{linea}' no son crecientes")
+
+        if linea not in self._codigos_linea:
+            self._codigos_linea[linea] = len(self.lineas)
+            self.lineas.append(linea)
+        self.viaje_linea.append(self._codigos_linea[linea])
+        self.viaje_paradas.extend(self.id_parada(p) for p in paradas)
+        self.viaje_llegadas.extend(llegadas)
+        self.viaje_salidas.extend(salidas)
+        self.viaje_inicio.append(len(self.viaje_paradas))
+        self._compilado = False
+
+    def agregar_viajes(self, lineas: Sequence[str], inicio: np.ndarray, paradas: np.ndarray,
+                       llegadas: np.ndarray, salidas: np.ndarray):
+        """
+        Agrega muchos viajes de una vez (p. ej. de un GTFS) sin pasar por listas.
+
+        Args:
+            lineas: Línea de cada viaje
+            inicio: Desplazamientos CSR: el viaje v ocupa las filas inicio[v]:inicio[v + 1]
+            paradas: Identificador de parada de cada fila (ver id_parada)
+            llegadas: Hora de llegada de cada fila en segundos
+            salidas: Hora de salida de cada fila en segundos
+        """
+        inicio = np.asarray(inicio, dtype=np.int64)
+        paradas = np.asarray(paradas, dtype=np.int32)
+        llegadas = np.asarray(llegadas, dtype=np.int32)
+        salidas = np.asarray(salidas, dtype=np.int32)
+        if len(lineas) != len(inicio) - 1 or inicio[0] != 0 or inicio[-1] != len(paradas):
+            raise ValueError("Los desplazamientos no corresponden con las filas")
+        if len(lineas) == 0:
+            return
+        if np.diff(inicio).min() < 2:
+            raise ValueError("Un viaje necesita al menos dos paradas")
+        # Horas crecientes: llegada <= salida y salida <= llegada a la siguiente del mismo viaje
+        continua = np.ones(len(paradas) - 1, dtype=bool)
+        continua[inicio[1:-1] - 1] = False
+        if (llegadas > salidas).any() or (salidas[:-1][continua] > llegadas[1:][continua]).any():
+            raise ValueError("Las horas de algún viaje no son crecientes")
+
+        codigos = []
+        for linea in lineas:
+            if linea not in self._codigos_linea:
+                self._codigos_linea[linea] = len(self.lineas)
+                self.lineas.append(linea)
+            codigos.append(self._codigos_linea[linea])
+        desplazamiento = len(self.viaje_paradas)
+        self.viaje_linea.extend(codigos)
+        self.viaje_inicio.frombytes((inicio[1:] + desplazamiento).tobytes())
+        self.viaje_paradas.frombytes(paradas.tobytes())
+        self.viaje_llegadas.frombytes(llegadas.tobytes())
+        self.viaje_salidas.frombytes(salidas.tobytes())
+        self._compilado = False
+
+    def _compilar(self):
+        """Genera las conexiones ordenadas por hora de salida"""
+        if self._compilado:
+            return
+        inicio = np.frombuffer(self.viaje_inicio, dtype=np.int64)
+        paradas = np.frombuffer(self.viaje_paradas, dtype=np.int32)
+        # Cada posición que no es la última de su viaje inicia una conexión
+        ultimas = np.zeros(len(paradas), dtype=bool)
+        ultimas[inicio[1:] - 1] = True
+        posiciones = np.nonzero(~ultimas)[0]
+        viajes = np.repeat(np.arange(len(self.viaje_linea)), np.diff(inicio) - 1)
+        salidas = np.frombuffer(self.viaje_salidas, dtype=np.int32)[posiciones]
+        orden = np.argsort(salidas, kind='stable')
+        posiciones = posiciones[orden]
+
+        self.c_salida = _arreglo('i', salidas[orden])
+        self.c_llegada = _arreglo('i', np.frombuffer(self.viaje_llegadas, dtype=np.int32)[posiciones + 1])
+        self.c_desde = _arreglo('i', paradas[posiciones])
+        self.c_hasta = _arreglo('i', paradas[posiciones + 1])
+        self.c_viaje = _arreglo('i', viajes[orden])
+        self.c_posicion = _arreglo('q', posiciones)
+        self._compilado = True
+
+    # --- Llegada más temprana ---
+
+    def _escanear(self, origen: int, salida: int, objetivos: Optional[Iterable[int]],
+                  max_viajes: int, holgura: int):
+        """
+        Connection Scan con etiquetas por número de viajes.
+
+        llegadas[k][p] es la llegada más temprana a p usando a lo más k viajes;
+        el escaneo se detiene 'holgura' segundos después de la llegada más
+        temprana al último objetivo.
+        """
+        self._compilar()
+        n = len(self.paradas)
+        K = max_viajes
+        llegadas = [[SIN_LLEGADA] * n for _ in range(K + 1)]
+        for k in range(K + 1):
+            llegadas[k][origen] = salida
+        # (k, parada) -> (conexión de bajada, conexión de subida, viajes usados)
+        previos: Dict[Tuple[int, int], Tuple[int, int, int]] = {}
+        # Por viaje: viajes usados al abordarlo (K + 1 = no alcanzado) y conexión de subida
+        niveles_viaje = [K + 1] * len(self.viaje_linea)
+        subidas_viaje = [-1] * len(self.viaje_linea)
+
+        objetivos = set(objetivos) if objetivos is not None else set()
+        ultimas = llegadas[K]  # Llegada más temprana con cualquier número de viajes
+        limite = SIN_LLEGADA
+        c_salida, c_llegada = self.c_salida, self.c_llegada
+        c_desde, c_hasta, c_viaje = self.c_desde, self.c_hasta, self.c_viaje
+        cambio = self.cambio_minimo
+
+        for c in range(bisect_left(c_salida, salida), len(c_salida)):
+            hora = c_salida[c]
+            if hora >= limite:
+                break
+            desde = c_desde[c]
+            viaje = c_viaje[c]
+            nivel = niveles_viaje[viaje]
+            # Abordar aquí si se llega con menos viajes que los que ya lo alcanzaron
+            if nivel > 1 and ultimas[desde] <= hora:
+                for k in range(min(nivel - 1, K)):
+                    if llegadas[k][desde] + (cambio if k else 0) <= hora:
+                        nivel = niveles_viaje[viaje] = k + 1
+                        subidas_viaje[viaje] = c
+                        break
+            if nivel > K:
+                continue
+            subida = subidas_viaje[viaje]
+
+            hasta = c_hasta[c]
+            llegada = c_llegada[c]
+            for k in range(nivel, K + 1):
+                if llegada >= llegadas[k][hasta]:
+                    break  # Las etiquetas no aumentan con k
+                llegadas[k][hasta] = llegada
+                previos[k, hasta] = (c, subida, nivel)
+            if hasta in objetivos and llegada <= ultimas[hasta]:
+                limite = min(SIN_LLEGADA, max(ultimas[o] for o in objetivos) + holgura)
+        return llegadas, previos
+
+    def _tramo(self, subida: int, bajada: int) -> Dict:
+        """Tramo a bordo de un viaje entre dos conexiones"""
+        viaje = self.c_viaje[bajada]
+        primera, ultima = self.c_posicion[subida], self.c_posicion[bajada] + 1
+        return {
+            'linea': self.lineas[self.viaje_linea[viaje]],
+            'viaje': viaje,
+            'paradas': [self.paradas[p] for p in self.viaje_paradas[primera:ultima + 1]],
+            'salida': self.viaje_salidas[primera],
+            'llegada': self.viaje_llegadas[ultima]
+        }
+
+    def _viajes(self, etiquetas, origen: int, destino: int, salida: int) -> List[Dict]:
+        """Trayectos de Pareto (llegada, transbordos) hasta un destino, de menos a más transbordos"""
+        llegadas, previos = etiquetas
+        if destino == origen:
+            return [{'salida': salida, 'llegada': salida, 'transbordos': 0, 'tramos': [],
+                     'ruta': [self.paradas[origen]], 'lineas': []}]
+        resultado = []
+        mejor = SIN_LLEGADA
+        for k in range(1, len(llegadas)):
+            if llegadas[k][destino] >= mejor:
+                continue
+            mejor = llegadas[k][destino]
+            tramos = []
+            parada, nivel = destino, k
+            while nivel > 0:
+                bajada, subida, viajes = previos[nivel, parada]
+                tramos.append(self._tramo(subida, bajada))
+                parada, nivel = self.c_desde[subida], viajes - 1
+            tramos.reverse()
+            ruta, lineas = [tramos[0]['paradas'][0]], []
+            for tramo in tramos:
+                ruta.extend(tramo['paradas'][1:])
+                lineas.extend([tramo['linea']] * (len(tramo['paradas']) - 1))
+            resultado.append({
+                'salida': tramos[0]['salida'],
+                'llegada': mejor,
+                'transbordos': len(tramos) - 1,
+                'tramos': tramos,
+                'ruta': ruta,
+                'lineas': lineas
+            })
+        return resultado
+
+    def consulta(self, origen: str, destino: str, salida: Hora,
+                 max_transbordos: int = MAX_VIAJES - 1,
+                 holgura: int = HOLGURA_TRANSBORDOS) -> List[Dict]:
+        """
+        Trayectos que llegan lo más temprano posible saliendo a partir de una hora.
+
+        Devuelve el conjunto de Pareto (llegada, transbordos): el primero es el de
+        menos transbordos y el último el que llega antes. Los de menos transbordos
+        sólo se buscan hasta 'holgura' segundos después de la llegada más temprana.
+        Cada trayecto trae sus tramos (línea, paradas, horas), la ruta completa y
+        la línea de cada tramo.
+        """
+        return self.consulta_varios(origen, [destino], salida, max_transbordos, holgura)[destino]
+
+    def consulta_varios(self, origen: str, destinos: Sequence[str], salida: Hora,
+                        max_transbordos: int = MAX_VIAJES - 1,
+                        holgura: int = HOLGURA_TRANSBORDOS) -> Dict[str, List[Dict]]:
+        """Como consulta() pero hacia varios destinos con un solo escaneo"""
+        salida = a_segundos(salida)
+        conocidos = [d for d in destinos if d in self.ids]
+        if origen not in self.ids or not conocidos:
+            return {d: [] for d in destinos}
+        i = self.ids[origen]
+        etiquetas = self._escanear(i, salida, [self.ids[d] for d in conocidos],
+                                   max_transbordos + 1, holgura)
+        resultado = {d: [] for d in destinos}
+        for d in conocidos:
+            resultado[d] = self._viajes(etiquetas, i, self.ids[d], salida)
+        return resultado
+
+    # --- Perfiles ---
+
+    def perfil(self, origen: str, destino: str, desde: Hora, hasta: Hora,
+               horizonte: int = HORIZONTE_PERFIL) -> List[Tuple[int, int]]:
+        """
+        Todas las salidas útiles entre dos horas: pares (salida, llegada) en los que
+        salir más tarde implica llegar más tarde.
+
+        Se recorren las conexiones de la última a la primera (Connection Scan de
+        perfiles); 'horizonte' acota cuánto después de 'hasta' puede terminar un trayecto.
+        """
+        desde, hasta = a_segundos(desde), a_segundos(hasta)
+        if origen not in self.ids or destino not in self.ids or origen == destino:
+            return []
+        self._compilar()
+        i, j = self.ids[origen], self.ids[destino]
+        c_salida, c_llegada = self.c_salida, self.c_llegada
+        c_desde, c_hasta, c_viaje = self.c_desde, self.c_hasta, self.c_viaje
+        cambio = self.cambio_minimo
+
+        # Perfil de cada parada en el orden en que se descubre (salidas cada vez
+        # más tempranas): las llegadas decrecen, así que las salidas se guardan
+        # negadas para que también la lista que se busca con bisect sea creciente
+        salidas_perfil: Dict[int, List[int]] = {}
+        llegadas_perfil: Dict[int, List[int]] = {}
+        por_viaje: Dict[int, int] = {}  # Llegada al destino quedándose en el viaje
+
+        def evaluar(parada, hora):
+            salidas = salidas_perfil.get(parada)
+            if not salidas:
+                return SIN_LLEGADA
+            k = bisect_right(salidas, -hora) - 1
+            return llegadas_perfil[parada][k] if k >= 0 else SIN_LLEGADA
+
+        fin = bisect_right(c_salida, hasta + horizonte)
+        for c in range(fin - 1, bisect_left(c_salida, desde) - 1, -1):
+            hasta_c = c_hasta[c]
+            llegada = c_llegada[c]
+            mejor = min(
+                llegada if hasta_c == j else SIN_LLEGADA,
+                por_viaje.get(c_viaje[c], SIN_LLEGADA),
+                evaluar(hasta_c, llegada + cambio)
+            )
+            if mejor == SIN_LLEGADA:
+                continue
+            por_viaje[c_viaje[c]] = mejor
+            parada, hora = c_desde[c], c_salida[c]
+            salidas = salidas_perfil.setdefault(parada, [])
+            llegadas = llegadas_perfil.setdefault(parada, [])
+            if llegadas and mejor >= llegadas[-1]:
+                continue
+            if salidas and salidas[-1] == -hora:
+                llegadas[-1] = mejor
+            else:
+                salidas.append(-hora)
+                llegadas.append(mejor)
+
+        pares = [(-s, a) for s, a in zip(salidas_perfil.get(i, []), llegadas_perfil.get(i, []))
+                 if -s <= hasta]
+        return pares[::-1]
+
+    # --- Serialización ---
+
+    def a_dict(self) -> Dict:
+        """Representación serializable en JSON (arreglos en base64)"""
+        return {
+            'cambio_minimo': self.cambio_minimo,
+            'paradas': self.paradas,
+            'lineas': self.lineas,
+            **{nombre: base64.b64encode(getattr(self, nombre).tobytes()).decode('ascii')
+               for nombre in ('viaje_linea', 'viaje_inicio', 'viaje_paradas',
+                              'viaje_llegadas', 'viaje_salidas')}
+        }
+
+    @classmethod
+    def desde_dict(cls, data: Dict) -> 'Horario':
+        """Restaura un horario guardado con a_dict()"""
+        horario = cls(data.get('cambio_minimo', 0))
+        horario.paradas = list(data['paradas'])
+        horario.ids = {parada: i for i, parada in enumerate(horario.paradas)}
+        horario.lineas = list(data['lineas'])
+        horario._codigos_linea = {linea: i for i, linea in enumerate(horario.lineas)}
+        for nombre in ('viaje_linea', 'viaje_inicio', 'viaje_paradas', 'viaje_llegadas', 'viaje_salidas'):
+            arreglo = array(getattr(horario, nombre).typecode)
+            arreglo.frombytes(base64.b64decode(data[nombre]))
+            setattr(horario, nombre, arreglo)
+        return horario
@@ -0,0 +1,143 @@
+# Importaciones estándar
+import csv
+import json
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, List, Optional
+
+
+def leer_lista_direcciones(archivo: str) -> List[str]:
+    """
+    Lee una lista de direcciones desde CSV o JSON.
+
+    En CSV se usa la columna 'direccion' si existe (o la primera columna);
+    en JSON se acepta una lista de textos o un objeto con la clave 'direcciones'.
+    """
+    if archivo.lower().endswith('.json'):
+        with open(archivo, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            data = data.get('direcciones', [])
+        return [str(d).strip() for d in data if str(d).strip()]
+
+    with open(archivo, 'r', encoding='utf-8', newline='') as f:
+        filas = list(csv.reader(f))
+    if not filas:
+        return []
+    encabezado = [c.strip().lower() for c in filas[0]]
+    columna = encabezado.index('direccion') if 'direccion' in encabezado else 0
+    if 'direccion' in encabezado:
+        filas = filas[1:]
+    return [fila[columna].strip() for fila in filas if len(fila) > columna and fila[columna].strip()]
+
+
+class ImportadorLotes:
+    """Geocodifica listas grandes de direcciones con límite de tasa y progreso reanudable"""
+
+    def __init__(self, gestor, archivo_progreso: Optional[str] = None, hilos: int = 4):
+        """
+        Args:
+            gestor: GestorDirecciones donde se registran los resultados
+            archivo_progreso: Archivo JSONL donde se anota cada dirección procesada
+            hilos: Peticiones simultáneas (la tasa la limita el geocodificador)
+        """
+        self.gestor = gestor
+        self.archivo_progreso = archivo_progreso
+        self.hilos = max(1, hilos)
+
+    def _cargar_progreso(self) -> Dict[str, Optional[Dict]]:
+        """Lee las direcciones ya procesadas en una ejecución anterior"""
+        hechas = {}
+        if self.archivo_progreso and os.path.exists(self.archivo_progreso):
+            with open(self.archivo_progreso, 'r', encoding='utf-8') as f:
+                for linea in f:
+                    try:
+                        registro = json.loads(linea)
+                    except json.JSONDecodeError:
+                        continue  # Última línea incompleta tras una interrupción
+                    hechas[registro['direccion']] = registro.get('info')
+        return hechas
+
+    def importar(self, direcciones: Iterable[str],
+                 progreso: Optional[Callable[[int, int], None]] = None,
+                 cancelar: Optional[threading.Event] = None) -> Dict[str, int]:
+        """
+        Geocodifica las direcciones y las registra en el gestor.
+
+        Las peticiones se procesan como un flujo con un número acotado en vuelo;
+        los resultados se registran desde este hilo y se anotan en el archivo de
+        progreso, de modo que una ejecución interrumpida continúa donde se quedó.
+
+        Returns:
+            Conteo de direcciones 'nuevas', 'existentes', 'reanudadas', 'no_encontradas'
+            y 'errores' (estas últimas no se anotan y se reintentan al reanudar)
+        """
+        pendientes = list(dict.fromkeys(d for d in direcciones if d))
+        total = len(pendientes)
+        resumen = {'nuevas': 0, 'existentes': 0, 'reanudadas': 0, 'no_encontradas': 0, 'errores': 0}
+
+        # Recuperar lo ya hecho y dejar sólo lo que falta
+        hechas = self._cargar_progreso()
+        restantes = []
+        for direccion in pendientes:
+            if direccion in self.gestor.direcciones:
+                resumen['existentes'] += 1
+            elif direccion in hechas:
+                if hechas[direccion]:
+                    self.gestor.registrar_direccion(direccion, hechas[direccion])
+                    resumen['reanudadas'] += 1
+                else:
+                    resumen['no_encontradas'] += 1
+            else:
+                restantes.append(direccion)
+        completadas = total - len(restantes)
+        if progreso:
+            progreso(completadas, total)
+
+        bitacora = open(self.archivo_progreso, 'a', encoding='utf-8') if self.archivo_progreso else None
+        try:
+            with ThreadPoolExecutor(max_workers=self.hilos) as ejecutor:
+                cola = iter(restantes)
+                en_vuelo = {}
+
+                def enviar():
+                    while len(en_vuelo) < self.hilos * 2 and not (cancelar and cancelar.is_set()):
+                        direccion = next(cola, None)
+                        if direccion is None:
+                            return
+                        en_vuelo[ejecutor.submit(self.gestor.geocodificar, direccion)] = direccion
+
+                enviar()
+                while en_vuelo:
+                    listos, _ = wait(en_vuelo, return_when=FIRST_COMPLETED)
+                    for futuro in listos:
+                        direccion = en_vuelo.pop(futuro)
+                        completadas += 1
+                        try:
+                            info = futuro.result()
+                        except Exception:
+                            resumen['errores'] += 1
+                        else:
+                            if info:
+                                self.gestor.registrar_direccion(direccion, info)
+                                resumen['nuevas'] += 1
+                            else:
+                                resumen['no_encontradas'] += 1
+                            if bitacora:
+                                bitacora.write(json.dumps({'direccion': direccion, 'info': info},
+                                                          ensure_ascii=False) + '\n')
+                                bitacora.flush()
+                        if progreso:
+                            progreso(completadas, total)
+                    enviar()
+        finally:
+            if bitacora:
+                bitacora.close()
+        return resumen
+
+    def importar_archivo(self, archivo: str, **kwargs) -> Dict[str, int]:
+        """Importa las direcciones de un archivo CSV o JSON (progreso en '<archivo>.progreso')"""
+        if self.archivo_progreso is None:
+            self.archivo_progreso = archivo + '.progreso'
+        return self.importar(leer_lista_direcciones(archivo), **kwargs)
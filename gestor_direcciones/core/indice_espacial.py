@@ -0,0 +1,260 @@
+# Importaciones estándar
+import math
+from collections import defaultdict
+from itertools import chain
+from typing import Dict, Iterable, List, Tuple
+
+# Importaciones de terceros
+import numpy as np
+
+# Importaciones propias
+from .distancias import RADIO_TIERRA_KM, haversine
+
+KM_POR_GRADO = math.pi * RADIO_TIERRA_KM / 180
+
+
+class IndiceEspacial:
+    """Índice de rejilla sobre coordenadas para búsquedas por cercanía, radio y rectángulo"""
+
+    def __init__(self, tamano_celda: float = 0.01):
+        """
+        Args:
+            tamano_celda: Lado de cada celda en grados (0.01° ≈ 1.1 km)
+        """
+        self.tamano_celda = tamano_celda
+        self.claves: List[str] = []
+        self._posiciones: Dict[str, int] = {}
+        self._lats = np.empty(64)
+        self._lons = np.empty(64)
+        self._celdas: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+
+    def __len__(self) -> int:
+        return len(self.claves)
+
+    def __contains__(self, clave: str) -> bool:
+        return clave in self._posiciones
+
+    def _celda(self, lat: float, lon: float) -> Tuple[int, int]:
+        return (math.floor(lat / self.tamano_celda), math.floor(lon / self.tamano_celda))
+
+    def coordenadas(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Devuelve las latitudes y longitudes indexadas, en el orden de 'claves'"""
+        n = len(self.claves)
+        return self._lats[:n], self._lons[:n]
+
+    def agregar(self, clave: str, lat: float, lon: float):
+        """Agrega un punto o actualiza su posición si la clave ya existe"""
+        lat, lon = float(lat), float(lon)
+        i = self._posiciones.get(clave)
+        if i is not None:
+            self._celdas[self._celda(self._lats[i], self._lons[i])].remove(i)
+        else:
+            i = len(self.claves)
+            if i == len(self._lats):
+                self._lats = np.resize(self._lats, 2 * i)
+                self._lons = np.resize(self._lons, 2 * i)
+            self.claves.append(clave)
+            self._posiciones[clave] = i
+        self._lats[i] = lat
+        self._lons[i] = lon
+        self._celdas[self._celda(lat, lon)].append(i)
+
+    def construir(self, puntos: Iterable[Tuple[str, float, float]]):
+        """Reconstruye el índice completo a partir de tuplas (clave, lat, lon)"""
+        puntos = list(puntos)
+        self.claves = [p[0] for p in puntos]
+        self._posiciones = {clave: i for i, clave in enumerate(self.claves)}
+        self._lats = np.array([p[1] for p in puntos] or [0.0], dtype=np.float64)
+        self._lons = np.array([p[2] for p in puntos] or [0.0], dtype=np.float64)
+        self._celdas = defaultdict(list)
+        filas = np.floor(self._lats[:len(puntos)] / self.tamano_celda).astype(np.int64).tolist()
+        columnas = np.floor(self._lons[:len(puntos)] / self.tamano_celda).astype(np.int64).tolist()
+        for i, celda in enumerate(zip(filas, columnas)):
+            self._celdas[celda].append(i)
+
+    def _candidatos(self, lat_min: float, lat_max: float,
+                    lon_min: float, lon_max: float) -> Tuple[np.ndarray, bool]:
+        """
+        Índices de los puntos en las celdas que cubren el rectángulo.
+
+        Si el rectángulo abarca más celdas que las ocupadas (o cruza el antimeridiano)
+        conviene revisar todos los puntos; en ese caso el segundo valor es True.
+        """
+        n = len(self.claves)
+        if lon_min < -180 or lon_max > 180:
+            return np.arange(n), True
+        f0, c0 = self._celda(lat_min, lon_min)
+        f1, c1 = self._celda(lat_max, lon_max)
+        if (f1 - f0 + 1) * (c1 - c0 + 1) > len(self._celdas):
+            return np.arange(n), True
+        listas = [self._celdas.get((f, c), ()) for f in range(f0, f1 + 1) for c in range(c0, c1 + 1)]
+        return np.fromiter(chain.from_iterable(listas), dtype=np.int64), False
+
+    def _rectangulo_radio(self, lat: float, lon: float, radio_km: float) -> Tuple[float, float, float, float]:
+        """Rectángulo en grados que contiene el círculo de radio dado"""
+        dlat = radio_km / KM_POR_GRADO
+        coseno = math.cos(math.radians(min(abs(lat) + dlat, 90.0)))
+        dlon = 360.0 if coseno < 1e-6 else radio_km / (KM_POR_GRADO * coseno)
+        return lat - dlat, lat + dlat, lon - dlon, lon + dlon
+
+    def en_radio(self, lat: float, lon: float, radio_km: float) -> List[Tuple[str, float]]:
+        """Puntos a menos de radio_km del centro, ordenados por distancia"""
+        indices, _ = self._candidatos(*self._rectangulo_radio(lat, lon, radio_km))
+        distancias = haversine(lat, lon, self._lats[indices], self._lons[indices])
+        dentro = distancias <= radio_km
+        indices, distancias = indices[dentro], distancias[dentro]
+        orden = np.argsort(distancias, kind='stable')
+        return [(self.claves[i], float(d)) for i, d in zip(indices[orden], distancias[orden])]
+
+    def k_cercanos(self, lat: float, lon: float, k: int = 5) -> List[Tuple[str, float]]:
+        """Los k puntos más cercanos al centro, ordenados por distancia"""
+        if k <= 0 or not self.claves:
+            return []
+        radio = self.tamano_celda * KM_POR_GRADO
+        while True:
+            indices, completo = self._candidatos(*self._rectangulo_radio(lat, lon, radio))
+            distancias = haversine(lat, lon, self._lats[indices], self._lons[indices])
+            if not completo:
+                # Sólo los puntos dentro del radio tienen garantizado ser los más cercanos
+                dentro = distancias <= radio
+                if dentro.sum() < k:
+                    radio *= 2
+                    continue
+                indices, distancias = indices[dentro], distancias[dentro]
+            if len(indices) > k:
+                parte = np.argpartition(distancias, k - 1)[:k]
+                indices, distancias = indices[parte], distancias[parte]
+            orden = np.argsort(distancias, kind='stable')
+            return [(self.claves[i], float(d)) for i, d in zip(indices[orden], distancias[orden])]
+
+    def en_rectangulo(self, lat_min: float, lon_min: float,
+                      lat_max: float, lon_max: float) -> List[str]:
+        """Puntos dentro del rectángulo (lat_min, lon_min) - (lat_max, lon_max)"""
+        indices, _ = self._candidatos(lat_min, lat_max, lon_min, lon_max)
+        lats, lons = self._lats[indices], self._lons[indices]
+        dentro = (lats >= lat_min) & (lats <= lat_max) & (lons >= lon_min) & (lons <= lon_max)
+        return [self.claves[i] for i in indices[dentro]]
+
+    @staticmethod
+    def _agrupar_celdas(cx: np.ndarray, cy: np.ndarray) -> Dict[Tuple[int, int], np.ndarray]:
+        """Agrupa posiciones por celda de una rejilla temporal: {(cx, cy): índices}"""
+        if not len(cx):
+            return {}
+        orden = np.lexsort((cy, cx))
+        claves = np.stack([cx[orden], cy[orden]], axis=1)
+        cortes = np.flatnonzero(np.any(np.diff(claves, axis=0) != 0, axis=1)) + 1
+        grupos = np.split(orden, cortes)
+        return {(int(cx[g[0]]), int(cy[g[0]])): g for g in grupos}
+
+    def pares_en_radio(self, lats, lons, radio_km: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Calcula en lote todos los pares (consulta, punto indexado) a menos de radio_km.
+
+        Consultas y puntos se agrupan en una rejilla temporal con celdas de al
+        menos radio_km de lado, así cada grupo de consultas se resuelve con un
+        bloque vectorizado contra los puntos de su celda y sus 8 vecinas.
+
+        Returns:
+            Tupla (consultas, indices, distancias) con un elemento por par; los
+            índices son posiciones en 'claves'
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        puntos_lat, puntos_lon = self.coordenadas()
+        vacio = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0))
+        if not len(lats) or not len(puntos_lat) or radio_km < 0:
+            return vacio
+
+        # Lado en longitud calculado en la latitud más extrema: nunca menor que el radio
+        lado_lat = max(radio_km / KM_POR_GRADO, 1e-9)
+        extremo = max(float(np.max(np.abs(lats))), float(np.max(np.abs(puntos_lat)))) + lado_lat
+        coseno = math.cos(math.radians(min(extremo, 90.0)))
+        lado_lon = 360.0 if coseno < 1e-6 else min(lado_lat / coseno, 360.0)
+
+        def celdas(la, lo):
+            return self._agrupar_celdas(np.floor(la / lado_lat).astype(np.int64),
+                                        np.floor(lo / lado_lon).astype(np.int64))
+
+        celdas_puntos = celdas(puntos_lat, puntos_lon)
+        consultas, indices, distancias = [], [], []
+        for (i, j), miembros in celdas(lats, lons).items():
+            vecinas = [celdas_puntos[(a, b)] for a in (i - 1, i, i + 1) for b in (j - 1, j, j + 1)
+                       if (a, b) in celdas_puntos]
+            if not vecinas:
+                continue
+            candidatos = np.concatenate(vecinas)
+            bloque = haversine(lats[miembros, None], lons[miembros, None],
+                               puntos_lat[candidatos], puntos_lon[candidatos])
+            filas, columnas = np.nonzero(bloque <= radio_km)
+            consultas.append(miembros[filas])
+            indices.append(candidatos[columnas])
+            distancias.append(bloque[filas, columnas])
+        if not consultas:
+            return vacio
+        return np.concatenate(consultas), np.concatenate(indices), np.concatenate(distancias)
+
+    def k_vecinos_todos(self, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Calcula en lote los k vecinos más cercanos de cada punto indexado.
+
+        Usa una rejilla temporal ajustada a la densidad (unos 2k puntos por celda)
+        y resuelve cada celda con un bloque vectorizado contra sus 8 vecinas; los
+        puntos cuyo k-ésimo vecino queda fuera del alcance garantizado se
+        resuelven con una consulta individual.
+
+        Returns:
+            Tupla (indices, distancias) de forma (N, k); -1 e inf si hay menos de k puntos
+        """
+        lats, lons = self.coordenadas()
+        n = len(lats)
+        indices = np.full((n, k), -1, dtype=np.int64)
+        distancias = np.full((n, k), np.inf)
+        if n < 2 or k <= 0:
+            return indices, distancias
+
+        # Proyección equirectangular sólo para agrupar en celdas
+        coseno0 = max(math.cos(math.radians(float(np.mean(lats)))), 1e-6)
+        x, y = lons * coseno0, lats
+        area = max(float(np.ptp(x)) * float(np.ptp(y)), 1e-12)
+        lado = max(math.sqrt(area * 2 * k / n), 1e-9)
+        cx = np.floor(x / lado).astype(np.int64)
+        cy = np.floor(y / lado).astype(np.int64)
+
+        celdas = self._agrupar_celdas(cx, cy)
+
+        # Distancia mínima (km) garantizada desde un punto hasta fuera de sus 9 celdas
+        alcance = lado * KM_POR_GRADO * np.minimum(1.0, np.cos(np.radians(lats)) / coseno0) * 0.99
+
+        pendientes = []
+        for (i, j), miembros in celdas.items():
+            candidatos = np.concatenate([
+                celdas[(a, b)] for a in (i - 1, i, i + 1) for b in (j - 1, j, j + 1)
+                if (a, b) in celdas
+            ])
+            bloque = haversine(lats[miembros, None], lons[miembros, None],
+                               lats[candidatos], lons[candidatos])
+            bloque[miembros[:, None] == candidatos[None, :]] = np.inf
+            m = min(k, len(candidatos) - 1)
+            if m <= 0:
+                pendientes.extend(miembros.tolist())
+                continue
+            parte = np.argpartition(bloque, m - 1, axis=1)[:, :m]
+            filas = np.arange(len(miembros))[:, None]
+            orden_parte = np.argsort(bloque[filas, parte], axis=1)
+            elegidos = parte[filas, orden_parte]
+            indices[miembros, :m] = candidatos[elegidos]
+            distancias[miembros, :m] = bloque[filas, elegidos]
+            # El resultado sólo es seguro si el k-ésimo vecino está dentro del alcance
+            dudosos = (m < k) | (distancias[miembros, k - 1] > alcance[miembros])
+            pendientes.extend(miembros[dudosos].tolist())
+
+        posiciones = self._posiciones
+        for p in pendientes:
+            cercanos = [(posiciones[c], d) for c, d in self.k_cercanos(lats[p], lons[p], k + 1)
+                        if posiciones[c] != p][:k]
+            indices[p] = -1
+            distancias[p] = np.inf
+            for columna, (q, d) in enumerate(cercanos):
+                indices[p, columna] = q
+                distancias[p, columna] = d
+        return indices, distancias
@@ -0,0 +1,261 @@
+# Importaciones estándar
+import base64
+import hashlib
+import heapq
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+# Importaciones de terceros
+import numpy as np
+
+# Importaciones propias
+from .grafo_compacto import INFINITO, GrafoCompacto
+
+# Nodos que puede asentar cada búsqueda de testigos al contraer
+MAX_ASENTADOS_TESTIGO = 60
+
+
+def huella_grafo(grafo: GrafoCompacto, peso: Optional[str]) -> str:
+    """
+    Huella del grafo (nodos en orden y aristas con su peso), independiente del
+    orden en que se agregaron las aristas.
+    """
+    origenes = grafo.origenes()
+    destinos = np.frombuffer(grafo.destinos, dtype=np.int64)
+    costos = (np.frombuffer(grafo.pesos[peso], dtype=np.float64) if peso
+              else np.ones(len(destinos)))
+    orden = np.lexsort((costos, destinos, origenes))
+    resumen = hashlib.sha256()
+    resumen.update(str(peso).encode('utf-8'))
+    resumen.update('\x1f'.join(map(str, grafo.nodos)).encode('utf-8'))
+    for arreglo in (origenes[orden], destinos[orden], costos[orden]):
+        resumen.update(np.ascontiguousarray(arreglo).tobytes())
+    return resumen.hexdigest()
+
+
+class JerarquiaContraccion:
+    """
+    Jerarquía de contracción para consultas punto a punto en un grafo no dirigido.
+
+    Los nodos se contraen de menos a más importante agregando atajos que
+    conservan las distancias; una consulta es un Dijkstra bidireccional que
+    sólo sube de importancia y visita unos cuantos cientos de nodos.
+    """
+
+    def __init__(self, grafo: GrafoCompacto, peso: Optional[str],
+                 max_asentados: int = MAX_ASENTADOS_TESTIGO):
+        """
+        Args:
+            grafo: Instantánea no dirigida del grafo
+            peso: Atributo de arista a minimizar (None cuenta saltos)
+            max_asentados: Límite de cada búsqueda de testigos (más alto = menos atajos)
+        """
+        if grafo.dirigido:
+            raise ValueError("La jerarquía de contracción requiere un grafo no dirigido")
+        self.peso = peso
+        self.huella = huella_grafo(grafo, peso)
+        self._contraer(grafo, max_asentados)
+
+    # --- Preprocesamiento ---
+
+    @staticmethod
+    def _testigos(adyacencia: List[Dict], origen: int, excluido: int,
+                  limite: float, max_asentados: int) -> Dict[int, float]:
+        """Distancias desde origen sin pasar por 'excluido', hasta 'limite' o max_asentados"""
+        distancias = {origen: 0}
+        frontera = [(0, origen)]
+        asentados = 0
+        while frontera:
+            costo, nodo = heapq.heappop(frontera)
+            if costo > distancias[nodo]:
+                continue
+            if costo > limite or asentados >= max_asentados:
+                break
+            asentados += 1
+            for vecino, (costo_arista, _) in adyacencia[nodo].items():
+                if vecino == excluido:
+                    continue
+                nuevo = costo + costo_arista
+                if nuevo < distancias.get(vecino, INFINITO):
+                    distancias[vecino] = nuevo
+                    heapq.heappush(frontera, (nuevo, vecino))
+        return distancias
+
+    def _atajos(self, adyacencia: List[Dict], nodo: int, max_asentados: int) -> List[Tuple[int, int, float]]:
+        """Atajos necesarios para contraer un nodo sin alterar distancias"""
+        vecinos = list(adyacencia[nodo].items())
+        atajos = []
+        for i, (u, (costo_u, _)) in enumerate(vecinos):
+            objetivos = [(w, costo_u + costo_w) for w, (costo_w, _) in vecinos[i + 1:]]
+            if not objetivos:
+                continue
+            distancias = self._testigos(adyacencia, u, nodo, max(c for _, c in objetivos), max_asentados)
+            atajos.extend((u, w, c) for w, c in objetivos if distancias.get(w, INFINITO) > c)
+        return atajos
+
+    def _contraer(self, grafo: GrafoCompacto, max_asentados: int):
+        n = len(grafo)
+        pesos = grafo.pesos[self.peso] if self.peso else None
+        # adyacencia[u][v] = (costo, nodo intermedio del atajo o -1)
+        adyacencia: List[Dict[int, Tuple[float, int]]] = [{} for _ in range(n)]
+        for u in range(n):
+            for k in range(grafo.inicio[u], grafo.inicio[u + 1]):
+                v = grafo.destinos[k]
+                costo = pesos[k] if pesos is not None else 1.0
+                if v != u and costo < adyacencia[u].get(v, (INFINITO,))[0]:
+                    adyacencia[u][v] = adyacencia[v][u] = (costo, -1)
+
+        contraidos_vecinos = [0] * n
+        niveles = [0] * n
+
+        def prioridad(nodo):
+            # Diferencia de aristas, vecinos ya contraídos y nivel (reparten la contracción)
+            return (2 * (len(self._atajos(adyacencia, nodo, max_asentados)) - len(adyacencia[nodo]))
+                    + contraidos_vecinos[nodo] + niveles[nodo])
+
+        cola = [(prioridad(nodo), nodo) for nodo in range(n)]
+        heapq.heapify(cola)
+        contraido = bytearray(n)
+        arriba: List[List[Tuple[int, float, int]]] = [[] for _ in range(n)]
+        while cola:
+            _, nodo = heapq.heappop(cola)
+            if contraido[nodo]:
+                continue
+            # Actualización perezosa: si su prioridad empeoró, vuelve a la cola
+            actual = prioridad(nodo)
+            if cola and actual > cola[0][0]:
+                heapq.heappush(cola, (actual, nodo))
+                continue
+
+            for u, w, costo in self._atajos(adyacencia, nodo, max_asentados):
+                if costo < adyacencia[u].get(w, (INFINITO,))[0]:
+                    adyacencia[u][w] = adyacencia[w][u] = (costo, nodo)
+            # Las aristas que quedan van a nodos más importantes: forman el grafo de subida
+            arriba[nodo] = [(v, costo, medio) for v, (costo, medio) in adyacencia[nodo].items()]
+            vecinos = list(adyacencia[nodo])
+            for v in vecinos:
+                del adyacencia[v][nodo]
+                contraidos_vecinos[v] += 1
+                niveles[v] = max(niveles[v], niveles[nodo] + 1)
+            adyacencia[nodo] = {}
+            contraido[nodo] = 1
+
+        # Grafo de subida en formato CSR
+        self.inicio = array('q', [0])
+        self.destinos = array('q')
+        self.costos = array('d')
+        self.medios = array('q')
+        for aristas in arriba:
+            for v, costo, medio in aristas:
+                self.destinos.append(v)
+                self.costos.append(costo)
+                self.medios.append(medio)
+            self.inicio.append(len(self.destinos))
+
+    # --- Consultas ---
+
+    def _medio(self, bajo: int, alto: int) -> int:
+        """Nodo intermedio de la arista de subida bajo -> alto"""
+        for k in range(self.inicio[bajo], self.inicio[bajo + 1]):
+            if self.destinos[k] == alto:
+                return self.medios[k]
+        raise KeyError((bajo, alto))
+
+    def _desempacar(self, a: int, b: int, medio: int) -> List[int]:
+        """Expande un atajo a-b en los nodos originales (sin incluir a)"""
+        resultado = []
+        pila = [(a, b, medio)]
+        while pila:
+            a, b, medio = pila.pop()
+            if medio == -1:
+                resultado.append(b)
+            else:
+                # Se apila primero el segundo tramo para procesar antes el primero
+                pila.append((medio, b, self._medio(medio, b)))
+                pila.append((a, medio, self._medio(medio, a)))
+        return resultado
+
+    def consulta(self, origen: int, destino: int) -> Tuple[float, List[int]]:
+        """
+        Costo y camino (identificadores) entre dos nodos.
+
+        Returns:
+            (INFINITO, []) si no hay camino
+        """
+        if origen == destino:
+            return 0, [origen]
+        inicio, destinos, costos, medios = self.inicio, self.destinos, self.costos, self.medios
+        distancias = ({origen: 0}, {destino: 0})
+        previos = ({origen: None}, {destino: None})
+        fronteras = ([(0, origen)], [(0, destino)])
+        mejor, encuentro = INFINITO, -1
+        while fronteras[0] or fronteras[1]:
+            for lado in (0, 1):
+                frontera = fronteras[lado]
+                if not frontera:
+                    continue
+                if frontera[0][0] >= mejor:
+                    frontera.clear()  # Ya no puede mejorar el camino encontrado
+                    continue
+                costo, nodo = heapq.heappop(frontera)
+                propias = distancias[lado]
+                if costo > propias[nodo]:
+                    continue
+                otro = distancias[1 - lado].get(nodo)
+                if otro is not None and costo + otro < mejor:
+                    mejor, encuentro = costo + otro, nodo
+                aristas = range(inicio[nodo], inicio[nodo + 1])
+                # Stall-on-demand: si un vecino más importante llega más barato, no expandir
+                if any(propias.get(destinos[k], INFINITO) + costos[k] < costo for k in aristas):
+                    continue
+                for k in aristas:
+                    vecino = destinos[k]
+                    nuevo = costo + costos[k]
+                    if nuevo < propias.get(vecino, INFINITO):
+                        propias[vecino] = nuevo
+                        previos[lado][vecino] = (nodo, medios[k])
+                        heapq.heappush(frontera, (nuevo, vecino))
+        if encuentro == -1:
+            return INFINITO, []
+
+        # Subida desde el origen hasta el encuentro y bajada hasta el destino
+        subida = []
+        nodo = encuentro
+        while previos[0][nodo] is not None:
+            anterior, medio = previos[0][nodo]
+            subida.append((anterior, nodo, medio))
+            nodo = anterior
+        camino = [origen]
+        for a, b, medio in reversed(subida):
+            camino.extend(self._desempacar(a, b, medio))
+        nodo = encuentro
+        while previos[1][nodo] is not None:
+            siguiente, medio = previos[1][nodo]
+            camino.extend(self._desempacar(nodo, siguiente, medio))
+            nodo = siguiente
+        return mejor, camino
+
+    # --- Serialización ---
+
+    def a_dict(self) -> Dict:
+        """Representación serializable en JSON (arreglos en base64)"""
+        return {
+            'peso': self.peso,
+            'huella': self.huella,
+            **{nombre: base64.b64encode(getattr(self, nombre).tobytes()).decode('ascii')
+               for nombre in ('inicio', 'destinos', 'costos', 'medios')}
+        }
+
+    @classmethod
+    def desde_dict(cls, data: Dict, grafo: GrafoCompacto) -> Optional['JerarquiaContraccion']:
+        """Restaura una jerarquía guardada; None si el grafo ya no es el mismo"""
+        if data.get('huella') != huella_grafo(grafo, data.get('peso')):
+            return None
+        jerarquia = object.__new__(cls)
+        jerarquia.peso = data.get('peso')
+        jerarquia.huella = data['huella']
+        for nombre, tipo in (('inicio', 'q'), ('destinos', 'q'), ('costos', 'd'), ('medios', 'q')):
+            arreglo = array(tipo)
+            arreglo.frombytes(base64.b64decode(data[nombre]))
+            setattr(jerarquia, nombre, arreglo)
+        return jerarquia
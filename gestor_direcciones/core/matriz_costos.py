@@ -0,0 +1,108 @@
+# Importaciones estándar
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Importaciones de terceros
+import numpy as np
+
+# Importaciones propias
+from .grafo_compacto import INFINITO, GrafoCompacto
+from .optimizacion import Progreso, comprobar_cancelacion
+
+Fila = Tuple[GrafoCompacto, List[float], List[int]]
+
+
+class MatrizCostos:
+    """Caché de costos y caminos mínimos entre pares de nodos de un grafo"""
+
+    def __init__(self, obtener_grafo: Callable[[], GrafoCompacto], peso: Optional[str],
+                 respaldo: Callable[[str, str], float],
+                 respaldo_matriz: Optional[Callable[[Sequence[str]], np.ndarray]] = None):
+        """
+        Args:
+            obtener_grafo: Devuelve la instantánea compacta vigente del grafo
+            peso: Atributo de arista a minimizar (None cuenta saltos)
+            respaldo: Función de costo para pares sin camino en el grafo
+            respaldo_matriz: Versión en lote de 'respaldo' para una lista de puntos
+        """
+        self.obtener_grafo = obtener_grafo
+        self.peso = peso
+        self.respaldo = respaldo
+        self.respaldo_matriz = respaldo_matriz
+        # Cada fila guarda la instantánea con la que se calculó (sus identificadores)
+        self._filas: Dict[str, Optional[Fila]] = {}
+
+    def _fila(self, origen: str) -> Optional[Fila]:
+        """Obtiene (o calcula con una sola búsqueda) los costos desde un origen"""
+        # Se devuelve la fila calculada aquí y no la del diccionario, que
+        # invalidar() puede vaciar entre el cálculo y la lectura
+        if origen in self._filas:
+            return self._filas[origen]
+        grafo = self.obtener_grafo()
+        i = grafo.ids.get(origen)
+        fila = None
+        if i is not None:
+            costos, previos = grafo.buscar(i, self.peso)
+            fila = (grafo, costos, previos)
+        self._filas[origen] = fila
+        return fila
+
+    def _costo(self, fila: Optional[Fila], destino: str) -> float:
+        if fila is None:
+            return INFINITO
+        grafo, costos, _ = fila
+        j = grafo.ids.get(destino)
+        return INFINITO if j is None else costos[j]
+
+    def tramo(self, origen: str, destino: str) -> Tuple[List[str], float]:
+        """Devuelve el camino y el costo entre dos nodos"""
+        if origen == destino:
+            return [origen], 0
+        fila = self._fila(origen)
+        costo = self._costo(fila, destino)
+        if costo < INFINITO:
+            grafo, _, previos = fila
+            return grafo.camino(previos, grafo.ids[destino]), costo
+        # Sin conexión en el grafo: tramo directo
+        return [origen, destino], self.respaldo(origen, destino)
+
+    def matriz(self, puntos: Sequence[str], progreso: Optional[Progreso] = None,
+               cancelar: Optional[threading.Event] = None) -> np.ndarray:
+        """
+        Construye la matriz de costos entre todos los puntos (una búsqueda por fila).
+
+        Entre filas avisa el progreso con (filas hechas, total, None) y revisa
+        si se pidió cancelar (lanza RutaCancelada).
+        """
+        n = len(puntos)
+        matriz = np.full((n, n), np.nan)
+        for i, origen in enumerate(puntos):
+            comprobar_cancelacion(cancelar)
+            fila = self._fila(origen)
+            matriz[i] = [self._costo(fila, destino) for destino in puntos]
+            if progreso:
+                progreso(i + 1, n, None)
+        matriz[np.isinf(matriz)] = np.nan
+        np.fill_diagonal(matriz, 0.0)
+
+        # Pares sin camino: costo de respaldo, en lote si es posible
+        faltantes = np.isnan(matriz)
+        if faltantes.any():
+            if self.respaldo_matriz is not None:
+                matriz[faltantes] = self.respaldo_matriz(puntos)[faltantes]
+            else:
+                for i, j in zip(*np.nonzero(faltantes)):
+                    matriz[i, j] = self.respaldo(puntos[i], puntos[j])
+        return matriz
+
+    def invalidar(self):
+        """Descarta todas las filas calculadas"""
+        self._filas.clear()
+
+    def notificar_arista(self, u: str, v: str, peso_arista: float, dirigida: bool = False):
+        """Descarta sólo las filas que una nueva arista (u, v) puede mejorar"""
+        for origen, fila in list(self._filas.items()):
+            du = 0 if origen == u else self._costo(fila, u)
+            dv = 0 if origen == v else self._costo(fila, v)
+            if du + peso_arista < dv or (not dirigida and dv + peso_arista < du):
+                self._filas.pop(origen, None)
@@ -0,0 +1,124 @@
+# Importaciones estándar
+from typing import Callable, Hashable, List, Optional, Sequence, Tuple
+
+# Importaciones de terceros
+import numpy as np
+
+# Importaciones propias
+from .grafo_compacto import GrafoCompacto
+from .transbordos import SIN_LINEA
+
+# Capas de la red: a pie (una por lugar) y en línea (una por parada y línea)
+PIE = 'pie'
+LINEA = 'linea'
+
+MIN_POR_KM_PIE = 12.0  # Caminando a 5 km/h
+RADIO_TRANSBORDO_KM = 0.4  # Distancia máxima que se camina hacia o desde una parada
+FACTOR_RODEO = 1.3  # Las calles alargan la distancia en línea recta
+ESPERA_MEDIA_MIN = 5.0  # Espera al abordar una línea
+
+
+def construir_red_multimodal(privado: GrafoCompacto, publico: GrafoCompacto,
+                             pares_a_pie: Tuple[Sequence[str], Sequence[str], np.ndarray],
+                             coordenadas: Optional[Callable[[Hashable], Optional[Tuple[float, float]]]] = None,
+                             min_por_km: float = MIN_POR_KM_PIE,
+                             espera: float = ESPERA_MEDIA_MIN) -> GrafoCompacto:
+    """
+    Red por capas que combina caminar con el transporte público.
+
+    La capa a pie tiene un nodo (PIE, lugar) por dirección o parada, unidos por
+    las aristas del grafo privado y por los transbordos a pie precalculados.
+    La capa de líneas tiene un nodo (LINEA, parada, linea) por cada línea que
+    pasa por la parada; abordar cuesta la espera y bajar no cuesta nada, así
+    que seguir en la misma línea no paga espera de nuevo.
+
+    Args:
+        privado: Instantánea del grafo de direcciones (se recorre caminando)
+        publico: Instantánea del grafo de transporte (con la línea por arista)
+        pares_a_pie: (origenes, destinos, km en línea recta) de los transbordos a pie
+        coordenadas: Función que da (lat, lon) de un nodo de la red
+        min_por_km: Minutos por kilómetro caminando
+        espera: Minutos de espera al abordar una línea
+
+    Returns:
+        Grafo compacto dirigido con pesos 'distancia' (km) y 'duracion' (minutos)
+    """
+    origenes_pie, destinos_pie, km_pie = pares_a_pie
+    lugares = list(dict.fromkeys([*privado.nodos, *publico.nodos, *origenes_pie, *destinos_pie]))
+    id_lugar = {lugar: i for i, lugar in enumerate(lugares)}
+    mapa_privado = np.array([id_lugar[n] for n in privado.nodos], dtype=np.int64)
+    mapa_publico = np.array([id_lugar[n] for n in publico.nodos], dtype=np.int64)
+
+    partes = []  # (origenes, destinos, distancia, duracion, linea)
+
+    # Caminar por el grafo privado (la CSR no dirigida ya trae ambos sentidos)
+    distancia = np.frombuffer(privado.pesos['distancia'], dtype=np.float64)
+    partes.append((mapa_privado[privado.origenes()],
+                   mapa_privado[np.frombuffer(privado.destinos, dtype=np.int64)],
+                   distancia, distancia * min_por_km, SIN_LINEA))
+
+    # Transbordos a pie entre direcciones y paradas cercanas, en ambos sentidos
+    a = np.array([id_lugar[n] for n in origenes_pie], dtype=np.int64)
+    b = np.array([id_lugar[n] for n in destinos_pie], dtype=np.int64)
+    distintos = a != b
+    a, b = a[distintos], b[distintos]
+    rodeo = np.asarray(km_pie, dtype=np.float64)[distintos] * FACTOR_RODEO
+    partes.append((np.concatenate([a, b]), np.concatenate([b, a]),
+                   np.tile(rodeo, 2), np.tile(rodeo * min_por_km, 2), SIN_LINEA))
+
+    # Aristas de transporte: las que no tienen línea se recorren desde la capa a pie
+    origenes_t = mapa_publico[publico.origenes()]
+    destinos_t = mapa_publico[np.frombuffer(publico.destinos, dtype=np.int64)]
+    distancia_t = np.frombuffer(publico.pesos['distancia'], dtype=np.float64)
+    duracion_t = np.frombuffer(publico.pesos['duracion'], dtype=np.float64)
+    lineas_t = np.frombuffer(publico.linea, dtype=np.int32).astype(np.int64)
+    sin_linea = lineas_t == SIN_LINEA
+    partes.append((origenes_t[sin_linea], destinos_t[sin_linea],
+                   distancia_t[sin_linea], duracion_t[sin_linea], SIN_LINEA))
+
+    # Un nodo por (parada, línea): claves únicas lugar * lineas + código
+    con_linea = ~sin_linea
+    origenes_t, destinos_t, lineas_t = origenes_t[con_linea], destinos_t[con_linea], lineas_t[con_linea]
+    total_lineas = max(len(publico.lineas), 1)
+    claves_o = origenes_t * total_lineas + lineas_t
+    claves_d = destinos_t * total_lineas + lineas_t
+    claves, inversa = np.unique(np.concatenate([claves_o, claves_d]), return_inverse=True)
+    nodos_linea = len(lugares) + np.arange(len(claves))
+    en_linea_o, en_linea_d = np.split(nodos_linea[inversa], 2)
+    partes.append((en_linea_o, en_linea_d, distancia_t[con_linea], duracion_t[con_linea], lineas_t))
+
+    # Abordar (con espera) y bajar de cada línea en cada parada
+    parada, codigo = np.divmod(claves, total_lineas)
+    ceros = np.zeros(len(claves))
+    partes.append((parada, nodos_linea, ceros, ceros + espera, SIN_LINEA))
+    partes.append((nodos_linea, parada, ceros, ceros, SIN_LINEA))
+
+    nodos = [(PIE, lugar) for lugar in lugares]
+    nodos.extend((LINEA, lugares[p], publico.lineas[c]) for p, c in zip(parada.tolist(), codigo.tolist()))
+    return GrafoCompacto.desde_aristas(
+        nodos,
+        np.concatenate([p[0] for p in partes]),
+        np.concatenate([p[1] for p in partes]),
+        {'distancia': np.concatenate([p[2] for p in partes]),
+         'duracion': np.concatenate([p[3] for p in partes])},
+        np.concatenate([np.broadcast_to(p[4], len(p[0])) for p in partes]),
+        publico.lineas,
+        coordenadas
+    )
+
+
+def desplegar_camino(nodos: Sequence[tuple]) -> Tuple[List[str], List[Optional[str]]]:
+    """
+    Convierte un camino de la red por capas en lugares y la línea de cada tramo.
+
+    Abordar y bajar no cambian de lugar, así que no generan tramo; los tramos a
+    pie (o sin línea) llevan None.
+    """
+    lugares = [nodos[0][1]]
+    lineas = []
+    for anterior, nodo in zip(nodos, nodos[1:]):
+        if nodo[1] == lugares[-1]:
+            continue
+        lugares.append(nodo[1])
+        lineas.append(nodo[2] if anterior[0] == LINEA and nodo[0] == LINEA else None)
+    return lugares, lineas
@@ -0,0 +1,358 @@
+# Importaciones estándar
+import random
+import threading
+import time
+from typing import Callable, List, Optional, Sequence, Tuple
+
+# Importaciones de terceros
+import numpy as np
+
+# Límite práctico del método exacto (memoria: 2^n * n flotantes)
+MAX_DESTINOS_EXACTO = 18
+
+# Hasta cuántos destinos el modo automático usa el método exacto
+MAX_DESTINOS_AUTO_EXACTO = 15
+
+# Perturbaciones seguidas sin mejora antes de detener la búsqueda heurística
+MAX_INTENTOS_SIN_MEJORA = 200
+
+# Segundos mínimos entre avisos de progreso de la búsqueda heurística
+INTERVALO_PROGRESO = 0.1
+
+# Avance de un cálculo: (hechos, total, mejor costo encontrado o None)
+Progreso = Callable[[int, int, Optional[float]], None]
+
+
+class RutaCancelada(Exception):
+    """Se pidió detener el cálculo de una ruta antes de terminar"""
+
+
+def comprobar_cancelacion(cancelar: Optional[threading.Event]):
+    """Lanza RutaCancelada si ya se pidió detener el cálculo"""
+    if cancelar is not None and cancelar.is_set():
+        raise RutaCancelada()
+
+
+def held_karp(matriz_costos: Sequence[Sequence[float]], ciclo: bool = False,
+              fin: Optional[int] = None, progreso: Optional[Progreso] = None,
+              cancelar: Optional[threading.Event] = None) -> Tuple[List[int], float]:
+    """
+    Resuelve de forma exacta el orden de visita con programación dinámica (Held-Karp).
+
+    El índice 0 de la matriz es el origen y los índices 1..n son los destinos.
+    Los subconjuntos de destinos se representan como máscaras de bits y se procesan
+    por capas (según su número de elementos) de forma vectorizada.
+
+    Args:
+        matriz_costos: Matriz cuadrada (n+1)x(n+1), puede ser asimétrica
+        ciclo: Si es True la ruta regresa al origen al final
+        fin: Índice (1..n) del destino con el que debe terminar la ruta
+        progreso: Se llama tras cada capa con (capas hechas, total, None)
+        cancelar: Evento para detener el cálculo (lanza RutaCancelada)
+
+    Returns:
+        Tupla con el orden de visita (empezando en 0) y su costo total
+    """
+    costos = np.asarray(matriz_costos, dtype=np.float64)
+    n = costos.shape[0] - 1
+    if n <= 0:
+        return [0], 0.0
+    if n > MAX_DESTINOS_EXACTO:
+        raise ValueError(
+            f"Demasiados destinos para el método exacto ({n} > {MAX_DESTINOS_EXACTO})"
+        )
+    if fin is not None and not 1 <= fin <= n:
+        raise ValueError(f"Índice de destino final inválido: {fin}")
+
+    total = 1 << n
+    entre_destinos = costos[1:, 1:]
+
+    # dp[mascara, j]: costo mínimo saliendo del origen, visitando 'mascara' y terminando en j
+    dp = np.full((total, n), np.inf)
+    padre = np.full((total, n), -1, dtype=np.int8)
+    unitarias = 1 << np.arange(n)
+    dp[unitarias, np.arange(n)] = costos[0, 1:]
+
+    # Agrupar las máscaras por número de bits encendidos
+    mascaras = np.arange(total)
+    bits = np.zeros(total, dtype=np.int8)
+    for j in range(n):
+        bits += ((mascaras >> j) & 1).astype(np.int8)
+
+    for tamano in range(2, n + 1):
+        comprobar_cancelacion(cancelar)
+        if progreso:
+            progreso(tamano - 1, n, None)
+        capa = mascaras[bits == tamano]
+        for j in range(n):
+            con_j = capa[((capa >> j) & 1) == 1]
+            previas = con_j ^ (1 << j)
+            candidatos = dp[previas] + entre_destinos[:, j]
+            mejores = np.argmin(candidatos, axis=1)
+            dp[con_j, j] = candidatos[np.arange(len(con_j)), mejores]
+            padre[con_j, j] = mejores
+
+    completa = total - 1
+    if fin is not None:
+        ultimo = fin - 1
+        costo = dp[completa, ultimo]
+    else:
+        cierre = dp[completa] + (costos[1:, 0] if ciclo else 0.0)
+        ultimo = int(np.argmin(cierre))
+        costo = cierre[ultimo]
+
+    # Reconstruir el orden siguiendo los punteros hacia atrás
+    orden = []
+    mascara = completa
+    actual = ultimo
+    while actual != -1:
+        orden.append(actual + 1)
+        anterior = int(padre[mascara, actual])
+        mascara ^= 1 << actual
+        actual = anterior
+    orden.append(0)
+    orden.reverse()
+
+    if ciclo:
+        orden.append(0)
+    if progreso:
+        progreso(n, n, float(costo))
+    return orden, float(costo)
+
+
+def costo_ruta(matriz_costos, orden: Sequence[int]) -> float:
+    """Suma el costo de recorrer los índices en el orden dado"""
+    costos = np.asarray(matriz_costos, dtype=np.float64)
+    indices = np.asarray(orden, dtype=np.intp)
+    return float(costos[indices[:-1], indices[1:]].sum()) if len(indices) > 1 else 0.0
+
+
+def vecino_mas_cercano(matriz_costos, inicio: int = 0,
+                       fin: Optional[int] = None) -> Tuple[List[int], float]:
+    """Construye una ruta inicial eligiendo siempre el nodo no visitado más cercano"""
+    costos = np.asarray(matriz_costos, dtype=np.float64)
+    disponibles = np.ones(costos.shape[0], dtype=bool)
+    disponibles[inicio] = False
+    if fin is not None:
+        disponibles[fin] = False
+
+    ruta = [inicio]
+    costo_total = 0.0
+    actual = inicio
+    for _ in range(int(disponibles.sum())):
+        siguiente = int(np.argmin(np.where(disponibles, costos[actual], np.inf)))
+        disponibles[siguiente] = False
+        costo_total += costos[actual, siguiente]
+        ruta.append(siguiente)
+        actual = siguiente
+
+    if fin is not None:
+        costo_total += costos[actual, fin]
+        ruta.append(fin)
+    return ruta, float(costo_total)
+
+
+def listas_candidatos(matriz_costos, k: int) -> List[List[int]]:
+    """Obtiene para cada nodo sus k vecinos más baratos, ordenados por costo"""
+    costos = np.array(matriz_costos, dtype=np.float64)
+    n = costos.shape[0]
+    k = max(0, min(k, n - 1))
+    if k == 0:
+        return [[] for _ in range(n)]
+    np.fill_diagonal(costos, np.inf)
+    cercanos = np.argpartition(costos, k - 1, axis=1)[:, :k]
+    filas = np.arange(n)[:, None]
+    orden = np.argsort(costos[filas, cercanos], axis=1)
+    return cercanos[filas, orden].tolist()
+
+
+def _dos_opt(ruta, costos, vecinos, ultimo_movil, agotado) -> bool:
+    """Mejora la ruta invirtiendo tramos (2-opt) guiado por listas de candidatos"""
+    n = len(ruta)
+    posicion = {nodo: i for i, nodo in enumerate(ruta)}
+    hubo_mejora = False
+    mejora = True
+    while mejora:
+        mejora = False
+        for i in range(n - 1):
+            if agotado():
+                return hubo_mejora
+            a, b = ruta[i], ruta[i + 1]
+            costo_ab = costos[a][b]
+            for c in vecinos[a]:
+                costo_ac = costos[a][c]
+                if costo_ac >= costo_ab:
+                    break
+                j = posicion[c]
+                if j > i + 1 and j <= ultimo_movil:
+                    # Quitar (a, b) y (c, d); agregar (a, c) y (b, d)
+                    ganancia = costo_ab - costo_ac
+                    if j + 1 < n:
+                        d = ruta[j + 1]
+                        ganancia += costos[c][d] - costos[b][d]
+                    inicio, final = i + 1, j
+                elif j < i and i <= ultimo_movil:
+                    # Quitar (c, e) y (a, b); agregar (c, a) y (e, b)
+                    e = ruta[j + 1]
+                    ganancia = costo_ab - costo_ac + costos[c][e] - costos[e][b]
+                    inicio, final = j + 1, i
+                else:
+                    continue
+                if ganancia > 1e-10:
+                    ruta[inicio:final + 1] = ruta[inicio:final + 1][::-1]
+                    for p in range(inicio, final + 1):
+                        posicion[ruta[p]] = p
+                    mejora = hubo_mejora = True
+                    break
+    return hubo_mejora
+
+
+def _or_opt(ruta, costos, vecinos, ultimo_movil, simetrica, agotado) -> bool:
+    """Mejora la ruta reubicando tramos de 1 a 3 nodos (Or-opt)"""
+    n = len(ruta)
+    hubo_mejora = False
+    mejora = True
+    while mejora:
+        mejora = False
+        posicion = {nodo: i for i, nodo in enumerate(ruta)}
+        for p in range(1, ultimo_movil + 1):
+            if agotado():
+                return hubo_mejora
+            for largo in (1, 2, 3):
+                q = p + largo - 1
+                if q > ultimo_movil:
+                    break
+                s0, s1 = ruta[p], ruta[q]
+                previo = ruta[p - 1]
+                siguiente = ruta[q + 1] if q + 1 < n else None
+                ahorro = costos[previo][s0]
+                if siguiente is not None:
+                    ahorro += costos[s1][siguiente] - costos[previo][siguiente]
+
+                # Puntos de inserción (x, y) cercanos a los extremos del tramo
+                opciones = [(x, False) for x in vecinos[s0]]
+                opciones += [(y, True) for y in vecinos[s1]]
+                if simetrica:
+                    opciones += [(x, False) for x in vecinos[s1]]
+                    opciones += [(y, True) for y in vecinos[s0]]
+                mejor = None
+                for nodo, es_siguiente in opciones:
+                    pos_x = posicion[nodo] - 1 if es_siguiente else posicion[nodo]
+                    if pos_x < 0 or p - 1 <= pos_x <= q:
+                        continue
+                    if pos_x == n - 1 and ultimo_movil < n - 1:
+                        continue
+                    x = ruta[pos_x]
+                    y = ruta[pos_x + 1] if pos_x + 1 < n else None
+                    for invertido in ((False, True) if simetrica else (False,)):
+                        a, b = (s1, s0) if invertido else (s0, s1)
+                        costo = costos[x][a]
+                        if y is not None:
+                            costo += costos[b][y] - costos[x][y]
+                        ganancia = ahorro - costo
+                        if ganancia > 1e-10 and (mejor is None or ganancia > mejor[0]):
+                            mejor = (ganancia, pos_x, invertido)
+                if mejor is None:
+                    continue
+
+                _, pos_x, invertido = mejor
+                tramo = ruta[p:q + 1]
+                if invertido:
+                    tramo.reverse()
+                x = ruta[pos_x]
+                del ruta[p:q + 1]
+                destino = ruta.index(x) + 1
+                ruta[destino:destino] = tramo
+                posicion = {nodo: i for i, nodo in enumerate(ruta)}
+                mejora = hubo_mejora = True
+                break
+    return hubo_mejora
+
+
+def ruta_heuristica(matriz_costos, ciclo: bool = False, fin: Optional[int] = None,
+                    tiempo_limite: float = 2.0, k_vecinos: int = 10,
+                    progreso: Optional[Progreso] = None,
+                    cancelar: Optional[threading.Event] = None) -> Tuple[List[int], float]:
+    """
+    Calcula un buen orden de visita para muchas paradas sin garantizar el óptimo.
+
+    Parte de la ruta del vecino más cercano y la mejora con 2-opt y Or-opt
+    restringidos a listas de candidatos; el tiempo restante se usa en
+    perturbaciones double-bridge seguidas de nueva mejora local. Con costos asimétricos sólo se aplica Or-opt sin
+    invertir tramos, que es el único movimiento cuyo costo no cambia de sentido.
+
+    Args:
+        matriz_costos: Matriz cuadrada con el origen en el índice 0
+        ciclo: Si es True la ruta regresa al origen al final
+        fin: Índice del destino con el que debe terminar la ruta
+        tiempo_limite: Segundos máximos dedicados a la mejora local
+        k_vecinos: Tamaño de las listas de candidatos
+        progreso: Recibe (ms transcurridos, ms disponibles, mejor costo) al mejorar
+            y al menos cada INTERVALO_PROGRESO segundos
+        cancelar: Evento para detener el cálculo (lanza RutaCancelada)
+
+    Returns:
+        Tupla con el orden de visita (empezando en 0) y su costo total
+    """
+    inicio = time.perf_counter()
+    limite = inicio + tiempo_limite
+    matriz = np.asarray(matriz_costos, dtype=np.float64)
+    if matriz.shape[0] <= 1:
+        return [0], 0.0
+
+    def agotado():
+        return time.perf_counter() > limite or (cancelar is not None and cancelar.is_set())
+
+    total_ms = max(1, int(tiempo_limite * 1000))
+    ultimo_aviso = 0.0
+
+    def avisar(costo, forzar=False):
+        nonlocal ultimo_aviso
+        ahora = time.perf_counter()
+        if progreso and (forzar or ahora - ultimo_aviso >= INTERVALO_PROGRESO):
+            ultimo_aviso = ahora
+            progreso(min(total_ms, int((ahora - inicio) * 1000)), total_ms, costo)
+
+    ruta, _ = vecino_mas_cercano(matriz, 0, fin)
+    if ciclo:
+        ruta.append(0)
+    # El primer nodo siempre está fijo; el último también si es un ciclo o un final dado
+    ultimo_movil = len(ruta) - 2 if ciclo or fin is not None else len(ruta) - 1
+
+    simetrica = np.allclose(matriz, matriz.T)
+    vecinos = listas_candidatos(matriz, k_vecinos)
+    costos = matriz.tolist()
+
+    def mejorar(ruta):
+        mejora = True
+        while mejora and not agotado():
+            mejora = _dos_opt(ruta, costos, vecinos, ultimo_movil, agotado) if simetrica else False
+            mejora = _or_opt(ruta, costos, vecinos, ultimo_movil, simetrica, agotado) or mejora
+        comprobar_cancelacion(cancelar)
+
+    avisar(costo_ruta(matriz, ruta), forzar=True)
+    mejorar(ruta)
+    mejor_costo = costo_ruta(matriz, ruta)
+    avisar(mejor_costo, forzar=True)
+
+    # Con el tiempo restante: perturbar (double-bridge) y volver a mejorar
+    azar = random.Random(0)
+    intentos_sin_mejora = 0
+    while (ultimo_movil >= 4 and intentos_sin_mejora < MAX_INTENTOS_SIN_MEJORA
+           and not agotado()):
+        p1, p2, p3 = sorted(azar.sample(range(1, ultimo_movil + 2), 3))
+        candidata = ruta[:p1] + ruta[p2:p3] + ruta[p1:p2] + ruta[p3:]
+        mejorar(candidata)
+        costo = costo_ruta(matriz, candidata)
+        if costo < mejor_costo - 1e-10:
+            ruta, mejor_costo = candidata, costo
+            intentos_sin_mejora = 0
+            avisar(mejor_costo, forzar=True)
+        else:
+            intentos_sin_mejora += 1
+            avisar(mejor_costo)
+
+    comprobar_cancelacion(cancelar)
+    if progreso:
+        progreso(total_ms, total_ms, mejor_costo)
+    return ruta, mejor_costo
@@ -0,0 +1,166 @@
+# Importaciones estándar
+import heapq
+from typing import Dict, List, Optional, Tuple
+
+# Importaciones propias
+from .grafo_compacto import INFINITO, GrafoCompacto
+
+# Código de línea de las aristas que no pertenecen a ninguna (p. ej. caminar)
+SIN_LINEA = -1
+
+
+class BusquedaTransbordos:
+    """
+    Búsqueda multicriterio (tiempo, transbordos) sobre las líneas de transporte.
+
+    Cada etiqueta recuerda la última línea abordada, así que un transbordo se
+    cuenta al subir a una línea distinta. En una sola búsqueda se obtiene el
+    conjunto de Pareto: ninguna opción es más rápida sin hacer más transbordos.
+
+    La búsqueda avanza en un solo sentido, del origen al destino, y no se
+    encuentra en medio con una búsqueda desde el destino. Con conjuntos de
+    Pareto y la línea abordada, juntar dos frentes obliga a combinar todas las
+    etiquetas que coinciden en cada nodo. Además, el costo de un transbordo en
+    ese nodo depende de ambas mitades, así que un criterio de paro como el de
+    Dijkstra bidireccional no es exacto. En su lugar, la búsqueda hacia atrás
+    (sin transbordos) solo da cotas del tiempo restante. Esas cotas podan las
+    etiquetas sin perder ninguna opción de Pareto.
+    """
+
+    def __init__(self, grafo: GrafoCompacto, peso: str = 'duracion',
+                 penalizacion_transbordo: float = 0.0, max_transbordos: Optional[int] = None):
+        """
+        Args:
+            grafo: Instantánea del grafo de transporte (con el código de línea por arista)
+            peso: Atributo de arista con el tiempo de viaje
+            penalizacion_transbordo: Tiempo extra por cada transbordo (espera, caminata)
+            max_transbordos: Transbordos máximos permitidos (None = sin límite)
+        """
+        self.grafo = grafo
+        self.peso = peso
+        self.penalizacion_transbordo = penalizacion_transbordo
+        self.max_transbordos = max_transbordos
+        self._invertido = None
+
+    def _domina(self, tiempo_a, transbordos_a, linea_a, tiempo_b, transbordos_b, linea_b) -> bool:
+        """
+        Si la etiqueta a domina a b en el mismo nodo.
+
+        Desde a se puede seguir por la línea de b pagando a lo más un transbordo
+        (y su penalización), salvo que vaya en la misma línea o aún no haya
+        abordado ninguna.
+        """
+        extra = 0 if linea_a == linea_b or linea_a == SIN_LINEA else 1
+        return (tiempo_a + extra * self.penalizacion_transbordo <= tiempo_b
+                and transbordos_a + extra <= transbordos_b)
+
+    def _cotas(self, destino: int) -> List[float]:
+        """Tiempo mínimo de cada nodo al destino (búsqueda hacia atrás sin transbordos)"""
+        if self._invertido is None:
+            self._invertido = self.grafo.invertido()
+        return self._invertido.buscar(destino, self.peso)[0]
+
+    def buscar(self, origen: int, destino: Optional[int] = None) -> Tuple[List[tuple], Dict[int, List[int]]]:
+        """
+        Calcula las etiquetas de Pareto desde un origen.
+
+        Con destino, una búsqueda hacia atrás da cotas de tiempo restante que
+        permiten descartar etiquetas que ya no pueden mejorar las del destino;
+        la búsqueda en sí sigue siendo de un solo sentido (ver la clase).
+
+        Returns:
+            (etiquetas, bolsas): cada etiqueta es (tiempo, transbordos, nodo, linea,
+            padre, linea_arista) y bolsas[nodo] lista los índices no dominados
+        """
+        grafo = self.grafo
+        inicio, destinos, lineas = grafo.inicio, grafo.destinos, grafo.linea
+        pesos = grafo.pesos[self.peso]
+        cotas = self._cotas(destino) if destino is not None else None
+        if cotas is not None and cotas[origen] == INFINITO:
+            return [], {}
+        penalizacion = self.penalizacion_transbordo
+        maximo = self.max_transbordos
+
+        etiquetas = [(0, 0, origen, SIN_LINEA, -1, SIN_LINEA)]
+        vivas = [True]
+        bolsas: Dict[int, List[int]] = {origen: [0]}
+        frontera = [(0, 0, 0)]
+        while frontera:
+            tiempo, transbordos, indice = heapq.heappop(frontera)
+            if not vivas[indice]:
+                continue
+            nodo, linea = etiquetas[indice][2], etiquetas[indice][3]
+            if nodo == destino:
+                continue
+            for k in range(inicio[nodo], inicio[nodo + 1]):
+                vecino = destinos[k]
+                linea_arista = lineas[k]
+                nuevo_tiempo = tiempo + pesos[k]
+                nuevos_transbordos = transbordos
+                nueva_linea = linea
+                if linea_arista != SIN_LINEA:
+                    if linea != SIN_LINEA and linea_arista != linea:
+                        nuevos_transbordos += 1
+                        nuevo_tiempo += penalizacion
+                    nueva_linea = linea_arista
+                if maximo is not None and nuevos_transbordos > maximo:
+                    continue
+
+                # Poda por destino: con la cota de tiempo restante no mejora ninguna opción
+                if cotas is not None:
+                    cota = cotas[vecino]
+                    if cota == INFINITO:
+                        continue
+                    if any(etiquetas[i][0] <= nuevo_tiempo + cota and etiquetas[i][1] <= nuevos_transbordos
+                           for i in bolsas.get(destino, ())):
+                        continue
+
+                # Dominancia en el nodo vecino
+                bolsa = bolsas.setdefault(vecino, [])
+                destino_vecino = vecino == destino
+                if any(self._domina(etiquetas[i][0], etiquetas[i][1],
+                                    SIN_LINEA if destino_vecino else etiquetas[i][3],
+                                    nuevo_tiempo, nuevos_transbordos,
+                                    SIN_LINEA if destino_vecino else nueva_linea)
+                       for i in bolsa):
+                    continue
+                conservadas = []
+                for i in bolsa:
+                    if self._domina(nuevo_tiempo, nuevos_transbordos,
+                                    SIN_LINEA if destino_vecino else nueva_linea,
+                                    etiquetas[i][0], etiquetas[i][1],
+                                    SIN_LINEA if destino_vecino else etiquetas[i][3]):
+                        vivas[i] = False
+                    else:
+                        conservadas.append(i)
+                conservadas.append(len(etiquetas))
+                bolsas[vecino] = conservadas
+                etiquetas.append((nuevo_tiempo, nuevos_transbordos, vecino, nueva_linea, indice, linea_arista))
+                vivas.append(True)
+                heapq.heappush(frontera, (nuevo_tiempo, nuevos_transbordos, len(etiquetas) - 1))
+        return etiquetas, bolsas
+
+    def reconstruir(self, etiquetas: List[tuple], indice: int) -> Dict:
+        """Convierte una etiqueta en la opción de viaje que la produjo"""
+        tiempo, transbordos = etiquetas[indice][0], etiquetas[indice][1]
+        nodos, lineas = [], []
+        while indice != -1:
+            _, _, nodo, _, padre, linea_arista = etiquetas[indice]
+            nodos.append(self.grafo.nodos[nodo])
+            if padre != -1:
+                lineas.append(self.grafo.lineas[linea_arista] if linea_arista != SIN_LINEA else None)
+            indice = padre
+        return {
+            'ruta': nodos[::-1],
+            'lineas': lineas[::-1],
+            'tiempo': tiempo,
+            'transbordos': transbordos
+        }
+
+    def opciones(self, origen: int, destino: int) -> List[Dict]:
+        """Conjunto de Pareto (tiempo, transbordos) entre dos nodos, del más rápido al de menos transbordos"""
+        etiquetas, bolsas = self.buscar(origen, destino)
+        if origen == destino:
+            return [self.reconstruir(etiquetas, 0)]
+        indices = sorted(bolsas.get(destino, []), key=lambda i: (etiquetas[i][0], etiquetas[i][1]))
+        return [self.reconstruir(etiquetas, i) for i in indices]
@@ -21,6 +21,7 @@ class MainWindow(QMainWindow):
         super().__init__()
         self.gestor = GestorDirecciones()
         self.ruta_actual = None  # Para almacenar la última ruta calculada
+        self._bloqueos = 0  # Trabajos en segundo plano que impiden modificar el gestor
         self._init_ui()
         self._cargar_configuracion()
     
@@ -121,11 +122,23 @@ class MainWindow(QMainWindow):
             except Exception as e:
                 self.mostrar_error(f"No se pudo mostrar el mapa: {str(e)}")
     
+    def bloquear_cambios(self, bloquear: bool):
+        """
+        Deshabilita las pestañas que modifican las direcciones mientras un trabajo
+        en segundo plano usa el gestor; cada bloqueo se libera con su propio False.
+        """
+        self._bloqueos = max(0, self._bloqueos + (1 if bloquear else -1))
+        if bloquear:
+            self.agregar_tab.ejecutor.cancelar()
+        for tab in (self.agregar_tab, self.conectar_tab, self.archivos_tab):
+            tab.setEnabled(self._bloqueos == 0)
+    
     def actualizar_listas_direcciones(self):
         """Actualiza todas las listas de direcciones en las pestañas"""
         self.consultar_tab.actualizar_lista()
         # self.conectar_tab.actualizar_listas()  # Eliminar esta línea ya que ConectarTab no usa listas
         self.ruta_tab.actualizar_lista()
+        self.agregar_tab.mapa_widget.actualizar_direcciones()
         
         tiene_direcciones = len(self.gestor.direcciones) > 0
         self.tabs.setTabEnabled(1, tiene_direcciones)  # Conectar
@@ -177,6 +190,10 @@ class MainWindow(QMainWindow):
             )
             
             if reply == QMessageBox.Yes:
+                # Guardar espera a que terminen el cálculo y la importación en curso; se detienen antes
+                for ejecutor in (self.ruta_tab.ejecutor, self.archivos_tab.ejecutor):
+                    ejecutor.cancelar()
+                    ejecutor.esperar()
                 try:
                     if hasattr(self, "ultimo_archivo"):
                         self.gestor.guardar_json(self.ultimo_archivo)
@@ -190,4 +207,10 @@ class MainWindow(QMainWindow):
                 event.ignore()
                 return
         
+        # No dejar cálculos de rutas, búsquedas ni importaciones corriendo en otro hilo al cerrar
+        ejecutores = (self.ruta_tab.ejecutor, self.agregar_tab.ejecutor, self.archivos_tab.ejecutor)
+        for ejecutor in ejecutores:
+            ejecutor.cancelar()
+        for ejecutor in ejecutores:
+            ejecutor.esperar(3000)
         event.accept()
\ No newline at end of file
@@ -1,13 +1,20 @@
 import json
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, 
                             QLabel, QLineEdit, QPushButton, 
-                            QTextEdit, QMessageBox)
+                            QTextEdit, QMessageBox, QCompleter, QCheckBox)
+from PyQt5.QtCore import QStringListModel, QTimer
+from gestor_direcciones.ui.trabajos import EjecutorTrabajos, Trabajo
 from gestor_direcciones.ui.widgets.map_widget import MapWidget
 
+# Pausa al escribir antes de buscar sugerencias
+RETARDO_SUGERENCIAS_MS = 250
+
 class AgregarTab(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.parent = parent
+        self.sugerencias = {}  # Texto mostrado -> información de la dirección
+        self.ejecutor = EjecutorTrabajos()  # Geocodificación remota sin bloquear la interfaz
         self._init_ui()
         self.direccion_actual = None
     
@@ -17,6 +24,20 @@ class AgregarTab(QWidget):
         # Widgets de dirección
         lbl_direccion = QLabel("Dirección a agregar:")
         self.txt_direccion = QLineEdit()
+        self.txt_direccion.textEdited.connect(self._texto_editado)
+        self.txt_direccion.returnPressed.connect(self._buscar_en_mapa)
+        
+        # Sugerencias mientras se escribe (ya filtradas por el gestor)
+        self.modelo_sugerencias = QStringListModel(self)
+        self.completador = QCompleter(self.modelo_sugerencias, self)
+        self.completador.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+        self.completador.activated[str].connect(self._sugerencia_elegida)
+        self.txt_direccion.setCompleter(self.completador)
+        self.temporizador = QTimer(self)
+        self.temporizador.setSingleShot(True)
+        self.temporizador.setInterval(RETARDO_SUGERENCIAS_MS)
+        self.temporizador.timeout.connect(self._actualizar_sugerencias)
+        
         btn_buscar = QPushButton("Buscar en Mapa")
         btn_buscar.clicked.connect(self._buscar_en_mapa)
         btn_confirmar = QPushButton("Confirmar Dirección")
@@ -24,6 +45,8 @@ class AgregarTab(QWidget):
         
         # Mapa interactivo
         self.mapa_widget = MapWidget()
+        self.chk_todas = QCheckBox("Mostrar todas las direcciones")
+        self.chk_todas.toggled.connect(self._mostrar_todas)
         
         # Área de resultados
         self.txt_resultado = QTextEdit()
@@ -38,12 +61,40 @@ class AgregarTab(QWidget):
         layout.addWidget(lbl_direccion)
         layout.addWidget(self.txt_direccion)
         layout.addLayout(hbox)
+        layout.addWidget(self.chk_todas)
         layout.addWidget(self.mapa_widget)
         layout.addWidget(QLabel("Resultado:"))
         layout.addWidget(self.txt_resultado)
         
         self.setLayout(layout)
     
+    def _mostrar_todas(self, activo):
+        """Muestra u oculta todas las direcciones agrupadas en el mapa"""
+        if activo:
+            self.mapa_widget.mostrar_direcciones(self.parent.gestor)
+        else:
+            self.mapa_widget.ocultar_direcciones()
+    
+    def _texto_editado(self):
+        """Reinicia la pausa de las sugerencias; una búsqueda en curso ya no sirve"""
+        self.ejecutor.cancelar()
+        self.temporizador.start()
+    
+    def _actualizar_sugerencias(self):
+        """Sugiere direcciones guardadas, del nomenclátor o de la caché (sin red)"""
+        texto = self.txt_direccion.text().strip()
+        sugerencias = self.parent.gestor.sugerir_direcciones(texto) if texto else []
+        self.sugerencias = {s['direccion']: s['info'] for s in sugerencias}
+        self.modelo_sugerencias.setStringList(list(self.sugerencias))
+        if self.sugerencias and self.txt_direccion.hasFocus():
+            self.completador.complete()
+    
+    def _sugerencia_elegida(self, direccion):
+        """Muestra una sugerencia sin volver a geocodificarla"""
+        info = self.sugerencias.get(direccion)
+        if info:
+            self._mostrar_direccion(direccion, info)
+    
     def _buscar_en_mapa(self):
         """Busca la dirección y la muestra en el mapa"""
         direccion = self.txt_direccion.text().strip()
@@ -51,28 +102,58 @@ class AgregarTab(QWidget):
             QMessageBox.warning(self, "Error", "La dirección no puede estar vacía")
             return
         
-        try:
-            # Limpiar resultado anterior
+        self.temporizador.stop()
+        info = self.parent.gestor.direcciones.get(direccion) or self.sugerencias.get(direccion)
+        if info:
+            self._mostrar_direccion(direccion, info)
+            return
+        
+        # Sólo lo que no se resolvió localmente va al geocodificador remoto
+        self.txt_resultado.setPlainText(f"Buscando '{direccion}'...")
+        trabajo = Trabajo(self._geocodificar, direccion)
+        trabajo.senales.resultado.connect(self._direccion_geocodificada)
+        trabajo.senales.error.connect(self._error_busqueda)
+        self.ejecutor.lanzar(trabajo)
+    
+    def _geocodificar(self, direccion, progreso=None, cancelar=None):
+        """Se ejecuta en segundo plano; no modifica el gestor"""
+        if cancelar is not None and cancelar.is_set():
+            return None
+        return self.parent.gestor.geocodificar(direccion)
+    
+    def _direccion_geocodificada(self, trabajo, info):
+        if not self.ejecutor.es_vigente(trabajo):
+            return  # El texto cambió mientras se buscaba
+        if info:
+            self._mostrar_direccion(trabajo.args[0], info)
+        else:
+            self.txt_resultado.clear()
+            QMessageBox.warning(self, "Error", "No se pudo encontrar la dirección")
+    
+    def _error_busqueda(self, trabajo, mensaje):
+        if self.ejecutor.es_vigente(trabajo):
             self.txt_resultado.clear()
+            QMessageBox.critical(self, "Error", f"Error al buscar dirección: {mensaje}")
+    
+    def _mostrar_direccion(self, direccion, info):
+        """Registra la dirección encontrada y la muestra en el mapa"""
+        try:
+            if direccion not in self.parent.gestor.direcciones:
+                self.parent.gestor.registrar_direccion(direccion, info)
+                self.mapa_widget.actualizar_direcciones()
+            self.direccion_actual = info
+            lat = info['coordenadas']['lat']
+            lon = info['coordenadas']['lon']
+            
+            # Actualizar mapa
+            self.mapa_widget.agregar_marcador(lat, lon, info['direccion'])
             
-            # Buscar nueva dirección
-            info = self.parent.gestor.agregar_direccion(direccion)
-            if info:
-                self.direccion_actual = info
-                lat = info['coordenadas']['lat']
-                lon = info['coordenadas']['lon']
-                
-                # Actualizar mapa
-                self.mapa_widget.agregar_marcador(lat, lon, info['direccion'])
-                
-                # Mostrar información
-                self.txt_resultado.setPlainText(
-                    f"Dirección encontrada:\n{info['direccion']}\n"
-                    f"Coordenadas: Lat {lat:.6f}, Lon {lon:.6f}\n"
-                    f"Tipo: {info.get('tipo', 'N/A')}"
-                )
-            else:
-                QMessageBox.warning(self, "Error", "No se pudo encontrar la dirección")
+            # Mostrar información
+            self.txt_resultado.setPlainText(
+                f"Dirección encontrada:\n{info['direccion']}\n"
+                f"Coordenadas: Lat {lat:.6f}, Lon {lon:.6f}\n"
+                f"Tipo: {info.get('tipo', 'N/A')}"
+            )
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Error al buscar dirección: {str(e)}")
             print(f"Error completo: {e}")  # Para depuración
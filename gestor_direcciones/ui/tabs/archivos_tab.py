@@ -1,5 +1,8 @@
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QPushButton, 
-                             QLabel, QInputDialog)
+                             QLabel, QInputDialog, QProgressDialog)
+from gestor_direcciones.core.gtfs import ImportadorGTFS
+from gestor_direcciones.core.importacion import ImportadorLotes
+from gestor_direcciones.ui.trabajos import EjecutorTrabajos, Trabajo
 
 
 class ArchivosTab(QWidget):
@@ -7,6 +10,9 @@ class ArchivosTab(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.parent = parent
+        # Importaciones fuera del hilo de la interfaz; mientras corren el gestor no admite cambios
+        self.ejecutor = EjecutorTrabajos(al_cambiar_ocupado=self.parent.bloquear_cambios)
+        self.dialogo = None
         self._init_ui()
     
     def _init_ui(self):
@@ -16,11 +22,17 @@ class ArchivosTab(QWidget):
         btn_guardar.clicked.connect(self._guardar_datos)
         btn_cargar = QPushButton("Cargar Datos")
         btn_cargar.clicked.connect(self._cargar_datos)
+        btn_importar = QPushButton("Importar Lista de Direcciones")
+        btn_importar.clicked.connect(self._importar_lista)
+        btn_gtfs = QPushButton("Importar Transporte (GTFS)")
+        btn_gtfs.clicked.connect(self._importar_gtfs)
         
         self.lbl_archivo = QLabel("Archivo: datos_direcciones.json")
         
         layout.addWidget(btn_guardar)
         layout.addWidget(btn_cargar)
+        layout.addWidget(btn_importar)
+        layout.addWidget(btn_gtfs)
         layout.addWidget(self.lbl_archivo)
         layout.addStretch()
         
@@ -55,4 +67,105 @@ class ArchivosTab(QWidget):
                 self.parent.mostrar_mensaje_estado(f"Datos cargados desde {archivo}")
                 self.lbl_archivo.setText(f"Archivo: {archivo}")
             except Exception as e:
-                self.parent.mostrar_error(f"Error al cargar: {str(e)}")
\ No newline at end of file
+                self.parent.mostrar_error(f"Error al cargar: {str(e)}")
+    
+    def _importar_lista(self):
+        """Geocodifica en lote una lista CSV/JSON de direcciones"""
+        archivo, ok = QInputDialog.getText(
+            self, "Importar Direcciones", "Archivo CSV o JSON:", 
+            text="direcciones.csv"
+        )
+        
+        if not ok or not archivo:
+            return
+        
+        importador = ImportadorLotes(self.parent.gestor)
+        trabajo = Trabajo(importador.importar_archivo, archivo)
+        trabajo.senales.progreso.connect(self._progreso_lista)
+        trabajo.senales.resultado.connect(self._lista_importada)
+        self._lanzar_importacion(trabajo, "Geocodificando direcciones...")
+    
+    def _progreso_lista(self, trabajo, hechas, total, _):
+        if self.ejecutor.es_vigente(trabajo) and self.dialogo is not None:
+            self.dialogo.setMaximum(total)
+            self.dialogo.setValue(hechas)
+    
+    def _lista_importada(self, trabajo, resumen):
+        if not self.ejecutor.es_vigente(trabajo):
+            return
+        self.parent.mostrar_mensaje_estado(
+            f"Importación completa: {resumen['nuevas'] + resumen['reanudadas']} nuevas, "
+            f"{resumen['no_encontradas']} no encontradas, {resumen['errores']} con error",
+            10000
+        )
+    
+    def _lanzar_importacion(self, trabajo, texto):
+        """
+        Lanza una importación en segundo plano con un diálogo de progreso.
+        
+        El diálogo depende de la ventana principal (esta pestaña queda deshabilitada
+        mientras la importación usa el gestor) y su botón cancela el trabajo.
+        """
+        self.dialogo = QProgressDialog(texto, "Cancelar", 0, 0, self.parent)
+        self.dialogo.setMinimumDuration(0)
+        self.dialogo.setAutoClose(False)
+        self.dialogo.setAutoReset(False)
+        self.dialogo.canceled.connect(self.ejecutor.cancelar)
+        trabajo.senales.error.connect(self._error_importacion)
+        trabajo.senales.terminado.connect(self._importacion_terminada)
+        self.ejecutor.lanzar(trabajo)
+        self.dialogo.show()
+    
+    def _error_importacion(self, trabajo, mensaje):
+        if self.ejecutor.es_vigente(trabajo):
+            self.parent.mostrar_error(f"Error al importar: {mensaje}")
+    
+    def _importacion_terminada(self, trabajo):
+        if trabajo is self.ejecutor.actual:
+            self.ejecutor.actual = None
+        if self.dialogo is not None:
+            # Cerrar el diálogo emite 'canceled': no debe cancelar nada a estas alturas
+            self.dialogo.canceled.disconnect()
+            self.dialogo.close()
+            self.dialogo = None
+        if trabajo.cancelado:
+            # Lo ya importado se conserva (la lista de direcciones se reanuda después)
+            self.parent.mostrar_mensaje_estado("Importación cancelada")
+        # Una importación cancelada a medias pudo registrar parte de los datos
+        self.parent.actualizar_listas_direcciones()
+    
+    def _importar_gtfs(self):
+        """Importa paradas, líneas y horarios de un GTFS (zip)"""
+        archivo, ok = QInputDialog.getText(
+            self, "Importar GTFS", "Archivo zip del GTFS:", 
+            text="gtfs.zip"
+        )
+        
+        if not ok or not archivo:
+            return
+        
+        trabajo = Trabajo(ImportadorGTFS(self.parent.gestor).importar, archivo)
+        trabajo.senales.progreso.connect(self._progreso_gtfs)
+        trabajo.senales.resultado.connect(self._gtfs_importado)
+        self._lanzar_importacion(trabajo, "Leyendo horarios...")
+    
+    def _progreso_gtfs(self, trabajo, leidos, total, _):
+        if not self.ejecutor.es_vigente(trabajo) or self.dialogo is None:
+            return
+        if leidos >= total:
+            # El registro en el gestor no informa avance
+            self.dialogo.setLabelText("Registrando paradas y recorridos...")
+            self.dialogo.setMaximum(0)
+            return
+        # Bytes de stop_times en KB para no desbordar el rango de la barra
+        self.dialogo.setMaximum(max(1, total // 1024))
+        self.dialogo.setValue(leidos // 1024)
+    
+    def _gtfs_importado(self, trabajo, resumen):
+        if not self.ejecutor.es_vigente(trabajo):
+            return
+        self.parent.mostrar_mensaje_estado(
+            f"GTFS importado: {resumen['lineas']} líneas, {resumen['viajes']} viajes, "
+            f"{resumen['paradas']} paradas ({resumen['paradas_nuevas']} nuevas)",
+            10000
+        )
\ No newline at end of file
@@ -1,14 +1,22 @@
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, 
                             QComboBox, QPushButton, QMessageBox, QListWidget,
-                            QListWidgetItem, QGroupBox)
+                            QListWidgetItem, QGroupBox, QCheckBox, QProgressBar)
 from PyQt5.QtCore import Qt
+from gestor_direcciones.ui.trabajos import EjecutorTrabajos, Trabajo
 from gestor_direcciones.ui.widgets.ruta_widget import RutaWidget
 
+# Valores que entiende el gestor, en el orden de los combos
+CRITERIOS = ['distancia', 'tiempo', 'transbordos']
+TRANSPORTES = ['publico', 'privado', 'combinado']
+
 class RutaTab(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.parent = parent
         self.ruta_actual = None
+        # Cálculos de rutas fuera del hilo de la interfaz; mientras alguno corre
+        # (aunque ya se haya cancelado) el gestor no admite cambios
+        self.ejecutor = EjecutorTrabajos(al_cambiar_ocupado=self.parent.bloquear_cambios)
         self._init_ui()
         self._conectar_eventos()
     
@@ -64,18 +72,35 @@ class RutaTab(QWidget):
         ])
         config_layout.addWidget(self.cbo_transporte)
         
+        # Costos reales por carretera (servicio /table de OSRM)
+        self.chk_osrm = QCheckBox("Usar OSRM")
+        self.chk_osrm.setToolTip("Ordenar las paradas con distancias y tiempos reales por carretera")
+        config_layout.addWidget(self.chk_osrm)
+        
         # Botón de cálculo
         self.btn_calcular = QPushButton("Calcular Ruta Óptima")
         config_layout.addWidget(self.btn_calcular)
         
         group_config.setLayout(config_layout)
         
+        # Progreso del cálculo en segundo plano
+        progreso_layout = QHBoxLayout()
+        self.barra_progreso = QProgressBar()
+        self.barra_progreso.setRange(0, 100)
+        self.lbl_mejor_costo = QLabel()
+        self.btn_cancelar = QPushButton("Cancelar")
+        progreso_layout.addWidget(self.barra_progreso)
+        progreso_layout.addWidget(self.lbl_mejor_costo)
+        progreso_layout.addWidget(self.btn_cancelar)
+        self._mostrar_progreso(False)
+        
         # Widget de visualización de ruta
         self.ruta_widget = RutaWidget()
         
         # Ensamblar layout principal
         main_layout.addWidget(group_seleccion)
         main_layout.addWidget(group_config)
+        main_layout.addLayout(progreso_layout)
         main_layout.addWidget(self.ruta_widget)
         
         self.setLayout(main_layout)
@@ -92,6 +117,12 @@ class RutaTab(QWidget):
         self.btn_agregar_destino.clicked.connect(self._agregar_destino)
         self.btn_limpiar.clicked.connect(self._limpiar_seleccion)
         self.btn_calcular.clicked.connect(self._calcular_ruta)
+        self.btn_cancelar.clicked.connect(self._cancelar_calculo)
+        
+        # Un cálculo en curso deja de servir si cambian sus parámetros
+        self.cbo_criterio.currentIndexChanged.connect(self._parametros_cambiados)
+        self.cbo_transporte.currentIndexChanged.connect(self._parametros_cambiados)
+        self.chk_osrm.toggled.connect(self._parametros_cambiados)
     
     def actualizar_lista(self):
         """Actualiza la lista de direcciones disponibles"""
@@ -109,6 +140,7 @@ class RutaTab(QWidget):
             QMessageBox.warning(self, "Error", "Seleccione al menos una dirección como origen")
             return
         
+        self._parametros_cambiados()
         self.origen = seleccionados[0].data(Qt.UserRole)
         self.ruta_widget.set_origen(self.origen)
         QMessageBox.information(self, "Origen establecido", f"Origen establecido: {self.origen}")
@@ -122,6 +154,7 @@ class RutaTab(QWidget):
         
         if not hasattr(self, 'destinos'):
             self.destinos = []
+        self._parametros_cambiados()
         
         for item in seleccionados:
             destino = item.data(Qt.UserRole)
@@ -133,6 +166,7 @@ class RutaTab(QWidget):
     
     def _limpiar_seleccion(self):
         """Limpia la selección actual"""
+        self._parametros_cambiados()
         self.lista_direcciones.clearSelection()
         if hasattr(self, 'origen'):
             del self.origen
@@ -141,25 +175,72 @@ class RutaTab(QWidget):
         self.ruta_widget.limpiar_ruta()
     
     def _calcular_ruta(self):
-        """Versión corregida con manejo robusto de errores y debug"""
-        try:
-            if not hasattr(self, 'origen') or not hasattr(self, 'destinos') or not self.destinos:
-                QMessageBox.warning(self, "Error", "Debe establecer un origen y al menos un destino")
-                return
+        """Lanza el cálculo de la ruta en segundo plano (la interfaz sigue respondiendo)"""
+        if not hasattr(self, 'origen') or not hasattr(self, 'destinos') or not self.destinos:
+            QMessageBox.warning(self, "Error", "Debe establecer un origen y al menos un destino")
+            return
 
-            print("Obteniendo parámetros...")  # Debug
-            criterio = self.cbo_criterio.currentText().lower().split()[0]
-            transporte = self.cbo_transporte.currentText().lower()
+        criterio = CRITERIOS[self.cbo_criterio.currentIndex()]
+        transporte = TRANSPORTES[self.cbo_transporte.currentIndex()]
 
-            print(f"Calculando ruta desde {self.origen} a {self.destinos}...")  # Debug
-            self.ruta_actual = self.parent.gestor.encontrar_ruta_optima(
-                origen=self.origen,
-                destinos=self.destinos,
-                criterio=criterio,
-                transporte=transporte
-            )
+        trabajo = Trabajo(
+            self.parent.gestor.encontrar_ruta_optima,
+            origen=self.origen,
+            destinos=list(self.destinos),
+            criterio=criterio,
+            transporte=transporte,
+            usar_osrm=self.chk_osrm.isChecked() and criterio != 'transbordos' and transporte != 'combinado'
+        )
+        trabajo.senales.progreso.connect(self._progreso_calculo)
+        trabajo.senales.resultado.connect(self._ruta_calculada)
+        trabajo.senales.error.connect(self._error_calculo)
+        trabajo.senales.terminado.connect(self._calculo_terminado)
+        self.ejecutor.lanzar(trabajo)
+        self._mostrar_progreso(True)
+
+    def _mostrar_progreso(self, calculando: bool):
+        """Muestra u oculta los controles del cálculo en curso"""
+        self.barra_progreso.setValue(0)
+        self.barra_progreso.setVisible(calculando)
+        self.lbl_mejor_costo.setText("")
+        self.lbl_mejor_costo.setVisible(calculando)
+        self.btn_cancelar.setVisible(calculando)
+
+    def _cancelar_calculo(self):
+        """Detiene el cálculo en curso; su resultado se descarta"""
+        self.ejecutor.cancelar()
+        self._mostrar_progreso(False)
+        self.parent.mostrar_mensaje_estado("Cálculo de ruta cancelado")
 
-            print("Ruta calculada:", self.ruta_actual)  # Debug
+    def _parametros_cambiados(self):
+        """Descarta el cálculo en curso si cambian la selección o las opciones"""
+        if self.ejecutor.actual is not None:
+            self._cancelar_calculo()
+
+    def _progreso_calculo(self, trabajo, hechos, total, mejor_costo):
+        if not self.ejecutor.es_vigente(trabajo):
+            return
+        self.barra_progreso.setMaximum(total)
+        self.barra_progreso.setValue(hechos)
+        if mejor_costo is not None:
+            self.lbl_mejor_costo.setText(f"Mejor costo hasta ahora: {mejor_costo:.2f}")
+
+    def _error_calculo(self, trabajo, mensaje):
+        if not self.ejecutor.es_vigente(trabajo):
+            return
+        QMessageBox.critical(self, "Error", f"No se pudo calcular la ruta:\n{mensaje}")
+
+    def _calculo_terminado(self, trabajo):
+        if trabajo is self.ejecutor.actual:
+            self.ejecutor.actual = None
+            self._mostrar_progreso(False)
+
+    def _ruta_calculada(self, trabajo, ruta):
+        """Muestra la ruta devuelta por el trabajo, si sigue siendo la vigente"""
+        if not self.ejecutor.es_vigente(trabajo):
+            return
+        try:
+            self.ruta_actual = ruta
             
             if not self.ruta_actual:
                 raise ValueError("El gestor no devolvió resultados")
@@ -170,7 +251,6 @@ class RutaTab(QWidget):
                 if key not in self.ruta_actual:
                     raise ValueError(f"Falta clave requerida en resultados: {key}")
 
-            print("Preparando datos para visualización...")  # Debug
             origen_coords = self.parent.gestor.direcciones[self.origen]['coordenadas']
             destinos_coords = []
             for d in self.destinos:
@@ -179,7 +259,6 @@ class RutaTab(QWidget):
                 else:
                     raise ValueError(f"Destino no encontrado: {d}")
 
-            print("Mostrando ruta en widget...")  # Debug
             self.ruta_widget.mostrar_ruta_completa(
                 origen=origen_coords,
                 destinos=destinos_coords,
@@ -189,11 +268,13 @@ class RutaTab(QWidget):
             # Actualizar estadísticas e instrucciones
             self._mostrar_estadisticas(self.ruta_actual)
             self._mostrar_instrucciones(self.ruta_actual)
-
-            print("Visualización completada correctamente")  # Debug
+            if self.ruta_actual.get('respaldo'):
+                self.parent.mostrar_mensaje_estado(
+                    "OSRM no respondió; parte de la ruta se estimó en línea recta")
+            else:
+                self.parent.mostrar_mensaje_estado("Ruta calculada")
 
         except Exception as e:
-            print(f"Error durante cálculo de ruta: {str(e)}")  # Debug
             QMessageBox.critical(self, "Error", 
                             f"No se pudo mostrar la ruta:\n{str(e)}\n\n"
                             f"Detalles técnicos:\n{self._obtener_detalles_error(e)}")
@@ -0,0 +1,117 @@
+import threading
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+
+class SenalesTrabajo(QObject):
+    """Señales de un trabajo; cada una incluye el trabajo para descartar resultados viejos"""
+    progreso = pyqtSignal(object, int, int, object)  # trabajo, hechos, total, mejor costo
+    resultado = pyqtSignal(object, object)  # trabajo, valor devuelto
+    error = pyqtSignal(object, str)  # trabajo, mensaje
+    terminado = pyqtSignal(object)  # trabajo (siempre, incluso si se canceló)
+
+
+class Trabajo(QRunnable):
+    """
+    Ejecuta una función fuera del hilo de la interfaz.
+
+    La función recibe además los argumentos 'progreso' y 'cancelar' (un
+    threading.Event); las señales llegan al hilo de la interfaz y, una vez
+    cancelado, el trabajo ya no emite resultado ni error.
+    """
+
+    def __init__(self, funcion, *args, **kwargs):
+        super().__init__()
+        self.funcion = funcion
+        self.args = args
+        self.kwargs = kwargs
+        self.senales = SenalesTrabajo()
+        self.evento_cancelar = threading.Event()
+        # El objeto de Python conserva las señales; Qt no debe borrarlo al terminar
+        self.setAutoDelete(False)
+
+    def cancelar(self):
+        """Pide detener el trabajo; su resultado se descartará"""
+        self.evento_cancelar.set()
+
+    @property
+    def cancelado(self) -> bool:
+        return self.evento_cancelar.is_set()
+
+    def _progreso(self, hechos, total, costo=None):
+        if not self.cancelado:
+            self.senales.progreso.emit(self, hechos, total, costo)
+
+    def run(self):
+        if self.cancelado:
+            # Cancelado mientras esperaba en la cola: no vale la pena empezarlo
+            self.senales.terminado.emit(self)
+            return
+        try:
+            valor = self.funcion(*self.args, progreso=self._progreso,
+                                 cancelar=self.evento_cancelar, **self.kwargs)
+        except Exception as e:
+            if not self.cancelado:
+                self.senales.error.emit(self, str(e))
+        else:
+            if not self.cancelado:
+                self.senales.resultado.emit(self, valor)
+        finally:
+            self.senales.terminado.emit(self)
+
+
+class EjecutorTrabajos:
+    """
+    Cola de trabajos en segundo plano donde sólo importa el más reciente.
+
+    Lanzar un trabajo cancela el anterior; con un solo hilo los cálculos no
+    compiten entre sí por las cachés del gestor. Un trabajo cancelado sigue
+    ocupando el ejecutor hasta que su función regresa; 'al_cambiar_ocupado'
+    recibe True al lanzar con el ejecutor libre y False cuando ya no queda
+    ningún trabajo en la cola ni corriendo.
+    """
+
+    def __init__(self, hilos: int = 1, al_cambiar_ocupado=None):
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(hilos)
+        self.actual = None
+        self.al_cambiar_ocupado = al_cambiar_ocupado
+        self._vivos = set()  # Referencias hasta que cada trabajo termina
+
+    @property
+    def ocupado(self) -> bool:
+        """Si algún trabajo (aunque esté cancelado) no ha terminado"""
+        return bool(self._vivos)
+
+    def _quitar(self, trabajo: Trabajo):
+        if trabajo in self._vivos:
+            self._vivos.discard(trabajo)
+            if not self._vivos and self.al_cambiar_ocupado is not None:
+                self.al_cambiar_ocupado(False)
+
+    def lanzar(self, trabajo: Trabajo) -> Trabajo:
+        """Cancela el trabajo vigente y encola el nuevo"""
+        if not self._vivos and self.al_cambiar_ocupado is not None:
+            self.al_cambiar_ocupado(True)
+        # Se registra antes de cancelar el anterior para no pasar por "libre"
+        self._vivos.add(trabajo)
+        self.cancelar()
+        self.actual = trabajo
+        trabajo.senales.terminado.connect(self._quitar)
+        self.pool.start(trabajo)
+        return trabajo
+
+    def cancelar(self):
+        """Cancela el trabajo vigente (si lo hay) y lo saca de la cola si no ha empezado"""
+        if self.actual is not None:
+            self.actual.cancelar()
+            actual, self.actual = self.actual, None
+            if self.pool.tryTake(actual):
+                self._quitar(actual)  # Nunca empezó: no emitirá 'terminado'
+
+    def es_vigente(self, trabajo: Trabajo) -> bool:
+        """Si el trabajo es el último lanzado y no se ha cancelado"""
+        return trabajo is self.actual and not trabajo.cancelado
+
+    def esperar(self, milisegundos: int = -1) -> bool:
+        """Espera a que terminen los trabajos en curso (p. ej. al cerrar la ventana)"""
+        return self.pool.waitForDone(milisegundos)
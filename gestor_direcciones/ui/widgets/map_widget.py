@@ -1,85 +1,61 @@
 from PyQt5.QtWidgets import QWidget, QVBoxLayout
-from PyQt5.QtWebEngineWidgets import QWebEngineView
-from PyQt5.QtCore import QUrl
-import folium
-import tempfile
-import os
+from gestor_direcciones.ui.widgets.vista_mapa import CENTRO_INICIAL, VistaMapa
+import html
 
 class MapWidget(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.layout = QVBoxLayout(self)
-        self.web_view = QWebEngineView()
+        # La página se carga una vez; los cambios se envían por JavaScript
+        self.web_view = VistaMapa(CENTRO_INICIAL, 15)
         self.layout.addWidget(self.web_view)
         self.setLayout(self.layout)
         
-        # Inicializar variables
-        self.html_file = None
-        self.marcador_actual = None
-        self.mapa = None
-        
-        # Crear mapa inicial
-        self._crear_mapa_inicial()
-        
-    def _crear_mapa_inicial(self):
-        """Crea el mapa inicial"""
-        self.mapa = folium.Map(location=[20.66682, -103.39182], zoom_start=15)
-        self._actualizar_mapa()
-        
-    def _actualizar_mapa(self):
-        """Actualiza el mapa mostrado en el widget"""
-        # Cerrar archivo anterior si existe
-        if self.html_file:
-            try:
-                os.unlink(self.html_file.name)
-            except:
-                pass
-        
-        # Crear nuevo archivo temporal
-        self.html_file = tempfile.NamedTemporaryFile(delete=False, suffix='.html')
-        self.mapa.save(self.html_file.name)
-        self.html_file.close()
-        
-        # Cargar el archivo HTML
-        self.web_view.setUrl(QUrl.fromLocalFile(self.html_file.name))
-        
+        # Gestor cuyas direcciones se muestran agrupadas (None = no se muestran)
+        self.gestor = None
+        self.web_view.vista_cambiada.connect(self._vista_cambiada)
+        self.web_view.puente.proveedor_popup = self._popup_direccion
+
     def centrar_mapa(self, lat, lon, zoom=15):
         """Centra el mapa en las coordenadas especificadas"""
-        if not self.mapa:
-            self._crear_mapa_inicial()
-            
-        self.mapa.location = [lat, lon]
-        self.mapa.zoom_start = zoom
-        self._actualizar_mapa()
-        
+        self.web_view.centrar(lat, lon, zoom)
+
     def agregar_marcador(self, lat, lon, direccion):
-        """Añade un marcador al mapa y centra la vista"""
-        # Crear nuevo mapa si no existe
-        if not self.mapa:
-            self._crear_mapa_inicial()
-        
-        # Limpiar marcadores anteriores
-        if self.marcador_actual:
-            self.mapa = folium.Map(location=[lat, lon], zoom_start=15)
-        
-        # Añadir nuevo marcador
-        self.marcador_actual = folium.Marker(
-            location=[lat, lon],
-            popup=direccion,
-            icon=folium.Icon(color='green')
-        ).add_to(self.mapa)
-        
+        """Muestra el marcador de la dirección (reemplaza el anterior) y centra la vista"""
+        self.web_view.poner_marcadores('seleccion', [
+            {'lat': lat, 'lon': lon, 'popup': direccion, 'color': 'green'}
+        ])
         self.centrar_mapa(lat, lon)
-        
+
     def limpiar_mapa(self):
         """Limpia completamente el mapa"""
-        self._crear_mapa_inicial()
-        
-    def __del__(self):
-        """Limpia el archivo temporal al destruir el widget"""
-        if hasattr(self, 'html_file') and self.html_file:
-            try:
-                if os.path.exists(self.html_file.name):
-                    os.unlink(self.html_file.name)
-            except:
-                pass
\ No newline at end of file
+        self.web_view.limpiar()
+        
+    def mostrar_direcciones(self, gestor):
+        """Muestra todas las direcciones del gestor, agrupadas según el zoom y la vista"""
+        self.gestor = gestor
+        self.actualizar_direcciones()
+        
+    def ocultar_direcciones(self):
+        self.gestor = None
+        self.web_view.limpiar_capa('direcciones')
+        
+    def actualizar_direcciones(self):
+        """Vuelve a agrupar en la vista actual (p. ej. después de agregar direcciones)"""
+        if self.gestor is not None:
+            self.web_view.ejecutar('avisarVista')
+        
+    def _vista_cambiada(self, sur, oeste, norte, este, zoom):
+        # Sólo viajan los grupos visibles; los popups se piden al abrirlos
+        if self.gestor is not None:
+            self.web_view.poner_grupos('direcciones',
+                                       self.gestor.marcadores_en_vista(sur, oeste, norte, este, zoom))
+        
+    def _popup_direccion(self, direccion):
+        info = self.gestor.direcciones.get(direccion) if self.gestor is not None else None
+        if not info:
+            return html.escape(direccion)
+        coords = info['coordenadas']
+        return (f"<b>{html.escape(direccion)}</b><br>"
+                f"<i>Tipo: {html.escape(str(info.get('tipo', 'N/A')))}</i><br>"
+                f"Lat {coords['lat']:.6f}, Lon {coords['lon']:.6f}")
\ No newline at end of file
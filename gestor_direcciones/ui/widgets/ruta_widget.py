@@ -1,12 +1,15 @@
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QTextEdit, 
                             QTabWidget, QLabel, QToolButton)
-from PyQt5.QtWebEngineWidgets import QWebEngineView
-from PyQt5.QtCore import QUrl, Qt
-import folium
+from PyQt5.QtCore import Qt
+from gestor_direcciones.core.geometria import niveles_detalle
+from gestor_direcciones.ui.widgets.vista_mapa import CENTRO_INICIAL, VistaMapa
 import tempfile
 import webbrowser
 import os
 
+# Copia del mapa que se abre en el navegador (se sobrescribe en cada apertura)
+ARCHIVO_MAPA_EXTERNO = os.path.join(tempfile.gettempdir(), 'gestor_direcciones_ruta.html')
+
 class RutaWidget(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -25,7 +28,7 @@ class RutaWidget(QWidget):
         self.tab_mapa = QWidget()
         self.mapa_layout = QVBoxLayout()
         
-        self.mapa = QWebEngineView()
+        self.mapa = VistaMapa(CENTRO_INICIAL, 13)
         self.mapa.setMinimumHeight(400)
         
         # Controles del mapa
@@ -88,7 +91,7 @@ class RutaWidget(QWidget):
         """Limpia la ruta actual"""
         self.origen = None
         self.destinos = []
-        self.mapa.setHtml("")
+        self.mapa.limpiar()
         self.instrucciones.clear()
         self.estadisticas.clear()
         self.btn_abrir_mapa.setEnabled(False)
@@ -99,8 +102,8 @@ class RutaWidget(QWidget):
         if not origen or not destinos or not ruta:
             return
         
-        # Crear mapa
-        m = self._crear_mapa(origen, destinos, ruta)
+        # Dibujar en el mapa
+        self._crear_mapa(origen, destinos, ruta)
         
         # Mostrar instrucciones
         self._mostrar_instrucciones(ruta)
@@ -114,49 +117,31 @@ class RutaWidget(QWidget):
             f"Ruta optimizada por {ruta.get('criterio', 'distancia')} | "
             f"Distancia: {ruta.get('distancia_total', 0):.2f} km | "
             f"Tiempo: {ruta.get('tiempo_total', 0)/60:.1f} min"
+            + (" | Estimado en línea recta (OSRM no respondió)" if ruta.get('respaldo') else "")
         )
     
-    def _crear_mapa(self, origen: dict, destinos: list, ruta: dict) -> folium.Map:
-        """Crea un mapa Folium con la ruta"""
-        # Calcular centro del mapa
-        lats = [origen['lat']] + [d['lat'] for d in destinos]
-        lons = [origen['lon']] + [d['lon'] for d in destinos]
-        centro = [sum(lats)/len(lats), sum(lons)/len(lons)]
-        
-        m = folium.Map(location=centro, zoom_start=13)
-        
-        # Añadir origen
-        folium.Marker(
-            location=[origen['lat'], origen['lon']],
-            popup=f"Origen: {self.origen}",
-            icon=folium.Icon(color='green', icon='home')
-        ).add_to(m)
-        
-        # Añadir destinos
+    def _crear_mapa(self, origen: dict, destinos: list, ruta: dict):
+        """Envía marcadores y ruta a la página del mapa (sin recargarla)"""
+        # Origen y destinos
+        marcadores = [{'lat': origen['lat'], 'lon': origen['lon'], 'popup': f"Origen: {self.origen}",
+                       'color': 'green', 'icono': 'home'}]
         for i, destino in enumerate(destinos, 1):
-            folium.Marker(
-                location=[destino['lat'], destino['lon']],
-                popup=f"Destino {i}: {self.destinos[i-1]}",
-                icon=folium.Icon(color='red', icon='flag')
-            ).add_to(m)
-        
-        # Añadir ruta si existe geometría
-        if 'geometria' in ruta:
-            folium.PolyLine(
-                locations=ruta['geometria'],
-                color='blue',
-                weight=5,
-                opacity=0.7,
-                popup="Ruta calculada"
-            ).add_to(m)
-        
-        # Guardar mapa temporal y mostrarlo
-        temp_file = tempfile.NamedTemporaryFile(suffix='.html', delete=False)
-        m.save(temp_file.name)
-        self.mapa.setUrl(QUrl.fromLocalFile(temp_file.name))
-        self.temp_map_file = temp_file.name  # Guardar referencia para abrir después
-        
-        return m
+            marcadores.append({'lat': destino['lat'], 'lon': destino['lon'],
+                               'popup': f"Destino {i}: {self.destinos[i-1]}",
+                               'color': 'red', 'icono': 'flag'})
+        self.mapa.poner_marcadores('paradas', marcadores)
+        
+        # Ruta si existe geometría, simplificada por nivel de zoom
+        niveles = niveles_detalle(ruta['geometria']) if 'geometria' in ruta else []
+        if niveles:
+            self.mapa.poner_lineas('ruta', [
+                {'niveles': niveles, 'color': 'blue', 'grosor': 5,
+                 'opacidad': 0.7, 'popup': "Ruta calculada"}
+            ])
+        else:
+            self.mapa.limpiar_capa('ruta')
+        
+        self.mapa.ajustar([(m['lat'], m['lon']) for m in marcadores])
     
     def _mostrar_instrucciones(self, ruta: dict):
         """Muestra las instrucciones detalladas de la ruta"""
@@ -192,5 +177,5 @@ class RutaWidget(QWidget):
     
     def _abrir_mapa_externo(self):
         """Abre el mapa en el navegador externo"""
-        if hasattr(self, 'temp_map_file') and os.path.exists(self.temp_map_file):
-            webbrowser.open('file://' + os.path.abspath(self.temp_map_file))
\ No newline at end of file
+        ruta = self.mapa.guardar_html(ARCHIVO_MAPA_EXTERNO)
+        webbrowser.open('file://' + os.path.abspath(ruta))
\ No newline at end of file
@@ -0,0 +1,278 @@
+from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot
+from PyQt5.QtWebChannel import QWebChannel
+from PyQt5.QtWebEngineWidgets import QWebEngineView
+from branca.element import MacroElement
+from jinja2 import Template
+import folium
+import html
+import json
+import re
+
+# Centro por defecto (Guadalajara)
+CENTRO_INICIAL = (20.66682, -103.39182)
+
+# Funciones que la página expone; las actualizaciones sólo envían datos JSON.
+# Cada capa es un L.layerGroup que se reemplaza completo al actualizarla.
+# Con QWebChannel la página avisa los cambios de vista y pide los popups de
+# los puntos agrupados; fuera de la aplicación (navegador) no hay puente.
+SCRIPT_MAPA = """
+var mapa = {mapa};
+var capas = {};
+var puente = null;
+var ESTILO_GRUPO = 'width:100%;height:100%;border-radius:50%;background:rgba(51,136,255,0.75);' +
+                   'color:white;text-align:center;font-weight:bold;';
+function avisarVista() {
+    if (!puente) { return; }
+    var b = mapa.getBounds().pad(0.25);
+    puente.vistaCambiada(b.getSouth(), b.getWest(), b.getNorth(), b.getEast(), mapa.getZoom());
+}
+if (typeof qt !== 'undefined' && typeof QWebChannel !== 'undefined') {
+    new QWebChannel(qt.webChannelTransport, function (canal) {
+        puente = canal.objects.puente;
+        mapa.on('moveend', avisarVista);
+        avisarVista();
+    });
+}
+function capa(nombre) {
+    if (!capas[nombre]) { capas[nombre] = L.layerGroup().addTo(mapa); }
+    return capas[nombre];
+}
+function limpiarCapa(nombre) {
+    if (capas[nombre]) { capas[nombre].clearLayers(); }
+}
+function limpiarTodo() {
+    for (var nombre in capas) { capas[nombre].clearLayers(); }
+}
+function ponerMarcadores(nombre, marcadores) {
+    limpiarCapa(nombre);
+    var grupo = capa(nombre);
+    marcadores.forEach(function (m) {
+        var icono = L.AwesomeMarkers.icon({
+            icon: m.icono || 'info-sign', markerColor: m.color || 'blue', prefix: 'glyphicon'
+        });
+        var marcador = L.marker([m.lat, m.lon], {icon: icono});
+        if (m.popup) { marcador.bindPopup(m.popup); }
+        marcador.addTo(grupo);
+    });
+}
+function nivelPara(niveles, zoom) {
+    var puntos = niveles[0][1];
+    niveles.forEach(function (n) { if (zoom >= n[0]) { puntos = n[1]; } });
+    return puntos;
+}
+function ponerLineas(nombre, lineas) {
+    limpiarCapa(nombre);
+    var grupo = capa(nombre);
+    lineas.forEach(function (l) {
+        var linea = L.polyline(l.niveles ? nivelPara(l.niveles, mapa.getZoom()) : l.puntos, {
+            color: l.color || 'blue', weight: l.grosor || 5, opacity: l.opacidad || 0.7
+        });
+        linea.niveles = l.niveles;
+        if (l.popup) { linea.bindPopup(l.popup); }
+        linea.addTo(grupo);
+    });
+}
+// Las líneas con niveles de detalle cambian de geometría al acercar o alejar
+mapa.on('zoomend', function () {
+    var zoom = mapa.getZoom();
+    for (var nombre in capas) {
+        capas[nombre].eachLayer(function (l) {
+            if (l.niveles) { l.setLatLngs(nivelPara(l.niveles, zoom)); }
+        });
+    }
+});
+function ponerGrupos(nombre, grupos) {
+    limpiarCapa(nombre);
+    var grupo = capa(nombre);
+    grupos.forEach(function (g) {
+        if (g.cantidad > 1) {
+            var lado = Math.round(Math.min(56, 26 + 12 * Math.log10(g.cantidad)));
+            var icono = L.divIcon({
+                html: '<div style="' + ESTILO_GRUPO + 'line-height:' + lado + 'px;">' + g.cantidad + '</div>',
+                className: '', iconSize: [lado, lado]
+            });
+            L.marker([g.lat, g.lon], {icon: icono}).on('click', function () {
+                mapa.setView([g.lat, g.lon], Math.min(mapa.getZoom() + 2, mapa.getMaxZoom()));
+            }).addTo(grupo);
+            return;
+        }
+        var punto = L.circleMarker([g.lat, g.lon], {radius: 6, color: '#3388ff', fillOpacity: 0.8});
+        punto.bindPopup('Cargando...');
+        punto.on('popupopen', function (e) {
+            if (puente) {
+                puente.popup(g.id, function (contenido) { e.popup.setContent(contenido); });
+            } else {
+                var texto = document.createElement('span');
+                texto.textContent = g.id;
+                e.popup.setContent(texto);
+            }
+        });
+        punto.addTo(grupo);
+    });
+}
+function centrar(lat, lon, zoom) {
+    mapa.setView([lat, lon], zoom);
+}
+function ajustar(limites) {
+    mapa.fitBounds(limites, {padding: [30, 30], maxZoom: 17});
+}
+"""
+
+
+def _a_json(valor):
+    """Permite enviar arreglos y escalares de numpy a la página"""
+    if hasattr(valor, 'tolist'):
+        return valor.tolist()
+    raise TypeError(f"No se puede convertir {type(valor).__name__} a JSON")
+
+
+class PuenteMapa(QObject):
+    """Objeto que la página usa como 'puente' a través de QWebChannel"""
+    vista_cambiada = pyqtSignal(float, float, float, float, int)  # sur, oeste, norte, este, zoom
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.proveedor_popup = None  # Función id -> HTML del popup de un punto
+
+    @pyqtSlot(float, float, float, float, float)
+    def vistaCambiada(self, sur, oeste, norte, este, zoom):
+        self.vista_cambiada.emit(sur, oeste, norte, este, int(round(zoom)))
+
+    @pyqtSlot(str, result=str)
+    def popup(self, identificador):
+        if self.proveedor_popup is None:
+            return html.escape(identificador)
+        return self.proveedor_popup(identificador)
+
+
+class VistaMapa(QWebEngineView):
+    """
+    Página de Leaflet que se carga una sola vez y se actualiza por JavaScript.
+
+    Marcadores, líneas y vista se envían como JSON con runJavaScript, sin
+    recargar la página ni escribir archivos; las llamadas hechas antes de que
+    la página termine de cargar se encolan. El estado se conserva para poder
+    exportar el mapa a HTML. La señal 'vista_cambiada' avisa cada vez que el
+    usuario mueve o acerca el mapa.
+    """
+
+    def __init__(self, centro=CENTRO_INICIAL, zoom=15, parent=None):
+        super().__init__(parent)
+        self.centro_inicial = tuple(centro)
+        self.zoom_inicial = zoom
+        self._lista = False
+        self._pendientes = []  # Scripts enviados antes de cargar la página
+        self._capas = {}  # Nombre de capa -> (función, datos) de su último contenido
+        self._vista = ('centrar', [centro[0], centro[1], zoom])
+        self.puente = PuenteMapa(self)
+        self.vista_cambiada = self.puente.vista_cambiada
+        self._canal = QWebChannel(self.page())
+        self._canal.registerObject('puente', self.puente)
+        self.page().setWebChannel(self._canal)
+        self.loadFinished.connect(self._pagina_cargada)
+        self.setHtml(self._html())
+
+    def _html(self, llamadas=()) -> str:
+        """Página base con la API de SCRIPT_MAPA y, opcionalmente, llamadas iniciales"""
+        mapa = folium.Map(location=list(self.centro_inicial), zoom_start=self.zoom_inicial)
+        mapa.get_root().header.add_child(
+            folium.Element('<script src="qrc:///qtwebchannel/qwebchannel.js"></script>'))
+        script = SCRIPT_MAPA.replace('{mapa}', mapa.get_name())
+        script += ''.join(self._script(funcion, *args) for funcion, args in llamadas)
+        # Como hijo del mapa el script se emite después de crear el L.map
+        elemento = MacroElement()
+        elemento._template = Template('{% macro script(this, kwargs) %}{{ this.codigo }}{% endmacro %}')
+        elemento.codigo = script
+        mapa.add_child(elemento)
+        return mapa.get_root().render()
+
+    @staticmethod
+    def _script(funcion: str, *args) -> str:
+        argumentos = ', '.join(json.dumps(a, default=_a_json) for a in args)
+        # folium vuelve a pasar el script por Jinja; '{{', '{%' y '{#' sólo
+        # aparecen dentro de cadenas JSON, donde \u007b es equivalente
+        argumentos = re.sub(r'\{(?=[{%#])', r'\\u007b', argumentos)
+        return f"{funcion}({argumentos});\n"
+
+    def _pagina_cargada(self, ok):
+        self._lista = ok
+        if ok:
+            pendientes, self._pendientes = self._pendientes, []
+            if pendientes:
+                self.page().runJavaScript(''.join(pendientes))
+
+    def ejecutar(self, funcion: str, *args):
+        """Llama una función de la página con argumentos convertidos a JSON"""
+        script = self._script(funcion, *args)
+        if self._lista:
+            self.page().runJavaScript(script)
+        else:
+            self._pendientes.append(script)
+
+    def poner_marcadores(self, capa: str, marcadores: list):
+        """
+        Reemplaza los marcadores de una capa.
+
+        Cada marcador es un dict con 'lat', 'lon' y opcionalmente 'popup'
+        (texto plano), 'color' e 'icono' (nombres de folium.Icon).
+        """
+        datos = [{**m, 'popup': html.escape(m['popup'])} if m.get('popup') else m
+                 for m in marcadores]
+        self._capas[capa] = ('ponerMarcadores', datos)
+        self.ejecutar('ponerMarcadores', capa, datos)
+
+    def poner_lineas(self, capa: str, lineas: list):
+        """
+        Reemplaza las líneas de una capa.
+
+        Cada línea es un dict con 'puntos' ([[lat, lon], ...]) o 'niveles'
+        ([(zoom desde el que aplica, puntos), ...] de menor a mayor detalle,
+        como los de core.geometria.niveles_detalle) y opcionalmente 'popup',
+        'color', 'grosor' y 'opacidad'.
+        """
+        datos = [{**l, 'popup': html.escape(l['popup'])} if l.get('popup') else l
+                 for l in lineas]
+        self._capas[capa] = ('ponerLineas', datos)
+        self.ejecutar('ponerLineas', capa, datos)
+
+    def poner_grupos(self, capa: str, grupos: list):
+        """
+        Reemplaza una capa de puntos agrupados.
+
+        Cada grupo es un dict con 'lat', 'lon', 'cantidad' e 'id'; los de un
+        solo punto piden su popup al abrirlo con 'puente.proveedor_popup(id)'.
+        """
+        self._capas[capa] = ('ponerGrupos', grupos)
+        self.ejecutar('ponerGrupos', capa, grupos)
+
+    def limpiar_capa(self, capa: str):
+        self._capas.pop(capa, None)
+        self.ejecutar('limpiarCapa', capa)
+
+    def limpiar(self):
+        """Quita todas las capas y vuelve a la vista inicial"""
+        self._capas.clear()
+        self.ejecutar('limpiarTodo')
+        self.centrar(*self.centro_inicial, self.zoom_inicial)
+
+    def centrar(self, lat, lon, zoom=15):
+        self._vista = ('centrar', [lat, lon, zoom])
+        self.ejecutar('centrar', lat, lon, zoom)
+
+    def ajustar(self, puntos):
+        """Encuadra la vista para que se vean todos los puntos (lat, lon)"""
+        puntos = [[float(lat), float(lon)] for lat, lon in puntos]
+        if not puntos:
+            return
+        limites = [[min(p[0] for p in puntos), min(p[1] for p in puntos)],
+                   [max(p[0] for p in puntos), max(p[1] for p in puntos)]]
+        self._vista = ('ajustar', [limites])
+        self.ejecutar('ajustar', limites)
+
+    def guardar_html(self, ruta: str) -> str:
+        """Guarda una copia independiente del mapa actual (p. ej. para abrirla en el navegador)"""
+        llamadas = [(funcion, [capa, datos]) for capa, (funcion, datos) in self._capas.items()]
+        llamadas.append(self._vista)
+        with open(ruta, 'w', encoding='utf-8') as f:
+            f.write(self._html(llamadas))
+        return ruta
\ No newline at end of file
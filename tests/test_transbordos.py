@@ -0,0 +1,63 @@
+# Importaciones estándar
+import unittest
+
+# Importaciones propias
+from gestor_direcciones.core.grafo_compacto import GrafoCompacto
+from gestor_direcciones.core.transbordos import BusquedaTransbordos, SIN_LINEA
+
+
+def grafo_lineas(nodos, aristas, lineas):
+    """GrafoCompacto dirigido desde aristas (origen, destino, duracion, línea o None)"""
+    ids = {nodo: i for i, nodo in enumerate(nodos)}
+    return GrafoCompacto.desde_aristas(
+        nodos,
+        [ids[u] for u, _, _, _ in aristas],
+        [ids[v] for _, v, _, _ in aristas],
+        {'duracion': [d for _, _, d, _ in aristas]},
+        [lineas.index(l) if l else SIN_LINEA for _, _, _, l in aristas],
+        lineas
+    )
+
+
+def mas_rapida(grafo, penalizacion, origen, destino):
+    busqueda = BusquedaTransbordos(grafo, 'duracion', penalizacion)
+    return busqueda.opciones(grafo.ids[origen], grafo.ids[destino])[0]
+
+
+class TestPenalizacionTransbordo(unittest.TestCase):
+
+    def test_penalizacion_cambia_ruta(self):
+        # Directo por L1 en 30, o por L2 y L3 en 10 con un transbordo
+        grafo = grafo_lineas(['O', 'A', 'D'], [
+            ('O', 'D', 30, 'L1'),
+            ('O', 'A', 5, 'L2'),
+            ('A', 'D', 5, 'L3'),
+        ], ['L1', 'L2', 'L3'])
+
+        sin_penalizacion = mas_rapida(grafo, 0, 'O', 'D')
+        self.assertEqual(sin_penalizacion['ruta'], ['O', 'A', 'D'])
+        self.assertEqual(sin_penalizacion['tiempo'], 10)
+
+        con_penalizacion = mas_rapida(grafo, 25, 'O', 'D')
+        self.assertEqual(con_penalizacion['ruta'], ['O', 'D'])
+        self.assertEqual(con_penalizacion['tiempo'], 30)
+
+    def test_dominancia_incluye_penalizacion(self):
+        # En X llega primero L1 (12, sin transbordos) y después L2 (16, un
+        # transbordo). Seguir por L2 desde L1 cuesta 12 + 5, así que la
+        # etiqueta de L2 no está dominada y da la opción más rápida a D.
+        grafo = grafo_lineas(['O', 'A', 'X', 'D'], [
+            ('O', 'X', 12, 'L1'),
+            ('O', 'A', 1, 'L3'),
+            ('A', 'X', 10, 'L2'),
+            ('X', 'D', 10, 'L2'),
+        ], ['L1', 'L2', 'L3'])
+
+        opcion = mas_rapida(grafo, 5, 'O', 'D')
+        self.assertEqual(opcion['ruta'], ['O', 'A', 'X', 'D'])
+        self.assertEqual(opcion['tiempo'], 26)
+        self.assertEqual(opcion['transbordos'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()